@@ -0,0 +1,1122 @@
+"""asyncio twins of the FTP/SFTP connectors.
+
+The connectors in ``connectors`` hold one thread per session, which caps
+how many receivers a scan can talk to at once. These speak the same
+protocols on non-blocking sockets so a single event loop can keep
+hundreds of sessions busy. ``AsyncFTPConnector`` and the SFTP connector
+offer ``list_and_size``, ``download``, ``stat`` and ``dir_mtime`` as
+coroutines with the same arguments and results as their blocking
+counterparts; ``SYNC_CONNECTORS`` serves them to the existing threaded
+callers from one background loop (``ConnectorFactory.backend = "asyncio"``).
+
+SFTP needs asyncssh (``pip install asyncssh``); without it the blocking
+SFTP connector is run on worker threads instead.
+"""
+
+import asyncio
+import errno
+import ftplib
+import logging
+import socket
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from connectors import (
+    CONNECT_TIMEOUT,
+    DOWNLOAD_TIMEOUT,
+    FTP_FILTER_MAX_EXPECTED,
+    MAX_RETRIES,
+    READ_TIMEOUT,
+    SFTP_FILTER_MAX_EXPECTED,
+    SFTPConnector,
+    _no_dir_mtime,
+    add_size,
+    attempt_failed,
+    breaker_open,
+    dir_mtime_failed,
+    finish_part,
+    ftp_dir_mtime,
+    ftp_listing_failed,
+    ftp_not_found,
+    ftp_stat_failed,
+    ftp_time,
+    glob_for,
+    hash_commands,
+    hash_reply,
+    is_network_error,
+    list_method_failed,
+    list_methods,
+    mlst_facts,
+    mlst_refused,
+    no_hash_command,
+    open_part,
+    pool_exhausted,
+    parse_listing,
+    pool_key,
+    record_download,
+    record_listing,
+    remember_dir_size,
+    resumable_local,
+    rest_refused,
+    sha256sum_command,
+    sha256sum_reply,
+    sizes_wanted,
+    use_filtered_listing,
+)
+from health import HEALTH
+from metrics import METRICS
+from pool import (
+    POOL_ACQUIRE_TIMEOUT,
+    POOL_IDLE_TIMEOUT,
+    POOL_KEEPALIVE,
+    POOL_MAX_PER_HOST,
+    PoolExhausted,
+)
+from transfer import (
+    BANDWIDTH,
+    FTP_BLOCK_SIZE,
+    SFTP_MAX_REQUESTS,
+    SFTP_READ_CHUNK,
+    SFTP_WINDOW_SIZE,
+    async_writer,
+)
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+FTP_ENCODING = "utf-8"  # as ftplib
+
+# asyncssh failures that mean the link or the host is gone
+SSH_ERRORS = (
+    (
+        asyncssh.DisconnectError,
+        asyncssh.ChannelOpenError,
+        asyncssh.SFTPConnectionLost,
+        asyncssh.SFTPNoConnection,
+    )
+    if asyncssh
+    else ()
+)
+
+
+def is_async_network_error(e):
+    return is_network_error(e) or isinstance(e, SSH_ERRORS)
+
+
+def propagates_async(e):
+    """:func:`connectors.propagates` with the asyncssh errors."""
+    return is_async_network_error(e) or isinstance(e, PoolExhausted)
+
+
+async def with_timeout(aw, seconds):
+    """``aw``'s result; a timeout raises ``socket.timeout`` like a blocking socket."""
+    try:
+        return await asyncio.wait_for(aw, seconds)
+    except asyncio.TimeoutError:
+        raise socket.timeout("timed out") from None
+
+
+def retry_on_network_error(default=None, max_retries=MAX_RETRIES):
+    """Coroutine version of :func:`connectors.retry_on_network_error`."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(site, *args, **kwargs):
+            host = site.host
+            attempts = HEALTH.attempts(host, max_retries)
+            for attempt in range(attempts):
+                if breaker_open(host, func.__name__):
+                    return default
+                try:
+                    result = await func(site, *args, **kwargs)
+                except PoolExhausted as e:
+                    return pool_exhausted(host, func.__name__, e, default)
+                except Exception as e:
+                    if not is_async_network_error(e):
+                        raise  # says nothing about the host either way
+                    delay = attempt_failed(host, func.__name__, attempt, attempts, e)
+                    if delay:
+                        await asyncio.sleep(delay)
+                    continue
+                HEALTH.success(host)
+                return result
+            return default
+
+        return wrapper
+
+    return decorator
+
+
+async def _open_socket(host, port):
+    loop = asyncio.get_running_loop()
+    error = OSError(f"{host} did not resolve")
+    for family, kind, proto, _, addr in await loop.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM
+    ):
+        sock = socket.socket(family, kind, proto)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, addr)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+        except BaseException:
+            sock.close()
+            raise
+    raise error
+
+
+async def connect(site):
+    """Non-blocking :func:`connectors.connect`: a connected socket for ``site``."""
+    start = time.monotonic()
+    sock = await with_timeout(
+        _open_socket(site.host, site.port),
+        HEALTH.connect_timeout(site.host, CONNECT_TIMEOUT),
+    )
+    elapsed = time.monotonic() - start
+    HEALTH.observe(site.host, elapsed)
+    METRICS.observe("dgnet_connect_seconds", elapsed, host=site.host)
+    return sock
+
+
+class AsyncFTPSession:
+    """A logged-in FTP control connection on asyncio streams.
+
+    Replies raise the same ``ftplib`` errors as ``ftplib.FTP``; data
+    connections are passive, to the control connection's peer address.
+    """
+
+    recoverable = (ftplib.error_perm,)
+
+    def __init__(self, reader, writer, timeout):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.home = None
+        self._type = None
+        peer = writer.get_extra_info("peername")
+        self._peer = peer[0]
+        self._epsv = writer.get_extra_info("socket").family == socket.AF_INET6
+
+    @classmethod
+    async def open(cls, site):
+        sock = await connect(site)
+        try:
+            reader, writer = await asyncio.open_connection(
+                sock=sock, limit=ftplib.MAXLINE
+            )
+        except BaseException:
+            sock.close()
+            raise
+        sess = cls(reader, writer, HEALTH.read_timeout(site.host, READ_TIMEOUT))
+        try:
+            await sess.reply()  # welcome
+            with METRICS.timer("dgnet_login_seconds", host=site.host):
+                await sess.login(site.user, site.password)
+            sess.home = ftplib.parse257(await sess.sendcmd("PWD"))
+            return sess
+        except BaseException:
+            sess.abort()
+            raise
+
+    async def _line(self):
+        line = await with_timeout(self.reader.readline(), self.timeout)
+        if not line:
+            raise EOFError("control connection closed")
+        return line.decode(FTP_ENCODING).rstrip("\r\n")
+
+    async def reply(self):
+        line = await self._line()
+        if line[3:4] == "-":
+            code = line[:3]
+            lines = [line]
+            while not (lines[-1][:3] == code and lines[-1][3:4] != "-"):
+                lines.append(await self._line())
+            line = "\n".join(lines)
+        if line[:1] in ("1", "2", "3"):
+            return line
+        if line[:1] == "4":
+            raise ftplib.error_temp(line)
+        if line[:1] == "5":
+            raise ftplib.error_perm(line)
+        raise ftplib.error_proto(line)
+
+    async def voidresp(self):
+        resp = await self.reply()
+        if resp[:1] != "2":
+            raise ftplib.error_reply(resp)
+        return resp
+
+    async def sendcmd(self, cmd):
+        self.writer.write(cmd.encode(FTP_ENCODING) + b"\r\n")
+        await with_timeout(self.writer.drain(), self.timeout)
+        return await self.reply()
+
+    async def voidcmd(self, cmd):
+        resp = await self.sendcmd(cmd)
+        if resp[:1] != "2":
+            raise ftplib.error_reply(resp)
+        return resp
+
+    async def login(self, user, password):
+        resp = await self.sendcmd(f"USER {user or 'anonymous'}")
+        if resp[:1] == "3":
+            resp = await self.sendcmd(f"PASS {password or ''}")
+        if resp[:1] == "3":
+            resp = await self.sendcmd("ACCT ")
+        if resp[:1] != "2":
+            raise ftplib.error_reply(resp)
+        return resp
+
+    async def set_type(self, kind):
+        # Sent only when it changes, unlike ftplib's before every transfer
+        if self._type != kind:
+            await self.voidcmd(f"TYPE {kind}")
+            self._type = kind
+
+    async def _transfer(self, cmd, rest=None):
+        """Open a passive data connection and start ``cmd`` on it."""
+        if self._epsv:
+            port = ftplib.parse229(await self.sendcmd("EPSV"), (self._peer,))[1]
+        else:
+            # Like ftplib, trust the control peer over the address in 227
+            port = ftplib.parse227(await self.sendcmd("PASV"))[1]
+        reader, writer = await with_timeout(
+            asyncio.open_connection(self._peer, port, limit=FTP_BLOCK_SIZE),
+            self.timeout,
+        )
+        try:
+            if rest:
+                await self.sendcmd(f"REST {rest}")
+            resp = await self.sendcmd(cmd)
+            # Some servers reply 2xx straight away, then 1xx
+            if resp[:1] == "2":
+                resp = await self.reply()
+            if resp[:1] != "1":
+                raise ftplib.error_reply(resp)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def lines(self, cmd):
+        """Text lines ``cmd`` sends over a data connection (LIST, MLSD, ...)."""
+        await self.set_type("A")
+        reader, writer = await self._transfer(cmd)
+        lines = []
+        try:
+            while True:
+                line = await with_timeout(reader.readline(), self.timeout)
+                if not line:
+                    break
+                lines.append(line.decode(FTP_ENCODING).rstrip("\r\n"))
+        finally:
+            writer.close()
+        await self.voidresp()
+        return lines
+
+    async def retr(self, fname, write, rest=None):
+        """RETR ``fname`` from offset ``rest``, passing each block to ``write``."""
+        await self.set_type("I")
+        reader, writer = await self._transfer(f"RETR {fname}", rest)
+        try:
+            while True:
+                data = await with_timeout(reader.read(FTP_BLOCK_SIZE), self.timeout)
+                if not data:
+                    break
+                await write(data)
+        finally:
+            writer.close()
+        await self.voidresp()
+
+    async def size(self, fname):
+        await self.set_type("I")  # SIZE is refused in ASCII mode
+        resp = await self.sendcmd(f"SIZE {fname}")
+        if resp[:3] == "213":
+            return int(resp[3:].strip())
+        return None
+
+    async def chdir(self, path):
+        # Pooled sessions keep their working directory between uses
+        if not path or not path.startswith("/"):
+            await self.voidcmd(f"CWD {self.home}")
+        if path:
+            await self.voidcmd(f"CWD {path}")
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    async def is_alive(self):
+        try:
+            await self.voidcmd("NOOP")
+            return True
+        except Exception:
+            return False
+
+    async def keepalive(self):
+        await self.voidcmd("NOOP")
+
+    def abort(self):
+        self.writer.close()
+
+    async def close(self):
+        try:
+            await with_timeout(self.sendcmd("QUIT"), CONNECT_TIMEOUT)
+        except Exception:
+            pass
+        self.abort()
+
+
+class AsyncSFTPSession:
+    """An asyncssh connection and SFTP channel held by the async pool.
+
+    asyncssh's missing-file and permission errors come out as
+    ``FileNotFoundError`` and ``PermissionError``, as from paramiko.
+    """
+
+    recoverable = (FileNotFoundError, PermissionError)
+
+    def __init__(self, conn, sftp, home, timeout):
+        self.conn = conn
+        self.sftp = sftp
+        self.home = home
+        self.timeout = timeout
+
+    @classmethod
+    async def open(cls, site):
+        sock = await connect(site)
+        try:
+            with METRICS.timer("dgnet_login_seconds", host=site.host):
+                conn = await asyncssh.connect(
+                    sock=sock,
+                    username=site.user,
+                    password=site.password,
+                    # Same trust as the paramiko connector: no host key check,
+                    # no keys or agent, password only
+                    known_hosts=None,
+                    client_keys=None,
+                    agent_path=None,
+                    config=None,
+                    preferred_auth="password",
+                    login_timeout=READ_TIMEOUT,
+                    keepalive_interval=POOL_KEEPALIVE,
+                    window=SFTP_WINDOW_SIZE,
+                )
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            sftp = await with_timeout(conn.start_sftp_client(), READ_TIMEOUT)
+            home = await with_timeout(sftp.realpath("."), READ_TIMEOUT)
+            return cls(conn, sftp, home, HEALTH.read_timeout(site.host, READ_TIMEOUT))
+        except BaseException:
+            conn.abort()
+            raise
+
+    async def call(self, aw):
+        """Await an SFTP request with the read timeout and Python errors."""
+        try:
+            return await with_timeout(aw, self.timeout)
+        except asyncssh.SFTPNoSuchFile as e:
+            raise FileNotFoundError(errno.ENOENT, e.reason) from None
+        except asyncssh.SFTPPermissionDenied as e:
+            raise PermissionError(errno.EACCES, e.reason) from None
+
+    async def chdir(self, path):
+        # Pooled sessions keep their working directory between uses
+        if not path or not path.startswith("/"):
+            await self.call(self.sftp.chdir(self.home))
+        if path:
+            await self.call(self.sftp.chdir(path))
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    async def is_alive(self):
+        try:
+            await self.call(self.sftp.realpath("."))
+            return True
+        except Exception:
+            return False
+
+    async def keepalive(self):
+        await self.call(self.sftp.realpath("."))
+
+    def abort(self):
+        self.conn.abort()
+
+    async def close(self):
+        self.sftp.exit()
+        self.conn.close()
+        try:
+            await with_timeout(self.conn.wait_closed(), CONNECT_TIMEOUT)
+        except Exception:
+            pass
+
+
+class AsyncSessionPool:
+    """:class:`pool.ConnectionPool` for one event loop.
+
+    Same keys, per-host limits and keepalive rules; sessions provide
+    ``is_alive()``, ``keepalive()`` and ``close()`` as coroutines.
+    """
+
+    def __init__(
+        self,
+        max_per_host=POOL_MAX_PER_HOST,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        keepalive_interval=POOL_KEEPALIVE,
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._cond = asyncio.Condition()
+        self._idle = {}  # key -> [[session, last_used, last_keepalive], ...]
+        self._open = {}  # host -> sessions open (idle + checked out)
+        self._reaper = None
+
+    @asynccontextmanager
+    async def session(self, key, factory, limit=None):
+        sess = await self._acquire(key, factory, limit)
+        try:
+            yield sess
+        except getattr(sess, "recoverable", ()):
+            await self._release(key, sess)
+            raise
+        except BaseException:
+            await self._discard(key, sess)
+            raise
+        else:
+            await self._release(key, sess)
+
+    async def _acquire(self, key, factory, limit=None):
+        host = key[1]
+        cap = max(1, limit or self.max_per_host)
+        deadline = time.monotonic() + POOL_ACQUIRE_TIMEOUT
+        while True:
+            stale = evicted = None
+            async with self._cond:
+                idle = self._idle.get(key)
+                if idle:
+                    sess, last_used, _ = idle.pop()
+                    # Sessions idle past a keepalive interval may have been
+                    # dropped by the receiver; check before handing them out
+                    if time.monotonic() - last_used < self.keepalive_interval:
+                        return sess
+                    stale = sess
+                elif self._open.get(host, 0) < cap:
+                    self._open[host] = self._open.get(host, 0) + 1
+                    break
+                else:
+                    evicted = self._pop_other_idle(host, key)
+                    if evicted is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolExhausted(f"No free session slot for {host}")
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+            if stale is not None:
+                if await stale.is_alive():
+                    return stale
+                logger.info(f"Pooled session to {host} went stale, reconnecting")
+                await self._discard(key, stale)
+            else:
+                await self._discard(key, evicted)
+
+        try:
+            sess = await factory()
+        except BaseException:
+            async with self._cond:
+                self._open[host] -= 1
+                self._cond.notify_all()
+            raise
+        self._ensure_reaper()
+        return sess
+
+    def _pop_other_idle(self, host, key):
+        # An idle session for another user/port on the host, to free its slot
+        for other, idle in self._idle.items():
+            if other != key and other[1] == host and idle:
+                return idle.pop(0)[0]
+        return None
+
+    async def _release(self, key, sess):
+        now = time.monotonic()
+        async with self._cond:
+            self._idle.setdefault(key, []).append([sess, now, now])
+            self._cond.notify_all()
+
+    async def _discard(self, key, sess):
+        async with self._cond:
+            self._open[key[1]] = max(0, self._open.get(key[1], 0) - 1)
+            self._cond.notify_all()
+        try:
+            await sess.close()
+        except Exception:
+            pass
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        interval = max(1, min(self.keepalive_interval, self.idle_timeout) / 2)
+        while True:
+            await asyncio.sleep(interval)
+            await self.reap()
+
+    async def reap(self):
+        """Close sessions idle past the timeout and keep the rest alive."""
+        now = time.monotonic()
+        expired = []
+        to_ping = []
+        async with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for entry in idle:
+                    if now - entry[1] >= self.idle_timeout:
+                        expired.append((key, entry[0]))
+                    elif now - entry[2] >= self.keepalive_interval:
+                        to_ping.append((key, entry))
+                    else:
+                        keep.append(entry)
+                idle[:] = keep
+        for key, sess in expired:
+            await self._discard(key, sess)
+
+        async def ping(key, entry):
+            try:
+                await entry[0].keepalive()
+            except Exception as e:
+                logger.info(f"Keepalive to {key[1]} failed, dropping session: {e}")
+                await self._discard(key, entry[0])
+                return
+            entry[2] = time.monotonic()
+            async with self._cond:
+                self._idle.setdefault(key, []).append(entry)
+                self._cond.notify_all()
+
+        await asyncio.gather(*(ping(key, entry) for key, entry in to_ping))
+
+    async def close_all(self):
+        async with self._cond:
+            idle = [(key, entry[0]) for key, entries in self._idle.items() for entry in entries]
+            self._idle.clear()
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await asyncio.gather(*(self._discard(key, sess) for key, sess in idle))
+
+
+# One pool per event loop: asyncio sessions cannot move between loops
+_pools = weakref.WeakKeyDictionary()
+
+
+def session_pool():
+    """The session pool of the running event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = AsyncSessionPool()
+    return pool
+
+
+async def finish_download(site, started, part_path, offset, local_path, remote_size):
+    """Record the transfer and publish the ``.part`` file, on a worker thread."""
+
+    def finish():
+        record_download(site, started, part_path, offset)
+        return finish_part(part_path, local_path, remote_size)
+
+    return await asyncio.to_thread(finish)
+
+
+class AsyncFTPConnector:
+    @staticmethod
+    def session(site):
+        return session_pool().session(
+            pool_key(site), lambda: AsyncFTPSession.open(site), site.max_sessions
+        )
+
+    @staticmethod
+    @retry_on_network_error(default=([], {}))
+    async def list_and_size(site, expected=None, path=None):
+        path = site.path if path is None else path
+        started = time.monotonic()
+        try:
+            async with AsyncFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                if use_filtered_listing(site, path, expected, FTP_FILTER_MAX_EXPECTED):
+                    files, sizes = await AsyncFTPConnector._list_expected(sess, expected)
+                else:
+                    files, sizes = await AsyncFTPConnector._list_full(sess, site, expected)
+                    remember_dir_size(site, path, len(files))
+            record_listing(site, started, files)
+            return files, sizes
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            return ftp_listing_failed(site, path, e)
+
+    @staticmethod
+    async def _list_full(sess, site, expected=None):
+        """:meth:`FTPConnector._list_full`, sharing its per-host choices."""
+        for method in list_methods(site):
+            try:
+                lines = await sess.lines(method)
+            except (ftplib.error_perm, ftplib.error_temp, ftplib.error_reply) as e:
+                if not list_method_failed(site, method, e):
+                    raise
+                continue
+            if method == "MLSD":
+                files, sizes, unparsed = AsyncFTPConnector._parse_mlsd(lines)
+            elif method == "LIST":
+                files, sizes, unparsed = parse_listing(lines)
+            else:
+                files, sizes, unparsed = lines, {}, 0
+            if files or not unparsed:
+                break
+            # One odd listing is not a refusal; fall back for this call only
+            logger.info(f"{site.host}: no {method} line recognised, trying the next command")
+
+        for f in sizes_wanted(method, files, unparsed, expected):
+            add_size(method, files, sizes, f, await AsyncFTPConnector._size_of(sess, f))
+        return files, sizes
+
+    @staticmethod
+    def _parse_mlsd(lines):
+        files = []
+        sizes = {}
+        for line in lines:
+            text, _, name = line.partition(" ")
+            facts = {}
+            for fact in text.rstrip(";").split(";"):
+                key, _, value = fact.partition("=")
+                facts[key.lower()] = value
+            if facts.get("type") == "file":
+                files.append(name)
+                sizes[name] = int(facts.get("size", 0))
+        return files, sizes, 0
+
+    @staticmethod
+    async def _size_of(sess, name):
+        """SIZE of ``name``, or None if the server will not say."""
+        try:
+            return await sess.size(name)
+        except (ftplib.error_perm, ftplib.error_temp) as e:
+            if propagates_async(e):
+                raise
+            return None
+
+    @staticmethod
+    async def _mdtm(sess, name):
+        """MDTM of ``name`` as a POSIX timestamp, or None if the server will not say."""
+        try:
+            return ftp_time((await sess.sendcmd(f"MDTM {name}"))[4:])
+        except ftplib.error_perm:
+            return None
+
+    @staticmethod
+    async def _list_expected(sess, expected):
+        names = set(expected)
+        try:
+            listed = await sess.lines(f"NLST {glob_for(names)}")
+        except ftplib.error_perm as e:
+            if not ftp_not_found(e):
+                raise
+            listed = []  # no file matches the glob
+        # Some servers return paths or ignore the glob; keep expected names only
+        files = sorted({n.rsplit("/", 1)[-1] for n in listed} & names)
+        sizes = {f: await AsyncFTPConnector._size_of(sess, f) or 0 for f in files}
+        return files, sizes
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def dir_mtime(site, path=None):
+        """Modify time of the remote directory from MLST, or None."""
+        path = site.path if path is None else path
+        if (site.host, site.port) in _no_dir_mtime:
+            return None
+        try:
+            async with AsyncFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                resp = await sess.sendcmd("MLST")
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            return dir_mtime_failed(site, path, e)
+        return ftp_dir_mtime(site, resp)
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def stat(site, fname, path=None):
+        """``(size, mtime)`` of a remote file, or None if it is not there."""
+        path = site.path if path is None else path
+        try:
+            async with AsyncFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                try:
+                    facts = mlst_facts(await sess.sendcmd(f"MLST {fname}"))
+                except ftplib.error_perm as e:
+                    if not mlst_refused(e):
+                        raise
+                    facts = {}  # no MLST; SIZE and MDTM instead
+                if "size" in facts:
+                    return int(facts["size"]), ftp_time(facts.get("modify", ""))
+                return await sess.size(fname), await AsyncFTPConnector._mdtm(sess, fname)
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            return ftp_stat_failed(site, fname, e)
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def remote_hash(site, fname, path=None):
+        """:meth:`FTPConnector.remote_hash`, sharing its per-host choice."""
+        path = site.path if path is None else path
+        commands = hash_commands(site)
+        if not commands:
+            return None
+        try:
+            async with AsyncFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                await sess.chdir(path)
+                for command, algo, digits in commands:
+                    try:
+                        if command == "HASH":
+                            await sess.sendcmd("OPTS HASH SHA-256")
+                        resp = await sess.sendcmd(f"{command} {fname}")
+                    except ftplib.error_perm as e:
+                        if ftp_not_found(e):
+                            return None  # file itself is the problem
+                        continue
+                    digest = hash_reply(site, command, digits, resp)
+                    if digest:
+                        return algo, digest
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.warning(f"FTP checksum query failed for {site.host}/{fname}: {e}")
+            return None
+        no_hash_command(site)
+        return None
+
+    @staticmethod
+    @retry_on_network_error(default=False)
+    async def download(site, fname, local_path, remote_size=None, path=None):
+        path = site.path if path is None else path
+        try:
+            started = time.monotonic()
+            async with AsyncFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                await sess.chdir(path)
+                remote_mtime = None
+                if not site.verify_checksum and await asyncio.to_thread(
+                    resumable_local, local_path, remote_size
+                ):
+                    remote_mtime = await AsyncFTPConnector._mdtm(sess, fname)
+                part_path, offset = await asyncio.to_thread(
+                    open_part, local_path, remote_size, remote_mtime, site.verify_checksum
+                )
+                throttle = BANDWIDTH.async_throttle(site)
+                try:
+                    mode = "ab" if offset else "wb"
+                    async with async_writer(part_path, mode, throttle) as write:
+                        await sess.retr(fname, write, offset)
+                except ftplib.error_perm as e:
+                    if not rest_refused(site, fname, offset, e):
+                        raise
+                    offset = 0
+                    async with async_writer(part_path, "wb", throttle) as write:
+                        await sess.retr(fname, write)
+            return await finish_download(
+                site, started, part_path, offset, local_path, remote_size
+            )
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.error(f"FTP download failed for {site.host}/{fname}: {e}")
+            return False
+
+
+class AsyncSFTPConnector:
+    @staticmethod
+    def session(site):
+        return session_pool().session(
+            pool_key(site), lambda: AsyncSFTPSession.open(site), site.max_sessions
+        )
+
+    @staticmethod
+    @retry_on_network_error(default=([], {}))
+    async def list_and_size(site, expected=None, path=None):
+        if not site.host:
+            logger.warning(f"SFTP site {site.name} has no host configured, skipping")
+            return [], {}
+        path = site.path if path is None else path
+        started = time.monotonic()
+        try:
+            async with AsyncSFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                if use_filtered_listing(site, path, expected, SFTP_FILTER_MAX_EXPECTED):
+                    files, sizes = await AsyncSFTPConnector._stat_expected(sess, expected)
+                    record_listing(site, started, files)
+                    return files, sizes
+                names = await sess.call(sess.sftp.readdir("."))
+            names = [n for n in names if n.filename not in (".", "..")]
+            files = [n.filename for n in names]
+            sizes = {n.filename: n.attrs.size or 0 for n in names}
+            remember_dir_size(site, path, len(files))
+            record_listing(site, started, files)
+            return files, sizes
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.error(f"SFTP list_and_size failed for {site.host}: {e}")
+            return [], {}
+
+    @staticmethod
+    async def _stat_expected(sess, expected):
+        async def stat(name):
+            try:
+                return name, await sess.call(sess.sftp.stat(name))
+            except FileNotFoundError:
+                return name, None
+
+        # One channel, so the stats can all be in flight at once
+        found = await asyncio.gather(*(stat(name) for name in sorted(expected)))
+        files = [name for name, attrs in found if attrs is not None]
+        sizes = {name: attrs.size or 0 for name, attrs in found if attrs is not None}
+        return files, sizes
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def dir_mtime(site, path=None):
+        """Modify time of the remote directory from stat, or None."""
+        path = site.path if path is None else path
+        try:
+            async with AsyncSFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                return (await sess.call(sess.sftp.stat("."))).mtime
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.debug(f"SFTP dir_mtime failed for {site.host}:{path}: {e}")
+            return None
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def stat(site, fname, path=None):
+        """``(size, mtime)`` of a remote file, or None if it is not there."""
+        path = site.path if path is None else path
+        try:
+            async with AsyncSFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                await sess.chdir(path)
+                attrs = await sess.call(sess.sftp.stat(fname))
+            return attrs.size, attrs.mtime
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.warning(f"SFTP stat failed for {site.host}/{fname}: {e}")
+            return None
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    async def remote_hash(site, fname, path=None):
+        """:meth:`SFTPConnector.remote_hash`, on the pooled SSH connection."""
+        path = site.path if path is None else path
+        command = sha256sum_command(site, fname, path)
+        if command is None:
+            return None
+        try:
+            async with AsyncSFTPConnector.session(site) as sess:
+                result = await with_timeout(
+                    sess.conn.run(command, check=False),
+                    HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT),
+                )
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.warning(f"SSH checksum query failed for {site.host}/{fname}: {e}")
+            return None
+        return sha256sum_reply(site, result.exit_status, result.stdout or "")
+
+    @staticmethod
+    @retry_on_network_error(default=False)
+    async def download(site, fname, local_path, remote_size=None, path=None):
+        if not site.host:
+            logger.warning(f"SFTP site {site.name} has no host configured, skipping")
+            return False
+        path = site.path if path is None else path
+        try:
+            started = time.monotonic()
+            async with AsyncSFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                await sess.chdir(path)
+                remote_mtime = None
+                if not site.verify_checksum and await asyncio.to_thread(
+                    resumable_local, local_path, remote_size
+                ):
+                    remote_mtime = (await sess.call(sess.sftp.stat(fname))).mtime
+                part_path, offset = await asyncio.to_thread(
+                    open_part, local_path, remote_size, remote_mtime, site.verify_checksum
+                )
+                # Each read is split into up to max_requests parallel requests
+                rf = await sess.call(
+                    sess.sftp.open(fname, "rb", max_requests=SFTP_MAX_REQUESTS)
+                )
+                try:
+                    mode = "ab" if offset else "wb"
+                    throttle = BANDWIDTH.async_throttle(site)
+                    async with async_writer(part_path, mode, throttle) as write:
+                        pos = offset
+                        while True:
+                            data = await sess.call(rf.read(SFTP_READ_CHUNK, pos))
+                            if not data:
+                                break
+                            pos += len(data)
+                            await write(data)
+                finally:
+                    await sess.call(rf.close())
+            return await finish_download(
+                site, started, part_path, offset, local_path, remote_size
+            )
+        except Exception as e:
+            if propagates_async(e):
+                raise
+            logger.error(f"SFTP download failed for {site.host}/{fname}: {e}")
+            return False
+
+
+class ThreadedSFTPConnector:
+    """The blocking SFTP connector on worker threads, when asyncssh is missing."""
+
+    @staticmethod
+    async def list_and_size(site, expected=None, path=None):
+        return await asyncio.to_thread(SFTPConnector.list_and_size, site, expected, path)
+
+    @staticmethod
+    async def dir_mtime(site, path=None):
+        return await asyncio.to_thread(SFTPConnector.dir_mtime, site, path)
+
+    @staticmethod
+    async def stat(site, fname, path=None):
+        return await asyncio.to_thread(SFTPConnector.stat, site, fname, path)
+
+    @staticmethod
+    async def remote_hash(site, fname, path=None):
+        return await asyncio.to_thread(SFTPConnector.remote_hash, site, fname, path)
+
+    @staticmethod
+    async def download(site, fname, local_path, remote_size=None, path=None):
+        return await asyncio.to_thread(
+            SFTPConnector.download, site, fname, local_path, remote_size, path
+        )
+
+
+SFTP_CONNECTOR = AsyncSFTPConnector if asyncssh else ThreadedSFTPConnector
+
+
+def get(protocol):
+    """Async connector for ``protocol``, like ``ConnectorFactory.get``."""
+    return AsyncFTPConnector if protocol == "ftp" else SFTP_CONNECTOR
+
+
+class EventLoopThread:
+    """An event loop on a daemon thread, started on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="connector-loop", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """Run ``coro`` on the loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        """Close the loop's pooled sessions, stop the loop and close it."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is None:
+            return
+
+        async def close():
+            await session_pool().close_all()
+            await loop.shutdown_asyncgens()
+            await loop.shutdown_default_executor()  # asyncio.to_thread workers
+
+        try:
+            asyncio.run_coroutine_threadsafe(close(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+LOOP = EventLoopThread()
+
+
+class SyncConnector:
+    """Blocking facade over an async connector, for the threaded callers.
+
+    Calls run on :data:`LOOP`, so sessions from every calling thread share
+    one event loop and pool, and its per-host limit.
+    """
+
+    def __init__(self, connector):
+        self.connector = connector
+
+    def list_and_size(self, site, expected=None, path=None):
+        return LOOP.run(self.connector.list_and_size(site, expected, path))
+
+    def dir_mtime(self, site, path=None):
+        return LOOP.run(self.connector.dir_mtime(site, path))
+
+    def stat(self, site, fname, path=None):
+        return LOOP.run(self.connector.stat(site, fname, path))
+
+    def download(self, site, fname, local_path, remote_size=None, path=None):
+        return LOOP.run(
+            self.connector.download(site, fname, local_path, remote_size, path)
+        )
+
+    def remote_hash(self, site, fname, path=None):
+        return LOOP.run(self.connector.remote_hash(site, fname, path))
+
+
+SYNC_CONNECTORS = {
+    "ftp": SyncConnector(AsyncFTPConnector),
+    "sftp": SyncConnector(SFTP_CONNECTOR),
+}
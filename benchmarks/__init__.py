@@ -0,0 +1 @@
+"""Benchmarks for the scan/download cycle; run with ``python -m benchmarks.run``."""
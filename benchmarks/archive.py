@@ -0,0 +1,64 @@
+"""Synthetic GNSS receiver archives for the stand-in servers."""
+
+import datetime
+import os
+import random
+from datetime import timezone
+
+from models import SiteConfig
+from scanner import FilePatternGenerator
+
+BLOCK = bytes(range(256)) * 256  # 64 KiB of filler, repeated per file
+
+
+def make_sites(count, protocol, host, port, user, password, local_root, **kw):
+    """``count`` hourly sites, one remote directory each."""
+    sites = []
+    for i in range(count):
+        name = f"B{i:03d}"
+        sites.append(
+            SiteConfig(
+                name=name,
+                host=host,
+                protocol=protocol,
+                user=user,
+                password=password,
+                path=f"/site{i:03d}",
+                pattern=f"{name}%j%H.T02",
+                frequency=kw.get("frequency", "hourly"),
+                network="BENCH",
+                station_code=name,
+                output_dir=os.path.join(local_root, name),
+                port=port,
+                max_sessions=kw.get("max_sessions", 2),
+                listing_ttl=0,
+            )
+        )
+    return sites
+
+
+def populate(remote_root, sites, days, file_size, missing=0.0, seed=0):
+    """Write every published file of ``days`` for each site.
+
+    Sessions that have not started yet are skipped and a ``missing``
+    fraction of the rest is left out, so scans see realistic gaps.
+    Returns the number of files and bytes written.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now(timezone.utc)
+    files = written = 0
+    for site in sites:
+        directory = os.path.join(remote_root, site.path.lstrip("/"))
+        os.makedirs(directory, exist_ok=True)
+        for exp in FilePatternGenerator.generate(site, days):
+            if exp["dt"] > now or rng.random() < missing:
+                continue
+            with open(os.path.join(directory, exp["file"]), "wb") as f:
+                remaining = file_size
+                while remaining > 0:
+                    chunk = BLOCK[: min(remaining, len(BLOCK))]
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            files += 1
+            written += file_size
+    return files, written
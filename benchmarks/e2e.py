@@ -0,0 +1,200 @@
+"""End-to-end benchmarks against local FTP/SFTP stand-in receivers.
+
+Sites are spread over several receivers, each bound to its own loopback
+address (127.0.0.2, 127.0.0.3, ...) so per-host session limits behave as
+they do against real stations. Where extra loopback addresses cannot be
+bound (e.g. macOS) every site shares 127.0.0.1.
+"""
+
+import asyncio
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aioconnectors
+import connectors
+from connectors import ConnectorFactory
+from health import HEALTH
+from manager import FTPSiteManager
+from metrics import METRICS
+from models import FileStatus
+from pool import POOL
+from scanner import SiteScanner
+
+from benchmarks.archive import make_sites, populate
+from benchmarks.micro import best_of
+from benchmarks.servers import PASSWORD, SERVERS, USER
+
+
+def _loopback_hosts(count):
+    hosts = []
+    for i in range(count):
+        host = f"127.0.0.{i + 2}"
+        try:
+            with socket.socket() as s:
+                s.bind((host, 0))
+        except OSError:
+            return ["127.0.0.1"]
+        hosts.append(host)
+    return hosts
+
+
+def _reset():
+    POOL.close_all()
+    connectors._dir_entries.clear()
+    connectors._list_method.clear()
+    HEALTH.reset()
+    METRICS.reset()
+
+
+def _total(counter):
+    samples = METRICS.to_dict().get(counter, {}).get("samples", [])
+    return sum(sample["value"] for sample in samples)
+
+
+def _spread(sites, servers):
+    for i, site in enumerate(sites):
+        server = servers[i % len(servers)]
+        site.host, site.port = server.host, server.port
+    return sites
+
+
+def _list_all(protocol, sites):
+    """Seconds to list every site at once: a thread per site, then asyncio.
+
+    Both start from empty pools, so logins are part of the time.
+    """
+    POOL.close_all()
+    connector = ConnectorFactory.get(protocol)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(sites)) as executor:
+        list(executor.map(connector.list_and_size, sites))
+    threads = time.perf_counter() - start
+    POOL.close_all()
+
+    async def list_async():
+        connector = aioconnectors.get(protocol)
+        await asyncio.gather(*(connector.list_and_size(site) for site in sites))
+        await aioconnectors.session_pool().close_all()
+
+    start = time.perf_counter()
+    asyncio.run(list_async())
+    return threads, time.perf_counter() - start
+
+
+def run(protocol, site_counts, days=1, file_size=1 << 20, missing=0.1, receivers=8, proxy=None):
+    """Results as {name: {"value", "unit"}}; {} if the server is unavailable.
+
+    ``proxy(server)`` may wrap each stand-in and return an object with
+    ``host``/``port`` the sites should connect to instead (fault injection).
+    """
+    server_cls = SERVERS[protocol]
+    if not server_cls.available:
+        print(f"{protocol}: stand-in server not available, skipping")
+        return {}
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="dgnet-bench-") as tmp:
+        remote = os.path.join(tmp, "remote")
+        archive = make_sites(max(site_counts), protocol, "", 0, USER, PASSWORD, tmp)
+        files, size = populate(remote, archive, days, file_size, missing)
+        print(f"{protocol}: archive of {files} files, {size / 1e6:.0f} MB")
+
+        servers = [server_cls(remote, host).start() for host in _loopback_hosts(receivers)]
+        endpoints = [proxy(s) for s in servers] if proxy else servers
+        try:
+            for n in site_counts:
+                workdir = os.path.join(tmp, f"run-{n}")
+                os.makedirs(workdir)
+                os.chdir(workdir)
+                _reset()
+                results.update(_run_sites(protocol, n, days, workdir, endpoints))
+        finally:
+            os.chdir(cwd)
+            _reset()
+            for endpoint in endpoints:
+                if endpoint not in servers:
+                    endpoint.stop()
+            for server in servers:
+                server.stop()
+    return results
+
+
+def _run_sites(protocol, n, days, workdir, endpoints):
+    results = {}
+    prefix = f"{protocol}.{n}sites"
+    manager = FTPSiteManager()
+    manager.config.metrics_prometheus = manager.config.metrics_json = ""
+    sites = _spread(
+        make_sites(n, protocol, "", 0, USER, PASSWORD, os.path.join(workdir, "local")),
+        endpoints,
+    )
+    manager.sites = sites
+
+    if n == 1:
+        site = sites[0]
+        conn = ConnectorFactory.get(protocol)
+        conn.list_and_size(site)  # log in once, as the pool would
+        results[f"{protocol}.list_and_size"] = {
+            "value": best_of(lambda: conn.list_and_size(site), 5),
+            "unit": "s",
+        }
+        scanner = SiteScanner()
+        results[f"{protocol}.scan_site"] = {
+            "value": best_of(lambda: scanner.scan_site(site, days), 3),
+            "unit": "s",
+        }
+        fname = next(
+            (
+                item.file
+                for item in manager.scanner.scan_site(site, days)
+                if item.remote_exists
+            ),
+            None,
+        )
+        if fname:
+            target = os.path.join(workdir, "single.bin")
+            start = time.perf_counter()
+            if conn.download(site, fname, target):
+                elapsed = time.perf_counter() - start
+                results[f"{protocol}.download"] = {"value": elapsed, "unit": "s"}
+                os.remove(target)
+
+    if n > 1:
+        threads, aio = _list_all(protocol, sites)
+        results[f"{prefix}.list_threads"] = {"value": threads, "unit": "s"}
+        results[f"{prefix}.list_asyncio"] = {"value": aio, "unit": "s"}
+
+    METRICS.reset()
+    start = time.perf_counter()
+    log = manager.scan_all(days)
+    elapsed = cycle = time.perf_counter() - start
+    results[f"{prefix}.scan_all"] = {"value": elapsed, "unit": "s"}
+    results[f"{prefix}.scan_rate"] = {"value": n / elapsed, "unit": "sites/s"}
+
+    items = [
+        item
+        for site_items in log.log.values()
+        for item in site_items
+        if item.status == FileStatus.MISSING_LOCALLY and not item.is_current_utc
+    ]
+    if items:
+        total = sum(item.remote_size for item in items)
+        start = time.perf_counter()
+        done = manager.download_missing(items)
+        elapsed = time.perf_counter() - start
+        cycle += elapsed
+        results[f"{prefix}.download_missing"] = {"value": elapsed, "unit": "s"}
+        results[f"{prefix}.download_rate"] = {"value": total / 1e6 / elapsed, "unit": "MB/s"}
+        results[f"{prefix}.files_rate"] = {"value": done / elapsed, "unit": "files/s"}
+        if done != len(items):
+            print(f"{prefix}: only {done} of {len(items)} downloads succeeded")
+        results[f"{prefix}.downloaded"] = {"value": done / len(items), "unit": "ratio"}
+    # Scan plus download: what one monitoring cycle costs
+    results[f"{prefix}.cycle"] = {"value": cycle, "unit": "s"}
+    for name in ("dgnet_retries_total", "dgnet_breaker_skips_total"):
+        results[f"{prefix}.{name[6:-6]}"] = {"value": _total(name), "unit": "count"}
+    manager.state.close()
+    return results
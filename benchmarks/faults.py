@@ -0,0 +1,494 @@
+"""Fault injection between the sites and the stand-in receivers.
+
+A FaultProxy is a TCP proxy in front of one stand-in server. It can add
+latency, cap the link bandwidth, stall or reset transfers part way
+through, hold back the login banner, and answer FTP commands itself
+(421 busy, 550 unavailable, ...). FTP passive data connections are
+proxied too: 227/229 replies are rewritten to point at the proxy.
+
+Scenarios are scripted per receiver host and plug into the e2e harness
+through its ``proxy`` hook:
+
+    python -m benchmarks.faults --scenario flaky --sites 10
+    python -m benchmarks.faults --scenario wan --host 127.0.0.2=hang
+    python -m benchmarks.faults --list
+"""
+
+import logging
+import queue
+import random
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+
+from transfer import TokenBucket
+
+from benchmarks.servers import FTPStandIn
+
+RECV_SIZE = 65536
+DATA_ACCEPT_TIMEOUT = 30  # seconds to wait for the client's data connection
+
+# Queue markers: end of stream, and end of stream followed by a reset
+_EOF = object()
+_CLOSE = object()
+
+_PASV = re.compile(rb"^227 .*?(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)")
+_EPSV = re.compile(rb"^(229 .*?\(\|\|\|)(\d+)(\|\).*)$", re.S)
+
+
+class Scenario:
+    """What a proxied receiver does to its traffic.
+
+    ``latency`` is added one way, in both directions, without limiting
+    pipelining. ``kbps`` caps the receiver-to-site rate shared by all its
+    connections. ``stall_after``/``stall_seconds`` pause a transfer once
+    that many bytes have passed, ``reset_after`` resets it (with
+    probability ``reset_rate`` per transfer) and ``login_delay`` holds
+    back the server banner. ``replies`` maps an FTP verb, or ``CONNECT``
+    for the greeting, to ``(reply, probability)``; a 421 reply closes the
+    control connection as a real server would. Transfers are FTP data
+    connections and whole SFTP connections.
+    """
+
+    def __init__(
+        self,
+        name="clean",
+        latency=0.0,
+        kbps=0,
+        login_delay=0.0,
+        stall_after=0,
+        stall_seconds=0.0,
+        reset_after=0,
+        reset_rate=1.0,
+        replies=None,
+    ):
+        self.name = name
+        self.latency = latency
+        self.kbps = kbps
+        self.login_delay = login_delay
+        self.stall_after = stall_after
+        self.stall_seconds = stall_seconds
+        self.reset_after = reset_after
+        self.reset_rate = reset_rate
+        self.replies = {k.upper(): v for k, v in (replies or {}).items()}
+
+    def __repr__(self):
+        return f"Scenario({self.name!r})"
+
+
+SCENARIOS = {
+    s.name: s
+    for s in (
+        Scenario("clean"),
+        Scenario("wan", latency=0.04, kbps=4096),
+        Scenario("satellite", latency=0.3, kbps=512),
+        Scenario("slow_login", login_delay=5),
+        Scenario("stalls", stall_after=256 * 1024, stall_seconds=5),
+        # Longer than DOWNLOAD_TIMEOUT, so the read times out
+        Scenario("hang", stall_after=256 * 1024, stall_seconds=75),
+        Scenario("flaky", reset_after=32 * 1024, reset_rate=0.3),
+        Scenario("busy", replies={"CONNECT": ("421 Too many connections", 0.3)}),
+        Scenario("missing", replies={"RETR": ("550 File unavailable", 0.1)}),
+        Scenario(
+            "worst",
+            latency=0.1,
+            kbps=1024,
+            login_delay=2,
+            reset_after=64 * 1024,
+            reset_rate=0.2,
+            replies={
+                "CONNECT": ("421 Too many connections", 0.2),
+                "RETR": ("550 File unavailable", 0.05),
+            },
+        ),
+    )
+}
+
+
+def scenario(spec):
+    """A Scenario from a preset name, or the Scenario itself."""
+    if isinstance(spec, Scenario):
+        return spec
+    try:
+        return SCENARIOS[spec]
+    except KeyError:
+        raise ValueError(
+            f"unknown scenario {spec!r}; choose from {', '.join(SCENARIOS)}"
+        ) from None
+
+
+def _close(sock, reset=False):
+    """Close ``sock``, with RST instead of FIN for a dropped link.
+
+    The shutdown wakes the thread blocked reading it; until that read
+    returns the kernel keeps the socket open, close() or not.
+    """
+    try:
+        if reset:
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            sock.shutdown(socket.SHUT_RD)
+        else:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+
+class _Stream:
+    """One direction of a link: a reader queues chunks, a writer delivers
+    them ``latency`` later, applying the link's faults on the way."""
+
+    def __init__(self, link, src, dst, transform=None, first_delay=0.0, faults=False):
+        self.link = link
+        self.src = src
+        self.dst = dst
+        self.transform = transform
+        self.first_delay = first_delay
+        self.faults = faults
+        self.sent = 0
+        self.queue = queue.Queue()
+
+    def start(self):
+        for target in (self._read, self._write):
+            threading.Thread(target=target, daemon=True, name="bench-fault").start()
+
+    def put(self, data):
+        self.queue.put((time.monotonic() + self.link.scenario.latency, data))
+
+    def _read(self):
+        try:
+            while True:
+                data = self.src.recv(RECV_SIZE)
+                if not data:
+                    break
+                if self.transform:
+                    data = self.transform(data)
+                if data:
+                    self.put(data)
+        except OSError:
+            pass
+        self.put(_EOF)
+
+    def _write(self):
+        s = self.link.scenario
+        try:
+            while True:
+                deadline, data = self.queue.get()
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if data is _EOF:
+                    self.link.eof(self.dst)
+                    return
+                if data is _CLOSE:
+                    self.link.close()
+                    return
+                if self.first_delay:
+                    time.sleep(self.first_delay)
+                    self.first_delay = 0
+                if self.faults:
+                    data = self._faults(s, data)
+                    if data is None:
+                        return
+                self.dst.sendall(data)
+                self.sent += len(data)
+        except OSError:
+            self.link.close()
+
+    def _faults(self, s, data):
+        before = self.sent
+        if s.reset_after and self.link.doomed and before + len(data) >= s.reset_after:
+            self.dst.sendall(data[: max(0, s.reset_after - before)])
+            self.link.proxy.count("resets")
+            self.link.close(reset=True)
+            return None
+        if s.stall_after and before < s.stall_after <= before + len(data):
+            self.link.proxy.count("stalls")
+            time.sleep(s.stall_seconds)
+        self.link.proxy.bucket.consume(len(data))
+        return data
+
+
+class _Link:
+    """One proxied connection: site <-> proxy <-> receiver."""
+
+    def __init__(self, proxy, client, upstream, parent=None, transfer=False):
+        self.proxy = proxy
+        self.scenario = proxy.scenario
+        self.client = client
+        self.upstream = upstream
+        self.parent = parent
+        self.doomed = transfer and proxy.roll(self.scenario.reset_rate)
+        self._closed = threading.Lock()
+        self._eofs = 0
+        self._buffers = {"client": b"", "server": b""}
+        ftp_control = proxy.ftp and not parent
+        login_delay = 0.0 if parent else self.scenario.login_delay
+        self.to_server = _Stream(
+            self,
+            client,
+            upstream,
+            transform=self._from_client if ftp_control else None,
+        )
+        self.to_client = _Stream(
+            self,
+            upstream,
+            client,
+            transform=self._from_server if ftp_control else None,
+            first_delay=login_delay,
+            faults=transfer,
+        )
+
+    def start(self):
+        self.to_server.start()
+        self.to_client.start()
+
+    def eof(self, sock):
+        """Pass on a half-close; the link closes once both sides are done."""
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        with self.proxy._lock:
+            self._eofs += 1
+            done = self._eofs == 2
+        if done:
+            self.close()
+
+    def close(self, reset=False):
+        if not self._closed.acquire(blocking=False):
+            return
+        for sock in (self.client, self.upstream):
+            _close(sock, reset)
+        if reset and self.parent:
+            # A dropped link takes the control connection with it
+            self.parent.close(reset=True)
+
+    def _lines(self, side, data):
+        buf = self._buffers[side] + data
+        *lines, self._buffers[side] = buf.split(b"\n")
+        return [line + b"\n" for line in lines]
+
+    def _from_client(self, data):
+        out = []
+        for line in self._lines("client", data):
+            verb = line.split(None, 1)[0].decode("ascii", "replace").upper() if line.strip() else ""
+            reply = self.proxy.injected(verb)
+            if reply is None:
+                out.append(line)
+                continue
+            self.to_client.put(reply.encode() + b"\r\n")
+            if reply.startswith("421"):
+                self.to_client.queue.put((0, _CLOSE))
+                break
+        return b"".join(out)
+
+    def _from_server(self, data):
+        return b"".join(self._rewrite(line) for line in self._lines("server", data))
+
+    def _rewrite(self, line):
+        m = _PASV.match(line)
+        if m:
+            h = ".".join(g.decode() for g in m.groups()[:4])
+            port = int(m.group(5)) * 256 + int(m.group(6))
+            local = self.proxy.relay(self, h, port)
+            a, b = divmod(local, 256)
+            addr = self.proxy.host.replace(".", ",")
+            return f"227 Entering Passive Mode ({addr},{a},{b}).\r\n".encode()
+        m = _EPSV.match(line)
+        if m:
+            local = self.proxy.relay(self, self.proxy.target[0], int(m.group(2)))
+            return m.group(1) + str(local).encode() + m.group(3)
+        return line
+
+
+class FaultProxy:
+    """TCP proxy in front of one receiver, applying ``scenario`` to every
+    connection opened after it is set (it may be changed at any time)."""
+
+    def __init__(self, server, spec="clean", ftp=None, seed=0):
+        self.target = (server.host, server.port)
+        self.ftp = isinstance(server, FTPStandIn) if ftp is None else ftp
+        self.host = server.host
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.bucket = None
+        self.scenario = scenario(spec)
+        self._sock = socket.create_server((self.host, 0))
+        self.port = self._sock.getsockname()[1]
+        self._links = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._accept, name="bench-fault-proxy", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def scenario(self):
+        return self._scenario
+
+    @scenario.setter
+    def scenario(self, spec):
+        self._scenario = scenario(spec)
+        self.bucket = TokenBucket(self._scenario.kbps * 1024)
+
+    def roll(self, probability):
+        with self._lock:
+            return probability >= 1 or self._rng.random() < probability
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def injected(self, verb):
+        """The reply to send instead of forwarding ``verb``, or None."""
+        rule = self.scenario.replies.get(verb)
+        if rule and self.roll(rule[1]):
+            self.count(f"reply {rule[0][:3]} {verb}")
+            return rule[0]
+        return None
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            self.count("connections")
+            reply = self.injected("CONNECT") if self.ftp else None
+            if reply is not None:
+                try:
+                    client.sendall(reply.encode() + b"\r\n")
+                except OSError:
+                    pass
+                client.close()
+                continue
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client.close()
+                continue
+            link = _Link(self, client, upstream, transfer=not self.ftp)
+            self._links.append(link)
+            link.start()
+
+    def relay(self, control, host, port):
+        """Listen for one passive data connection and proxy it to host:port."""
+        listener = socket.create_server((self.host, 0))
+        listener.settimeout(DATA_ACCEPT_TIMEOUT)
+
+        def serve():
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                return
+            finally:
+                listener.close()
+            try:
+                upstream = socket.create_connection((host, port))
+            except OSError:
+                client.close()
+                return
+            client.settimeout(None)
+            link = _Link(self, client, upstream, parent=control, transfer=True)
+            self._links.append(link)
+            link.start()
+
+        threading.Thread(target=serve, daemon=True, name="bench-fault-data").start()
+        return listener.getsockname()[1]
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+        for link in self._links:
+            link.close()
+
+
+class FaultInjector:
+    """Per-host scenario plan, usable as the e2e harness ``proxy`` hook.
+
+    ``plan`` maps a receiver host (or its index, in start order) to a
+    scenario; other receivers get ``default``. The proxies created are
+    kept in ``proxies`` so their scenario can be changed mid-run.
+    """
+
+    def __init__(self, plan=None, default="clean", seed=0):
+        self.plan = dict(plan or {})
+        self.default = default
+        self.seed = seed
+        self.proxies = []
+
+    def __call__(self, server):
+        index = len(self.proxies)
+        spec = self.plan.get(server.host, self.plan.get(index, self.default))
+        proxy = FaultProxy(server, spec, seed=self.seed + index)
+        self.proxies.append(proxy)
+        return proxy
+
+    def stats(self):
+        total = {}
+        for proxy in self.proxies:
+            for name, n in proxy.stats.items():
+                total[name] = total.get(name, 0) + n
+        return total
+
+
+def _plan(entries):
+    plan = {}
+    for entry in entries:
+        host, _, name = entry.partition("=")
+        scenario(name)  # validate
+        plan[int(host) if host.isdigit() else host] = name
+    return plan
+
+
+def main(argv=None):
+    from benchmarks import run
+
+    parser = run.build_parser()
+    parser.prog = "benchmarks.faults"
+    parser.description = "Run the e2e benchmarks through fault-injecting proxies."
+    parser.set_defaults(only="e2e", sites=[1, 10])
+    parser.add_argument("--scenario", default="clean", help="scenario for every receiver")
+    parser.add_argument(
+        "--host",
+        action="append",
+        default=[],
+        metavar="HOST=SCENARIO",
+        help="scenario for one receiver, by address or index (repeatable)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    args = parser.parse_args(argv)
+    if args.list:
+        base = vars(Scenario())
+        for s in SCENARIOS.values():
+            faults = {k: v for k, v in vars(s).items() if v != base[k] and k != "name"}
+            print(f"{s.name:12} {faults}")
+        return 0
+    scenario(args.scenario)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("pyftpdlib").setLevel(logging.WARNING)
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    # Retries and timeouts are the point here; keep the report readable
+    logging.getLogger("connectors").setLevel(logging.CRITICAL)
+
+    injector = FaultInjector(_plan(args.host), args.scenario, args.seed)
+    args.only = "e2e"
+    results = run.run_suite(args, proxy=injector)
+    print(f"\ninjected: {injector.stats() or 'nothing'}")
+    params = run.params_of(args)
+    params.pop("list", None)
+    run.report(results, params, args.label or args.scenario, save=not args.no_save)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Benchmark results history: one JSON line per run, compared run to run."""
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+HISTORY_FILE = os.path.join(RESULTS_DIR, "history.jsonl")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            cwd=os.path.dirname(RESULTS_DIR),
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def record(results, params, label="", path=HISTORY_FILE):
+    """Append a run; ``results`` maps benchmark name -> {"value", "unit"}."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    run = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "label": label,
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def load(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous(params, path=HISTORY_FILE):
+    """Latest recorded run with the same parameters, or None."""
+    for old in reversed(load(path)):
+        if old["params"] == params:
+            return old
+    return None
+
+
+# Units where a bigger number is better; everything else (durations,
+# retry counts) is better smaller
+HIGHER_IS_BETTER = {"MB/s", "items/s", "files/s", "sites/s", "ratio"}
+
+
+def compare(old, new):
+    """Rows of (name, old, new, change %, verdict) for shared benchmarks."""
+    rows = []
+    for name, cur in new["results"].items():
+        prev = old["results"].get(name)
+        if not prev or not prev["value"]:
+            continue
+        change = (cur["value"] - prev["value"]) / prev["value"] * 100
+        better = change > 0 if cur["unit"] in HIGHER_IS_BETTER else change < 0
+        verdict = "~" if abs(change) < 5 else ("better" if better else "WORSE")
+        rows.append((name, prev["value"], cur["value"], change, verdict))
+    return rows
@@ -0,0 +1,148 @@
+"""Micro-benchmarks: pattern generation, table filtering and the summary."""
+
+import datetime
+import random
+import time
+import types
+from datetime import timezone
+
+from models import FileStatus, MissingFilesLog, ScanResult, SiteConfig
+from report import SummaryAggregator, build_summary
+from scanner import FilePatternGenerator
+
+try:
+    from gui import FTPSiteGUI
+except ImportError:  # no tkinter on this machine
+    FTPSiteGUI = None
+
+
+def best_of(fn, repeat=3):
+    """Fastest of ``repeat`` calls, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def synthetic_log(items, sites=100, seed=0):
+    """A scan log of ``items`` hourly results spread over ``sites`` sites."""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    statuses = [FileStatus.OK] * 8 + [
+        FileStatus.MISSING_LOCALLY,
+        FileStatus.MISSING_REMOTELY,
+        FileStatus.SIZE_MISMATCH,
+    ]
+    log = MissingFilesLog()
+    per_site = max(1, items // sites)
+    for i in range(sites):
+        site = SiteConfig(
+            name=f"B{i:03d}",
+            host=f"10.0.{i // 250}.{i % 250}",
+            protocol="ftp",
+            pattern=f"B{i:03d}%j%H.T02",
+            frequency="hourly",
+            network="BENCH",
+            station_code=f"B{i:03d}",
+        )
+        results = []
+        for h in range(per_site):
+            dt = now - datetime.timedelta(hours=h)
+            status = rng.choice(statuses)
+            local = status not in (FileStatus.MISSING_LOCALLY,)
+            results.append(
+                ScanResult(
+                    site,
+                    dt.strftime(site.pattern),
+                    dt,
+                    status,
+                    local_exists=local,
+                    remote_exists=status != FileStatus.MISSING_REMOTELY,
+                    size_ok=status == FileStatus.OK,
+                    is_current_utc=h == 0,
+                    local_size=1 << 20 if local else 0,
+                    remote_size=1 << 20,
+                    local_mtime=dt.timestamp() if local else 0.0,
+                )
+            )
+        log.add(site.name, results)
+    return log
+
+
+def _table_view(log):
+    """Just enough of FTPSiteGUI for its filter/render methods, without Tk."""
+
+    class Var:
+        def __init__(self, value):
+            self.value = value
+
+        def get(self):
+            return self.value
+
+    class Table:
+        rows = []
+
+        def set_rows(self, rows):
+            self.rows = rows
+
+    view = types.SimpleNamespace(
+        full_log=log,
+        show_issues=Var(True),
+        filter_site=Var("All Stations"),
+        table=Table(),
+        _sorted_cache=(None, 0, []),
+        manager=types.SimpleNamespace(summary=SummaryAggregator()),
+    )
+    view._sorted_items = lambda: FTPSiteGUI._sorted_items(view)
+    return view
+
+
+def run(items=100_000, repeat=3):
+    """Results as {name: {"value", "unit"}}."""
+    results = {}
+
+    site = SiteConfig(name="G", host="", protocol="ftp", pattern="G%j%H%M.T02", frequency="15min")
+    days = max(1, items // 96)
+    seconds = best_of(lambda: FilePatternGenerator.generate(site, days), repeat)
+    results["micro.generate"] = {"value": days * 96 / seconds, "unit": "items/s"}
+
+    log = synthetic_log(items)
+    total = sum(len(v) for v in log.log.values())
+
+    if FTPSiteGUI is None:
+        print("tkinter not available, skipping table benchmarks")
+    else:
+        view = _table_view(log)
+        seconds = best_of(lambda: FTPSiteGUI._filter_only(view), 1)
+        results["micro.filter_first"] = {"value": seconds, "unit": "s"}
+        # Later refreshes reuse the cached sort order
+        seconds = best_of(lambda: FTPSiteGUI._filter_only(view), repeat)
+        results["micro.filter_refresh"] = {"value": seconds, "unit": "s"}
+        view.filter_site = type(view.show_issues)("B042")
+        seconds = best_of(lambda: FTPSiteGUI._filter_only(view), repeat)
+        results["micro.filter_one_site"] = {"value": seconds, "unit": "s"}
+        page = view.table.rows[:50]
+        seconds = best_of(lambda: [FTPSiteGUI._row_values(view, r) for r in page], repeat)
+        results["micro.render_page"] = {"value": seconds, "unit": "s"}
+
+    aggregator = SummaryAggregator()
+
+    def build():
+        for name, site_items in log.log.items():
+            aggregator.replace_site(name, site_items)
+
+    seconds = best_of(build, repeat)
+    results["micro.summary_build"] = {"value": total / seconds, "unit": "items/s"}
+    # What a summary refresh costs once the aggregator is current
+    results["micro.summary_query"] = {
+        "value": best_of(lambda: aggregator.summary(7), repeat),
+        "unit": "s",
+    }
+    results["micro.summary_oneshot"] = {
+        "value": best_of(lambda: build_summary(log, 7), repeat),
+        "unit": "s",
+    }
+    return results
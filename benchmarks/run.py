@@ -0,0 +1,101 @@
+"""Run the benchmark suite and compare with the previous run.
+
+    python -m benchmarks.run                       # micro + ftp/sftp, 1..200 sites
+    python -m benchmarks.run --only micro --items 100000
+    python -m benchmarks.run --protocol sftp --sites 1,10 --file-size 262144
+    python -m benchmarks.run --label "bigger FTP blocks"
+
+Every run is appended to benchmarks/results/history.jsonl and compared
+with the last run that used the same parameters.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Benchmarks import the application modules from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks import history  # noqa: E402
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description=__doc__.split("\n")[0])
+    parser.add_argument("--only", choices=["micro", "e2e"], help="run one group only")
+    parser.add_argument("--protocol", default="ftp,sftp", help="comma-separated")
+    parser.add_argument("--sites", type=_ints, default=[1, 10, 50, 200])
+    parser.add_argument("--days", type=int, default=2, help="days of archive per site")
+    parser.add_argument("--file-size", type=int, default=1 << 20, help="bytes per file")
+    parser.add_argument("--missing", type=float, default=0.1, help="fraction left unpublished")
+    parser.add_argument("--receivers", type=int, default=8, help="stand-in hosts")
+    parser.add_argument("--items", type=int, default=100_000, help="micro-benchmark log size")
+    parser.add_argument("--label", default="", help="note stored with the results")
+    parser.add_argument("--no-save", action="store_true", help="do not record this run")
+    return parser
+
+
+def run_suite(args, proxy=None):
+    """Results of the selected groups as {name: {"value", "unit"}}."""
+    results = {}
+    if args.only in (None, "micro"):
+        from benchmarks import micro
+
+        results.update(micro.run(args.items))
+    if args.only in (None, "e2e"):
+        from benchmarks import e2e
+
+        for protocol in args.protocol.split(","):
+            results.update(
+                e2e.run(
+                    protocol,
+                    args.sites,
+                    days=args.days,
+                    file_size=args.file_size,
+                    missing=args.missing,
+                    receivers=args.receivers,
+                    proxy=proxy,
+                )
+            )
+    return results
+
+
+def params_of(args):
+    params = vars(args).copy()
+    for key in ("label", "no_save"):
+        params.pop(key, None)
+    return params
+
+
+def report(results, params, label="", save=True):
+    previous = history.previous(params)
+    print(f"\n{'benchmark':45} {'value':>14} unit")
+    for name, r in sorted(results.items()):
+        print(f"{name:45} {r['value']:14.4f} {r['unit']}")
+    if previous:
+        print(f"\nCompared with {previous['time']} ({previous['commit'] or 'no commit'}):")
+        for name, old, new, change, verdict in history.compare(previous, {"results": results}):
+            print(f"{name:45} {old:12.4f} -> {new:12.4f} {change:+7.1f}% {verdict}")
+    if save:
+        history.record(results, params, label)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING)
+    # Stand-in servers log every session and every reset at shutdown
+    logging.getLogger("pyftpdlib").setLevel(logging.WARNING)
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    args = build_parser().parse_args(argv)
+    results = run_suite(args)
+    report(results, params_of(args), args.label, save=not args.no_save)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""In-process FTP and SFTP stand-ins for receiver archives.
+
+The FTP server needs pyftpdlib (``pip install pyftpdlib``); the SFTP one
+is built on paramiko's server classes. Both serve a local directory
+read-only on a loopback address and an ephemeral port.
+"""
+
+import os
+import posixpath
+import socket
+import threading
+
+import paramiko
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.ioloop import IOLoop
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    ThreadedFTPServer = None
+
+USER = "bench"
+PASSWORD = "bench"
+
+
+class FTPStandIn:
+    """pyftpdlib server, one thread per control connection like a receiver."""
+
+    available = ThreadedFTPServer is not None
+
+    def __init__(self, root, host="127.0.0.1"):
+        if not self.available:
+            raise RuntimeError("pyftpdlib is not installed")
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWORD, root, perm="elr")
+        handler = type(
+            "BenchFTPHandler",
+            (FTPHandler,),
+            {
+                "authorizer": authorizer,
+                "banner": "benchmark receiver",
+                "log_prefix": "",
+            },
+        )
+        # Own IOLoop: pyftpdlib servers share a global one by default
+        self.server = ThreadedFTPServer((host, 0), handler, ioloop=IOLoop())
+        self.host, self.port = self.server.address[:2]
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"timeout": 0.5, "handle_exit": False},
+            name="bench-ftp",
+            daemon=True,
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.close_all()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _LocalSFTP(paramiko.SFTPServerInterface):
+    """Read-only SFTP view of ``root``."""
+
+    def __init__(self, server, *args, root=None, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def canonicalize(self, path):
+        return posixpath.normpath(posixpath.join("/", path))
+
+    def _local(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            return [
+                paramiko.SFTPAttributes.from_stat(
+                    os.stat(os.path.join(local, name)), name
+                )
+                for name in os.listdir(local)
+            ]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            f = open(self._local(path), "rb")
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle = _Handle(flags)
+        handle.filename = self._local(path)
+        handle.readfile = f
+        return handle
+
+
+class _Auth(paramiko.ServerInterface):
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class SFTPStandIn:
+    """paramiko SSH server exposing ``root`` over the sftp subsystem."""
+
+    available = True
+    _host_key = None
+
+    def __init__(self, root, host="127.0.0.1"):
+        if SFTPStandIn._host_key is None:
+            SFTPStandIn._host_key = paramiko.RSAKey.generate(2048)
+        self.root = root
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, 0))
+        self._sock.listen(128)
+        self.host, self.port = self._sock.getsockname()[:2]
+        self._transports = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._accept, name="bench-sftp", daemon=True
+        )
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self._host_key)
+            transport.set_subsystem_handler(
+                "sftp", paramiko.SFTPServer, _LocalSFTP, root=self.root
+            )
+            self._transports.append(transport)
+            try:
+                transport.start_server(server=_Auth())
+            except (paramiko.SSHException, EOFError, OSError):
+                transport.close()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+        for transport in self._transports:
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+SERVERS = {"ftp": FTPStandIn, "sftp": SFTPStandIn}
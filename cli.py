@@ -0,0 +1,223 @@
+"""Headless entry point: hourly daemon and one-shot scan/download/summary.
+
+Nothing here imports tkinter, so it runs on archive servers, under systemd
+and from cron.
+"""
+
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+
+from manager import FTPSiteManager
+from report import build_summary, format_size, MISSING_STATUSES
+from schedule import SiteScheduler
+
+logger = logging.getLogger(__name__)
+
+SCAN_COLUMNS = [
+    ("site", "Log Name"),
+    ("date", "Date (UTC)"),
+    ("file", "File"),
+    ("local", "Local"),
+    ("local_size", "Local Size"),
+    ("remote", "Remote"),
+    ("remote_size", "Remote Size"),
+    ("status", "Status"),
+]
+
+
+def _print_table(headers, rows):
+    widths = [len(h) for h in headers]
+    for row in rows:
+        widths = [max(w, len(str(v))) for w, v in zip(widths, row)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def _select_sites(manager, names):
+    if not names:
+        return manager.sites
+    sites = [s for s in manager.sites if s.name in names]
+    unknown = set(names) - {s.name for s in sites}
+    if unknown:
+        raise SystemExit(f"Unknown site(s): {', '.join(sorted(unknown))}")
+    return sites
+
+
+def _scan_rows(log, issues_only):
+    rows = []
+    for site_items in log.log.values():
+        for item in site_items:
+            if (
+                issues_only
+                and item["status"] in ["ok", "scheduled"]
+                and not item.get("is_current_utc")
+            ):
+                continue
+            rows.append({key: item[key] for key, _ in SCAN_COLUMNS})
+    return rows
+
+
+def cmd_scan(manager, args):
+    log = manager.scan_all(args.days, sites=_select_sites(manager, args.site))
+    rows = _scan_rows(log, not args.all)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(
+            [title for _, title in SCAN_COLUMNS],
+            [
+                [
+                    format_size(r[k]) if k.endswith("_size") else r[k]
+                    for k, _ in SCAN_COLUMNS
+                ]
+                for r in rows
+            ],
+        )
+    return 1 if any(r["status"] in MISSING_STATUSES for r in rows) else 0
+
+
+def cmd_download(manager, args):
+    log, downloaded = manager.scan_and_download(
+        args.days,
+        args.delay,
+        download_cb=lambda msg: logger.info(msg),
+        sites=_select_sites(manager, args.site),
+    )
+    remaining = [
+        r for r in _scan_rows(log, True) if r["status"] in MISSING_STATUSES
+    ]
+    if args.json:
+        print(json.dumps({"downloaded": downloaded, "remaining": remaining}, indent=2))
+    else:
+        print(f"Downloaded {downloaded} files, {len(remaining)} still missing")
+    return 0
+
+
+def cmd_summary(manager, args):
+    sites = _select_sites(manager, args.site)
+    log = manager.scan_all(args.days, sites=sites)
+    groups = build_summary(log, args.days)
+    rows = [
+        {
+            "group": group,
+            "last_download": (
+                data["last_dt"].strftime("%Y-%m-%d %H:%M UTC")
+                if data["last_dt"]
+                else "Never"
+            ),
+            "last_file": data["last_file"],
+            "missing_count": len(data["missing"]),
+            "missing": sorted(data["missing"]),
+        }
+        for group, data in sorted(groups.items())
+    ]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(
+            ["Group", "Last Download", "Last File", "Missing Count"],
+            [
+                [r["group"], r["last_download"], r["last_file"] or "—", r["missing_count"]]
+                for r in rows
+            ],
+        )
+    return 0
+
+
+def cmd_daemon(manager, args):
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, stopping after runs in progress")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    def run(sites):
+        _, downloaded = manager.scan_and_download(
+            args.days,
+            args.delay,
+            progress_cb=lambda msg: logger.info(msg),
+            download_cb=lambda msg: logger.info(msg),
+            sites=sites,
+        )
+        logger.info(f"Scheduled run of {len(sites)} site(s) downloaded {downloaded} files")
+
+    scheduler = SiteScheduler(
+        run,
+        args.delay,
+        manager.config.schedule_spread_minutes,
+        manager.config.schedule_workers,
+    )
+    scheduler.start(manager.sites, run_now=True)
+    announced = None
+    while not stop.wait(60):
+        runs = scheduler.next_runs()
+        if runs and runs[0] != announced:
+            announced = runs[0]
+            due, name = announced
+            logger.info(f"Next run: {name} at {due.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+    scheduler.stop(wait=True)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="dgnet-ftp", description="DGnet FTP Monitor (headless mode)"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p, days=1):
+        p.add_argument("--days", type=int, default=days, help="days back to scan")
+        p.add_argument(
+            "--site", action="append", help="limit to this log name (repeatable)"
+        )
+        p.add_argument("--json", action="store_true", help="print JSON output")
+
+    p = sub.add_parser("scan", help="scan all sites and print file status")
+    common(p)
+    p.add_argument("--all", action="store_true", help="include ok/scheduled files")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("download", help="scan, then download completed files")
+    common(p)
+    p.add_argument(
+        "--delay", type=int, default=15, help="minutes after the hour a file is complete"
+    )
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("summary", help="per-station summary of missing files")
+    common(p, days=7)
+    p.set_defaults(func=cmd_summary)
+
+    p = sub.add_parser("daemon", help="scan and download each site on its own cadence")
+    p.add_argument("--days", type=int, default=1, help="days back to scan")
+    p.add_argument(
+        "--delay",
+        type=int,
+        default=15,
+        help="minutes after a file's session ends until it is complete "
+        "(sites may set their own publish_delay)",
+    )
+    p.set_defaults(func=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manager = FTPSiteManager()
+    try:
+        return args.func(manager, args)
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,27 @@
 class Config:
     def __init__(self):
         self.sites_file = "sites_config.json"
+        # Files already verified "ok", so closed days are not re-checked
+        self.state_file = "scan_state.db"
+        # Concurrent scan limits: total workers and sessions per receiver host
+        self.scan_workers = 16
+        self.scan_per_host = 2
+        # Parallel downloads: total workers and queue order ("oldest"/"newest")
+        self.download_workers = 8
+        self.download_priority = "oldest"
+        # Remote directory listings kept between scans (least recently used go)
+        self.listing_cache_dirs = 256
+        # Threads checking finished downloads (format sanity and checksums)
+        self.verify_workers = 2
+        # Download bandwidth cap across all sites in KB/s (0 = unlimited)
+        self.bandwidth_limit_kbps = 0
+        # Metrics written after every scan/download run ("" disables a file)
+        self.metrics_prometheus = "dgnet-ftp.prom"
+        self.metrics_json = "dgnet-ftp-metrics.json"
+        # Scheduler: minutes over which site start times are spread, and
+        # scheduled runs allowed in progress at once
+        self.schedule_spread_minutes = 10
+        self.schedule_workers = 4
+        # Connector backend: "thread" (one blocking session per thread) or
+        # "asyncio" (every session on one event loop; SFTP wants asyncssh)
+        self.connector_backend = "thread"
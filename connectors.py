@@ -1,9 +1,26 @@
 import ftplib
 import logging
+import os
+import re
+import shlex
 import socket
 import time
+from datetime import datetime, timezone
 from functools import wraps
-from paramiko import Transport, SFTPClient
+from paramiko import Transport, SFTPClient, SSHException
+from health import HEALTH
+from metrics import METRICS
+from transfer import (
+    BANDWIDTH,
+    FTP_BLOCK_SIZE,
+    SFTP_MAX_PACKET,
+    SFTP_MAX_REQUESTS,
+    SFTP_READ_CHUNK,
+    SFTP_WINDOW_SIZE,
+    WRITE_BUFFER,
+    writer,
+)
+from pool import POOL, POOL_KEEPALIVE, PoolExhausted
 
 logger = logging.getLogger(__name__)
 
@@ -12,216 +29,1014 @@ CONNECT_TIMEOUT = 10
 READ_TIMEOUT = 30
 DOWNLOAD_TIMEOUT = 60
 
+# Partial downloads are written here and renamed once complete
+PART_SUFFIX = ".part"
+
+# Listing strategy: directories at least this large (and this many times the
+# expected set) are queried for the expected names instead of dumped in full
+FULL_LISTING_MIN_ENTRIES = 2000
+FILTER_RATIO = 20
+FTP_FILTER_MAX_EXPECTED = 200  # NLST glob + one SIZE per expected hit
+
+# Full FTP listing commands, best first: MLSD and a parsed LIST return
+# sizes in one transfer, NLST needs a SIZE round-trip per file
+FTP_LIST_METHODS = ("MLSD", "LIST", "NLST")
+LIST_METHOD_RECHECK = 3600  # seconds before a refused command is tried again
+SFTP_FILTER_MAX_EXPECTED = 64  # one stat round-trip per expected name
+
+# Server-side checksum commands tried in order, with the algorithm each
+# returns and the length of its hex digest
+FTP_HASH_COMMANDS = (
+    ("HASH", "sha256", 64),  # after OPTS HASH SHA-256
+    ("XSHA256", "sha256", 64),
+    ("XMD5", "md5", 32),
+    ("XCRC", "crc32", 8),
+)
+
 # Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # seconds
 
 
-def retry_on_network_error(max_retries=MAX_RETRIES):
-    """Decorator to retry operations on transient network errors"""
+# Errors that say something about the link or the host, not the request...
+NETWORK_ERRORS = (OSError, EOFError, SSHException)
+# ...except these, which are answers from a working server
+REQUEST_ERRORS = (FileNotFoundError, PermissionError)
+
+
+def is_network_error(e):
+    if isinstance(e, ftplib.error_temp):
+        # 421: the server is closing the control connection (busy, idle)
+        return str(e).startswith("421")
+    return isinstance(e, NETWORK_ERRORS) and not isinstance(e, REQUEST_ERRORS)
+
+
+def propagates(e):
+    """Whether a connector lets ``e`` through to its retry decorator.
+
+    Network errors are counted and retried there. Waiting too long for a
+    local pool slot is passed up too, so it is neither logged as a
+    failed request nor taken as proof that the host works.
+    """
+    return is_network_error(e) or isinstance(e, PoolExhausted)
+
+
+def retry_on_network_error(default=None, max_retries=MAX_RETRIES):
+    """Retry transient network errors, guarded by the host's circuit breaker.
+
+    The wrapped function takes the site first and lets network errors
+    propagate. Healthy hosts get up to ``max_retries`` attempts with
+    exponential backoff, failing ones a single attempt, and hosts whose
+    breaker is open are skipped without touching the network. ``default``
+    is returned whenever the call could not be completed.
+    """
 
     def decorator(func):
         @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
+        def wrapper(site, *args, **kwargs):
+            host = site.host
+            attempts = HEALTH.attempts(host, max_retries)
+            for attempt in range(attempts):
+                if breaker_open(host, func.__name__):
+                    return default
                 try:
-                    return func(*args, **kwargs)
-                except (socket.timeout, socket.error, OSError, EOFError) as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        delay = RETRY_DELAY * (2**attempt)  # exponential backoff
-                        logger.warning(
-                            f"{func.__name__} attempt {attempt + 1} failed: {e}. Retrying in {delay}s..."
-                        )
-                        time.sleep(delay)
-                    else:
-                        logger.error(
-                            f"{func.__name__} failed after {max_retries} attempts: {e}"
-                        )
+                    result = func(site, *args, **kwargs)
+                except PoolExhausted as e:
+                    return pool_exhausted(host, func.__name__, e, default)
                 except Exception as e:
-                    # Non-retryable errors
-                    logger.error(
-                        f"{func.__name__} failed with non-retryable error: {e}"
-                    )
-                    raise
-            raise last_exception
+                    if not is_network_error(e):
+                        raise  # says nothing about the host either way
+                    delay = attempt_failed(host, func.__name__, attempt, attempts, e)
+                    if delay:
+                        time.sleep(delay)
+                    continue
+                HEALTH.success(host)
+                return result
+            return default
 
         return wrapper
 
     return decorator
 
 
-class FTPConnector:
-    @staticmethod
-    @retry_on_network_error()
-    def list_and_size(site):
-        ftp = None
+def pool_exhausted(host, call, e, default):
+    """``default`` for a call that got no pool slot; the host's health is untouched."""
+    logger.warning(f"{call} for {host} gave up waiting: {e}")
+    return default
+
+
+def breaker_open(host, call):
+    """Whether ``call`` must be skipped because ``host``'s breaker is open."""
+    if HEALTH.allow(host):
+        return False
+    logger.debug(f"{call} skipped, {host} is unavailable")
+    METRICS.inc("dgnet_breaker_skips_total", host=host)
+    return True
+
+
+def attempt_failed(host, call, attempt, attempts, e):
+    """Record network error ``e``; the backoff before the next attempt, or None."""
+    HEALTH.failure(host)
+    if attempt < attempts - 1:
+        METRICS.inc("dgnet_retries_total", host=host, call=call)
+        delay = RETRY_DELAY * (2**attempt)  # exponential backoff
+        logger.warning(f"{call} attempt {attempt + 1} failed: {e}. Retrying in {delay}s...")
+        return delay
+    logger.error(f"{call} failed for {host} after {attempt + 1} attempt(s): {e}")
+    return None
+
+
+def connect(site):
+    """TCP connect with a per-host adaptive timeout, feeding its RTT estimate.
+
+    A failed connect counts toward the host's breaker threshold like any
+    other network error, through the retry decorator: one slow SYN on a
+    satellite or GSM link must not take a working receiver out.
+    """
+    start = time.monotonic()
+    sock = socket.create_connection(
+        (site.host, site.port),
+        timeout=HEALTH.connect_timeout(site.host, CONNECT_TIMEOUT),
+    )
+    elapsed = time.monotonic() - start
+    HEALTH.observe(site.host, elapsed)
+    METRICS.observe("dgnet_connect_seconds", elapsed, host=site.host)
+    return sock
+
+
+class FTPSession:
+    """A logged-in FTP control connection held by the connection pool."""
+
+    # A 550 on CWD/RETR leaves the control connection usable
+    recoverable = (ftplib.error_perm,)
+
+    def __init__(self, ftp):
+        self.ftp = ftp
+        self.home = ftp.pwd()
+
+    @classmethod
+    def open(cls, site):
+        # Create socket with connect timeout, then use for FTP
+        sock = connect(site)
+        ftp = ftplib.FTP()
         try:
-            port = site.port
-            # Create socket with connect timeout, then use for FTP
-            sock = socket.create_connection((site.host, port), timeout=CONNECT_TIMEOUT)
-            ftp = ftplib.FTP()
             ftp.sock = sock
             ftp.af = sock.family
             ftp.file = ftp.sock.makefile("r", encoding=ftp.encoding)
             ftp.welcome = ftp.getresp()
-            ftp.sock.settimeout(READ_TIMEOUT)
-            ftp.login(site.user, site.password)
-            ftp.cwd(site.path)
-            files = []
-            sizes = {}
+            # ftp.timeout also bounds the passive data connections
+            ftp.timeout = HEALTH.read_timeout(site.host, READ_TIMEOUT)
+            ftp.sock.settimeout(ftp.timeout)
+            with METRICS.timer("dgnet_login_seconds", host=site.host):
+                ftp.login(site.user, site.password)
+            return cls(ftp)
+        except Exception:
+            ftp.close()
+            raise
+
+    def chdir(self, path):
+        # Pooled sessions keep their working directory between uses
+        if not path or not path.startswith("/"):
+            self.ftp.cwd(self.home)
+        if path:
+            self.ftp.cwd(path)
+
+    def settimeout(self, timeout):
+        self.ftp.timeout = timeout
+        self.ftp.sock.settimeout(timeout)
+
+    def is_alive(self):
+        try:
+            self.ftp.voidcmd("NOOP")
+            return True
+        except Exception:
+            return False
+
+    def keepalive(self):
+        self.ftp.voidcmd("NOOP")
+
+    def close(self):
+        try:
+            self.ftp.quit()
+        except Exception:
             try:
-                for entry in ftp.mlsd():
-                    name, facts = entry
-                    if "type" in facts and facts["type"] == "file":
-                        files.append(name)
-                        sizes[name] = int(facts.get("size", 0))
-                return files, sizes
-            except (ftplib.error_perm, ftplib.error_temp, ftplib.error_reply):
-                # MLSD not supported, fall back to NLST
+                self.ftp.close()
+            except Exception:
                 pass
-            files = ftp.nlst()
-            for f in files:
-                try:
-                    size = ftp.size(f)
-                    sizes[f] = size if size is not None else 0
-                except (ftplib.error_perm, ftplib.error_temp):
-                    sizes[f] = 0
+
+
+class SFTPSession:
+    """An authenticated SSH transport and SFTP channel held by the pool."""
+
+    # Missing or unreadable remote files leave the channel usable
+    recoverable = (FileNotFoundError, PermissionError)
+
+    def __init__(self, transport, sftp):
+        self.transport = transport
+        self.sftp = sftp
+
+    @classmethod
+    def open(cls, site):
+        # Create socket with connect timeout
+        sock = connect(site)
+        transport = Transport(
+            sock,
+            default_window_size=SFTP_WINDOW_SIZE,
+            default_max_packet_size=SFTP_MAX_PACKET,
+        )
+        try:
+            # Transport.connect() takes no timeout; these bound the handshake
+            transport.banner_timeout = READ_TIMEOUT
+            transport.auth_timeout = READ_TIMEOUT
+            with METRICS.timer("dgnet_login_seconds", host=site.host):
+                transport.connect(username=site.user, password=site.password)
+            transport.set_keepalive(POOL_KEEPALIVE)
+            sftp = SFTPClient.from_transport(
+                transport,
+                window_size=SFTP_WINDOW_SIZE,
+                max_packet_size=SFTP_MAX_PACKET,
+            )
+            return cls(transport, sftp)
+        except Exception:
+            transport.close()
+            raise
+
+    def chdir(self, path):
+        # Pooled sessions keep their working directory between uses
+        if not path or not path.startswith("/"):
+            self.sftp.chdir(None)
+        if path:
+            self.sftp.chdir(path)
+
+    def settimeout(self, timeout):
+        self.sftp.get_channel().settimeout(timeout)
+
+    def is_alive(self):
+        if not self.transport.is_active():
+            return False
+        try:
+            self.sftp.normalize(".")
+            return True
+        except Exception:
+            return False
+
+    def keepalive(self):
+        self.sftp.normalize(".")
+
+    def close(self):
+        for closeable in (self.sftp, self.transport):
+            try:
+                closeable.close()
+            except Exception:
+                pass
+
+
+def resumable_local(local_path, remote_size=None):
+    """Whether local_path is complete-looking but shorter than the remote file.
+
+    That is a "size mismatch" from a file that was still growing, which
+    :func:`open_part` may resume instead of fetching it all again.
+    """
+    return bool(
+        remote_size
+        and not os.path.exists(local_path + PART_SUFFIX)
+        and os.path.exists(local_path)
+        and 0 < os.path.getsize(local_path) < remote_size
+    )
+
+
+def open_part(local_path, remote_size=None, remote_mtime=None, checked=False):
+    """Return ``(part_path, offset)`` for a resumable download of local_path.
+
+    An existing ``.part`` file is resumed. A :func:`resumable_local` file
+    is taken as a prefix of the remote one and resumed too, but only when
+    it is older than the remote file (``remote_mtime``) or a checksum will
+    be compared (``checked``): a file replaced on the receiver would
+    otherwise be spliced onto the old one unnoticed.
+    """
+    part_path = local_path + PART_SUFFIX
+    if resumable_local(local_path, remote_size) and (
+        checked
+        or (remote_mtime is not None and os.path.getmtime(local_path) < remote_mtime)
+    ):
+        os.replace(local_path, part_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if remote_size and offset > remote_size:
+        # Remote file was replaced by a smaller one; start over
+        offset = 0
+    return part_path, offset
+
+
+def finish_part(part_path, local_path, remote_size=None):
+    """Atomically publish a finished ``.part`` file; False if still short."""
+    size = os.path.getsize(part_path)
+    if remote_size and size < remote_size:
+        logger.warning(
+            f"Transfer of {os.path.basename(local_path)} incomplete "
+            f"({size}/{remote_size} bytes), keeping {PART_SUFFIX} for resume"
+        )
+        return False
+    os.replace(part_path, local_path)
+    return True
+
+
+def probe(site, timeout=CONNECT_TIMEOUT):
+    """Cheap reachability check: TCP connect only, no login."""
+    try:
+        socket.create_connection((site.host, site.port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+# Entry count of the last full listing, per (host, port, path)
+_dir_entries = {}
+
+
+def remember_dir_size(site, path, entries):
+    _dir_entries[(site.host, site.port, path)] = entries
+
+
+def use_filtered_listing(site, path, expected, max_expected):
+    """Whether listing just ``expected`` beats a full directory dump.
+
+    Directories are listed in full until their size is known; after that a
+    small expected set in a large directory is looked up by name.
+    """
+    if not expected or len(expected) > max_expected:
+        return False
+    entries = _dir_entries.get((site.host, site.port, path))
+    return entries is not None and entries >= max(
+        FULL_LISTING_MIN_ENTRIES, len(expected) * FILTER_RATIO
+    )
+
+
+# Receivers that rejected a directory modify-time query, per (host, port)
+_no_dir_mtime = set()
+# Checksum command that worked last time per (host, port); None if none does
+_hash_command = {}
+# Listing command to start from per (host, port) after the receiver
+# refused a better one, with the monotonic time it expires
+_list_method = {}
+
+# LIST output: "-rw-r--r-- 1 owner group 1234 Jan  5 12:00 name" (Unix,
+# link count, owner and group each optional) and "01-05-24 12:00PM 1234
+# name" (DOS/IIS)
+_UNIX_LIST = re.compile(
+    r"^([-dlbcps])\S{9}\S*(?:\s+\S+){0,3}?\s+(\d+)\s+"
+    r"(?:\w{3}\s+\d{1,2}\s+(?:\d{1,2}:\d{2}|\d{4})|\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2})"
+    r"\s+(.+)$"
+)
+_DOS_LIST = re.compile(
+    r"^\d{2}-\d{2}-\d{2,4}\s+\d{1,2}:\d{2}\s*(?:[AaPp][Mm])?\s+(<DIR>|\d+)\s+(.+)$"
+)
+
+
+def parse_list_line(line):
+    """``(name, size)`` from one LIST line, size None for non-files.
+
+    Returns None for lines in neither the Unix nor the DOS format.
+    """
+    m = _UNIX_LIST.match(line)
+    if m:
+        kind, size, name = m.groups()
+        return name, int(size) if kind == "-" else None
+    m = _DOS_LIST.match(line)
+    if m:
+        size, name = m.groups()
+        return name, None if size == "<DIR>" else int(size)
+    return None
+
+
+def parse_listing(lines):
+    """``(files, sizes, unparsed)`` of LIST output; directories are left out."""
+    files = []
+    sizes = {}
+    unparsed = 0
+    for line in lines:
+        entry = parse_list_line(line)
+        if entry is None:
+            if line.strip() and not line.startswith("total "):
+                unparsed += 1
+        elif entry[1] is not None:
+            files.append(entry[0])
+            sizes[entry[0]] = entry[1]
+    return files, sizes, unparsed
+
+
+def list_methods(site):
+    """Full-listing commands to try for ``site``, best not refused first."""
+    key = (site.host, site.port)
+    start = _list_method.get(key)
+    if start is None:
+        return FTP_LIST_METHODS
+    if time.monotonic() >= start[1]:
+        # Receivers get upgraded; ask for the better commands again
+        _list_method.pop(key, None)  # another scan of the host may be first
+        return FTP_LIST_METHODS
+    return FTP_LIST_METHODS[FTP_LIST_METHODS.index(start[0]):]
+
+
+def list_method_failed(site, method, e):
+    """Whether a full listing may go on to the next command after ``e``.
+
+    Only a refusal of the command itself is remembered, for
+    ``LIST_METHOD_RECHECK`` seconds; 550 is about the directory and 4xx
+    may pass, so those are tried around this once.
+    """
+    if is_network_error(e) or method == FTP_LIST_METHODS[-1]:
+        return False
+    if isinstance(e, ftplib.error_temp) or ftp_not_found(e):
+        return True
+    following = FTP_LIST_METHODS[FTP_LIST_METHODS.index(method) + 1]
+    _list_method[(site.host, site.port)] = (
+        following,
+        time.monotonic() + LIST_METHOD_RECHECK,
+    )
+    logger.info(f"{site.host} does not support {method} ({e}), using {following}")
+    return True
+
+
+def ftp_not_found(e):
+    """Whether ``e`` is a 550: the file or directory, not the command, is the problem."""
+    return isinstance(e, ftplib.error_perm) and str(e).startswith("550")
+
+
+def ftp_listing_failed(site, path, e):
+    """Log a listing error that is not a network error; an empty listing."""
+    if not isinstance(e, (ftplib.error_perm, ftplib.error_temp)):
+        logger.error(f"FTP list_and_size failed for {site.host}: {e}")
+        return [], {}
+    # 550 errors are often "no files found" - not critical
+    error_msg = str(e)
+    if "550" in error_msg and (
+        "no files" in error_msg.lower() or "not found" in error_msg.lower()
+    ):
+        logger.info(f"FTP directory empty or no matching files for {site.host}:{path}")
+    else:
+        logger.error(f"FTP error for {site.host}: {e}")
+    return [], {}
+
+
+def rest_refused(site, fname, offset, e):
+    """Whether a failed resumed RETR should be restarted from byte 0.
+
+    A 5xx other than 550 after REST means resume is unsupported.
+    """
+    if not offset or not isinstance(e, ftplib.error_perm) or ftp_not_found(e):
+        return False
+    logger.info(f"{site.host} rejected REST ({e}), restarting {fname}")
+    return True
+
+
+def mlst_refused(e):
+    """Whether a failed MLST should fall back to SIZE and MDTM."""
+    return isinstance(e, ftplib.error_perm) and not ftp_not_found(e)
+
+
+def ftp_stat_failed(site, fname, e):
+    """Log a stat error that is not a network error; None, as for a missing file."""
+    if not ftp_not_found(e):
+        logger.warning(f"FTP stat failed for {site.host}/{fname}: {e}")
+    return None
+
+
+def ftp_dir_mtime(site, resp):
+    """The ``modify`` fact of a directory MLST reply, or None.
+
+    A receiver that answers without one is not asked again.
+    """
+    match = re.search(r"modify=([0-9.]+)", resp, re.IGNORECASE)
+    if not match:
+        _no_dir_mtime.add((site.host, site.port))
+        return None
+    return match.group(1)
+
+
+def dir_mtime_failed(site, path, e):
+    """Log a directory MLST error that is not a network error; None.
+
+    A receiver that refuses MLST is not asked again.
+    """
+    if mlst_refused(e):
+        logger.info(f"{site.host} does not support MLST ({e})")
+        _no_dir_mtime.add((site.host, site.port))
+    elif not ftp_not_found(e):
+        logger.debug(f"FTP dir_mtime failed for {site.host}:{path}: {e}")
+    return None
+
+
+def hash_commands(site):
+    """``FTP_HASH_COMMANDS`` to try on ``site``, the one that worked first.
+
+    Empty once the receiver is known to offer none.
+    """
+    host = (site.host, site.port)
+    if host in _hash_command and _hash_command[host] is None:
+        return ()
+    commands = [c for c in FTP_HASH_COMMANDS if c[0] == _hash_command.get(host)]
+    return commands or FTP_HASH_COMMANDS
+
+
+def hash_reply(site, command, digits, resp):
+    """The hex digest in a checksum reply, remembering ``command``; or None."""
+    match = re.search(rf"\b([0-9A-Fa-f]{{{digits}}})\b", resp[4:])
+    if not match:
+        return None
+    _hash_command[(site.host, site.port)] = command
+    return match.group(1).lower()
+
+
+def sha256sum_reply(site, status, out):
+    """``("sha256", hexdigest)`` from a ``sha256sum`` run over SSH, or None."""
+    match = re.match(r"([0-9a-f]{64})\b", out)
+    if status != 0 or not match:
+        logger.info(f"{site.host} does not run sha256sum, skipping checksums")
+        _hash_command[(site.host, site.port)] = None
+        return None
+    _hash_command[(site.host, site.port)] = "sha256sum"
+    return "sha256", match.group(1)
+
+
+def sha256sum_command(site, fname, path):
+    """``sha256sum`` command line for ``fname``, or None if the receiver lacks it."""
+    if _hash_command.get((site.host, site.port), "") is None:
+        return None
+    remote = f"{path.rstrip('/')}/{fname}" if path else fname
+    return f"sha256sum -- {shlex.quote(remote)}"
+
+
+def no_hash_command(site):
+    """Remember that ``site`` answers no checksum command."""
+    logger.info(f"{site.host} offers no checksum command, skipping")
+    _hash_command[(site.host, site.port)] = None
+
+
+def sizes_wanted(method, files, unparsed, expected):
+    """Names a full listing by ``method`` still needs a SIZE for."""
+    if method == "NLST":
+        return [f for f in files if expected is None or f in expected]
+    if unparsed and expected:
+        # Expected files may hide among the lines LIST could not parse
+        return sorted(set(expected) - set(files))
+    return []
+
+
+def add_size(method, files, sizes, name, size):
+    """Merge the SIZE answer for ``name`` into a full listing by ``method``."""
+    if method == "NLST":
+        sizes[name] = size or 0
+    elif size is not None:  # None: not there after all
+        if name not in sizes:
+            files.append(name)
+        sizes[name] = size
+
+
+def mlst_facts(resp):
+    """Facts of an MLST reply as a lower-cased dict."""
+    facts = {}
+    for line in resp.splitlines()[1:]:
+        if line.startswith(" "):
+            for fact in line.strip().partition(" ")[0].split(";"):
+                key, _, value = fact.partition("=")
+                if value:
+                    facts[key.lower()] = value
+    return facts
+
+
+def ftp_time(value):
+    """POSIX time of an MLST/MDTM "YYYYMMDDHHMMSS[.sss]" (UTC), or None."""
+    try:
+        when = datetime.strptime(value.strip()[:14], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    return when.replace(tzinfo=timezone.utc).timestamp()
+
+
+def glob_for(names):
+    """Narrowest single NLST glob that matches every name in ``names``."""
+    return os.path.commonprefix(sorted(names)) + "*"
+
+
+def record_listing(site, started, files):
+    METRICS.observe(
+        "dgnet_listing_seconds", time.monotonic() - started, host=site.host
+    )
+    METRICS.set("dgnet_listing_entries", len(files), site=site.name)
+
+
+def record_download(site, started, part_path, offset):
+    """Transfer metrics for a finished RETR/read into ``part_path``."""
+    elapsed = time.monotonic() - started
+    nbytes = max(0, os.path.getsize(part_path) - offset)
+    METRICS.observe("dgnet_download_seconds", elapsed, host=site.host)
+    METRICS.inc("dgnet_download_bytes_total", nbytes, site=site.name)
+    if elapsed > 0:
+        METRICS.set("dgnet_download_throughput_bytes", nbytes / elapsed, host=site.host)
+
+
+def pool_key(site):
+    return (site.protocol, site.host, site.port, site.user)
+
+
+class FTPConnector:
+    @staticmethod
+    def session(site):
+        return POOL.session(
+            pool_key(site), lambda: FTPSession.open(site), site.max_sessions
+        )
+
+    @staticmethod
+    @retry_on_network_error(default=([], {}))
+    def list_and_size(site, expected=None, path=None):
+        path = site.path if path is None else path
+        started = time.monotonic()
+        try:
+            with FTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
+                if use_filtered_listing(site, path, expected, FTP_FILTER_MAX_EXPECTED):
+                    files, sizes = FTPConnector._list_expected(sess.ftp, expected)
+                else:
+                    files, sizes = FTPConnector._list_full(sess.ftp, site, expected)
+                    remember_dir_size(site, path, len(files))
+            record_listing(site, started, files)
             return files, sizes
+        except Exception as e:
+            if propagates(e):
+                raise
+            return ftp_listing_failed(site, path, e)
+
+    @staticmethod
+    def _list_full(ftp, site, expected=None):
+        """Whole-directory listing with the best command the receiver has.
+
+        Commands it refuses are skipped by later scans for a while (see
+        list_method_failed). SIZE is only sent for expected names whose size
+        the listing did not give (every name when nothing is expected).
+        """
+        for method in list_methods(site):
+            try:
+                files, sizes, unparsed = getattr(FTPConnector, f"_{method.lower()}")(ftp)
+            except (ftplib.error_perm, ftplib.error_temp, ftplib.error_reply) as e:
+                if not list_method_failed(site, method, e):
+                    raise
+                continue
+            if files or not unparsed:
+                break
+            # One odd listing is not a refusal; fall back for this call only
+            logger.info(f"{site.host}: no {method} line recognised, trying the next command")
+
+        wanted = sizes_wanted(method, files, unparsed, expected)
+        if wanted:
+            ftp.voidcmd("TYPE I")  # SIZE is refused in ASCII mode
+        for f in wanted:
+            add_size(method, files, sizes, f, FTPConnector._size_of(ftp, f))
+        return files, sizes
+
+    @staticmethod
+    def _mlsd(ftp):
+        files = []
+        sizes = {}
+        for name, facts in ftp.mlsd():
+            if facts.get("type") == "file":
+                files.append(name)
+                sizes[name] = int(facts.get("size", 0))
+        return files, sizes, 0
+
+    @staticmethod
+    def _list(ftp):
+        lines = []
+        ftp.retrlines("LIST", lines.append)
+        return parse_listing(lines)
+
+    @staticmethod
+    def _nlst(ftp):
+        return ftp.nlst(), {}, 0
+
+    @staticmethod
+    def _size_of(ftp, name):
+        """SIZE of ``name``, or None if the server will not say."""
+        try:
+            return ftp.size(name)
         except (ftplib.error_perm, ftplib.error_temp) as e:
-            # 550 errors are often "no files found" - not critical
-            error_msg = str(e)
-            if "550" in error_msg and (
-                "no files" in error_msg.lower() or "not found" in error_msg.lower()
-            ):
-                logger.info(
-                    f"FTP directory empty or no matching files for {site.host}:{site.path}"
-                )
-            else:
-                logger.error(f"FTP error for {site.host}: {e}")
-            return [], {}
+            if propagates(e):
+                raise
+            return None
+
+    @staticmethod
+    def _mdtm(ftp, name):
+        """MDTM of ``name`` as a POSIX timestamp, or None if the server will not say."""
+        try:
+            return ftp_time(ftp.sendcmd(f"MDTM {name}")[4:])
+        except ftplib.error_perm:
+            return None
+
+    @staticmethod
+    def _list_expected(ftp, expected):
+        names = set(expected)
+        try:
+            listed = ftp.nlst(glob_for(names))
+        except ftplib.error_perm as e:
+            if not ftp_not_found(e):
+                raise
+            listed = []  # no file matches the glob
+        # Some servers return paths or ignore the glob; keep expected names only
+        files = sorted({n.rsplit("/", 1)[-1] for n in listed} & names)
+        if files:
+            ftp.voidcmd("TYPE I")  # SIZE is refused in ASCII mode
+        sizes = {f: FTPConnector._size_of(ftp, f) or 0 for f in files}
+        return files, sizes
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def dir_mtime(site, path=None):
+        """Modify time of the remote directory from MLST, or None."""
+        path = site.path if path is None else path
+        if (site.host, site.port) in _no_dir_mtime:
+            return None
+        try:
+            with FTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
+                resp = sess.ftp.sendcmd("MLST")
         except Exception as e:
-            logger.error(f"FTP list_and_size failed for {site.host}: {e}")
-            return [], {}
-        finally:
-            if ftp:
+            if propagates(e):
+                raise
+            return dir_mtime_failed(site, path, e)
+        return ftp_dir_mtime(site, resp)
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def stat(site, fname, path=None):
+        """``(size, mtime)`` of a remote file, or None if it is not there.
+
+        ``mtime`` is a POSIX timestamp, None when the server won't say.
+        """
+        path = site.path if path is None else path
+        try:
+            with FTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
                 try:
-                    ftp.quit()
-                except Exception:
+                    facts = mlst_facts(sess.ftp.sendcmd(f"MLST {fname}"))
+                except ftplib.error_perm as e:
+                    if not mlst_refused(e):
+                        raise
+                    facts = {}  # no MLST; SIZE and MDTM instead
+                if "size" in facts:
+                    return int(facts["size"]), ftp_time(facts.get("modify", ""))
+                sess.ftp.voidcmd("TYPE I")  # SIZE is refused in ASCII mode
+                return sess.ftp.size(fname), FTPConnector._mdtm(sess.ftp, fname)
+        except Exception as e:
+            if propagates(e):
+                raise
+            return ftp_stat_failed(site, fname, e)
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def remote_hash(site, fname, path=None):
+        """``(algorithm, hexdigest)`` computed by the server, or None.
+
+        Tries HASH, XSHA256, XMD5 and XCRC and remembers which one the
+        receiver answers so later files need a single command.
+        """
+        path = site.path if path is None else path
+        commands = hash_commands(site)
+        if not commands:
+            return None
+        try:
+            with FTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                sess.chdir(path)
+                for command, algo, digits in commands:
                     try:
-                        ftp.close()
-                    except Exception:
-                        pass
+                        if command == "HASH":
+                            sess.ftp.sendcmd("OPTS HASH SHA-256")
+                        resp = sess.ftp.sendcmd(f"{command} {fname}")
+                    except ftplib.error_perm as e:
+                        if ftp_not_found(e):
+                            return None  # file itself is the problem
+                        continue
+                    digest = hash_reply(site, command, digits, resp)
+                    if digest:
+                        return algo, digest
+        except Exception as e:
+            if propagates(e):
+                raise
+            logger.warning(f"FTP checksum query failed for {site.host}/{fname}: {e}")
+            return None
+        no_hash_command(site)
+        return None
 
     @staticmethod
-    @retry_on_network_error()
-    def download(site, fname, local_path):
-        ftp = None
+    @retry_on_network_error(default=False)
+    def download(site, fname, local_path, remote_size=None, path=None):
+        path = site.path if path is None else path
         try:
-            port = site.port
-            # Create socket with connect timeout, then use for FTP
-            sock = socket.create_connection((site.host, port), timeout=CONNECT_TIMEOUT)
-            ftp = ftplib.FTP()
-            ftp.sock = sock
-            ftp.af = sock.family
-            ftp.file = ftp.sock.makefile("r", encoding=ftp.encoding)
-            ftp.welcome = ftp.getresp()
-            ftp.sock.settimeout(DOWNLOAD_TIMEOUT)
-            ftp.login(site.user, site.password)
-            ftp.cwd(site.path)
-            with open(local_path, "wb") as f:
-                ftp.retrbinary(f"RETR {fname}", f.write)
-            return True
+            started = time.monotonic()
+            with FTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                sess.chdir(path)
+                remote_mtime = None
+                if not site.verify_checksum and resumable_local(local_path, remote_size):
+                    remote_mtime = FTPConnector._mdtm(sess.ftp, fname)
+                part_path, offset = open_part(
+                    local_path, remote_size, remote_mtime, site.verify_checksum
+                )
+                throttle = BANDWIDTH.throttle(site)
+                try:
+                    with open(
+                        part_path, "ab" if offset else "wb", buffering=WRITE_BUFFER
+                    ) as f:
+                        sess.ftp.retrbinary(
+                            f"RETR {fname}",
+                            writer(f, throttle),
+                            blocksize=FTP_BLOCK_SIZE,
+                            rest=offset or None,
+                        )
+                except ftplib.error_perm as e:
+                    if not rest_refused(site, fname, offset, e):
+                        raise
+                    offset = 0
+                    with open(part_path, "wb", buffering=WRITE_BUFFER) as f:
+                        sess.ftp.retrbinary(
+                            f"RETR {fname}",
+                            writer(f, throttle),
+                            blocksize=FTP_BLOCK_SIZE,
+                        )
+            record_download(site, started, part_path, offset)
+            return finish_part(part_path, local_path, remote_size)
         except Exception as e:
+            if propagates(e):
+                raise
             logger.error(f"FTP download failed for {site.host}/{fname}: {e}")
             return False
-        finally:
-            if ftp:
-                try:
-                    ftp.quit()
-                except Exception:
-                    try:
-                        ftp.close()
-                    except Exception:
-                        pass
 
 
 class SFTPConnector:
     @staticmethod
-    @retry_on_network_error()
-    def list_and_size(site):
+    def session(site):
+        return POOL.session(
+            pool_key(site), lambda: SFTPSession.open(site), site.max_sessions
+        )
+
+    @staticmethod
+    @retry_on_network_error(default=([], {}))
+    def list_and_size(site, expected=None, path=None):
         if not site.host:
             logger.warning(f"SFTP site {site.name} has no host configured, skipping")
             return [], {}
-        transport = None
-        sftp = None
-        try:
-            port = site.port
-            # Create socket with connect timeout
-            sock = socket.create_connection((site.host, port), timeout=CONNECT_TIMEOUT)
-            transport = Transport(sock)
-            transport.connect(
-                username=site.user, password=site.password, timeout=READ_TIMEOUT
-            )
-            sftp = SFTPClient.from_transport(transport)
-            sftp.chdir(site.path)
-            attrs = sftp.listdir_attr()
+        path = site.path if path is None else path
+        started = time.monotonic()
+        try:
+            with SFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
+                if use_filtered_listing(site, path, expected, SFTP_FILTER_MAX_EXPECTED):
+                    files, sizes = SFTPConnector._stat_expected(sess.sftp, expected)
+                    record_listing(site, started, files)
+                    return files, sizes
+                attrs = sess.sftp.listdir_attr()
             files = [a.filename for a in attrs if a.st_size >= 0]
             sizes = {a.filename: a.st_size for a in attrs}
+            remember_dir_size(site, path, len(files))
+            record_listing(site, started, files)
             return files, sizes
         except Exception as e:
+            if propagates(e):
+                raise
             logger.error(f"SFTP list_and_size failed for {site.host}: {e}")
             return [], {}
-        finally:
-            if sftp:
-                try:
-                    sftp.close()
-                except Exception:
-                    pass
-            if transport:
+
+    @staticmethod
+    def _stat_expected(sftp, expected):
+        files = []
+        sizes = {}
+        for name in sorted(expected):
+            try:
+                attr = sftp.stat(name)
+            except FileNotFoundError:
+                continue
+            files.append(name)
+            sizes[name] = attr.st_size
+        return files, sizes
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def dir_mtime(site, path=None):
+        """Modify time of the remote directory from stat, or None."""
+        path = site.path if path is None else path
+        try:
+            with SFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
+                return sess.sftp.stat(".").st_mtime
+        except Exception as e:
+            if propagates(e):
+                raise
+            logger.debug(f"SFTP dir_mtime failed for {site.host}:{path}: {e}")
+            return None
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def stat(site, fname, path=None):
+        """``(size, mtime)`` of a remote file, or None if it is not there."""
+        path = site.path if path is None else path
+        try:
+            with SFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, READ_TIMEOUT))
+                sess.chdir(path)
+                attr = sess.sftp.stat(fname)
+            return attr.st_size, attr.st_mtime
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            if propagates(e):
+                raise
+            logger.warning(f"SFTP stat failed for {site.host}/{fname}: {e}")
+            return None
+
+    @staticmethod
+    @retry_on_network_error(max_retries=1)
+    def remote_hash(site, fname, path=None):
+        """``("sha256", hexdigest)`` from ``sha256sum`` over SSH, or None.
+
+        Needs a login that may run commands; receivers that only allow the
+        SFTP subsystem are remembered and not asked again.
+        """
+        path = site.path if path is None else path
+        command = sha256sum_command(site, fname, path)
+        if command is None:
+            return None
+        try:
+            with SFTPConnector.session(site) as sess:
+                channel = sess.transport.open_session(timeout=READ_TIMEOUT)
                 try:
-                    transport.close()
-                except Exception:
-                    pass
+                    channel.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                    channel.exec_command(command)
+                    out = channel.makefile("rb").read().decode(errors="replace")
+                    status = channel.recv_exit_status()
+                finally:
+                    channel.close()
+        except Exception as e:
+            if propagates(e):
+                raise
+            logger.warning(f"SSH checksum query failed for {site.host}/{fname}: {e}")
+            return None
+        return sha256sum_reply(site, status, out)
 
     @staticmethod
-    @retry_on_network_error()
-    def download(site, fname, local_path):
+    @retry_on_network_error(default=False)
+    def download(site, fname, local_path, remote_size=None, path=None):
         if not site.host:
             logger.warning(f"SFTP site {site.name} has no host configured, skipping")
             return False
-        transport = None
-        sftp = None
-        try:
-            port = site.port
-            # Create socket with connect timeout
-            sock = socket.create_connection((site.host, port), timeout=CONNECT_TIMEOUT)
-            transport = Transport(sock)
-            transport.connect(
-                username=site.user, password=site.password, timeout=DOWNLOAD_TIMEOUT
-            )
-            sftp = SFTPClient.from_transport(transport)
-            remote_path = f"{site.path.rstrip('/')}/{fname}"
-            sftp.get(remote_path, local_path)
-            return True
+        path = site.path if path is None else path
+        try:
+            started = time.monotonic()
+            with SFTPConnector.session(site) as sess:
+                sess.settimeout(HEALTH.read_timeout(site.host, DOWNLOAD_TIMEOUT))
+                sess.chdir(path)
+                remote_mtime = None
+                if not site.verify_checksum and resumable_local(local_path, remote_size):
+                    remote_mtime = sess.sftp.stat(fname).st_mtime
+                part_path, offset = open_part(
+                    local_path, remote_size, remote_mtime, site.verify_checksum
+                )
+                with sess.sftp.open(fname, "rb") as rf, open(
+                    part_path, "ab" if offset else "wb", buffering=WRITE_BUFFER
+                ) as f:
+                    rf.seek(offset)
+                    # Pipeline the reads instead of one round-trip per packet
+                    try:
+                        rf.prefetch(remote_size or None, SFTP_MAX_REQUESTS)
+                    except TypeError:  # paramiko < 3.3 has no request cap
+                        rf.prefetch(remote_size or None)
+                    write = writer(f, BANDWIDTH.throttle(site))
+                    while True:
+                        data = rf.read(SFTP_READ_CHUNK)
+                        if not data:
+                            break
+                        write(data)
+            record_download(site, started, part_path, offset)
+            return finish_part(part_path, local_path, remote_size)
         except Exception as e:
+            if propagates(e):
+                raise
             logger.error(f"SFTP download failed for {site.host}/{fname}: {e}")
             return False
-        finally:
-            if sftp:
-                try:
-                    sftp.close()
-                except Exception:
-                    pass
-            if transport:
-                try:
-                    transport.close()
-                except Exception:
-                    pass
 
 
 class ConnectorFactory:
+    # "thread": the blocking connectors above; "asyncio": the same API
+    # served from one event loop (see aioconnectors)
+    backend = "thread"
+
     @staticmethod
     def get(p):
+        if ConnectorFactory.backend == "asyncio":
+            from aioconnectors import SYNC_CONNECTORS
+
+            return SYNC_CONNECTORS["ftp" if p == "ftp" else "sftp"]
         return FTPConnector if p == "ftp" else SFTPConnector
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Download scheduling configuration
+DOWNLOAD_WORKERS = 8
+PRIORITY_OLDEST = "oldest"  # drain the backlog in chronological order
+PRIORITY_NEWEST = "newest"  # current day first, then walk backwards
+
+
+def format_rate(bytes_per_sec):
+    for unit in ["B/s", "KB/s", "MB/s"]:
+        if bytes_per_sec < 1024:
+            return f"{bytes_per_sec:.1f} {unit}"
+        bytes_per_sec /= 1024
+    return f"{bytes_per_sec:.1f} GB/s"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--:--"
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+class DownloadScheduler:
+    """Drains download items with a global worker pool and per-host limits.
+
+    ``download_fn(item)`` performs one transfer and returns True on success.
+    Items are queued per receiver host and each host runs at most
+    ``site.max_sessions`` transfers at once. Workers always take the highest
+    priority item among hosts that have a free slot. ``progress_cb`` receives
+    one message per finished item with throughput and ETA.
+    """
+
+    def __init__(
+        self,
+        download_fn,
+        workers=DOWNLOAD_WORKERS,
+        priority=PRIORITY_OLDEST,
+        progress_cb=None,
+    ):
+        self.download_fn = download_fn
+        self.workers = max(1, workers)
+        self.priority = priority
+        self.progress_cb = progress_cb
+        self._cond = threading.Condition()
+        self._cb_lock = threading.Lock()
+        self._queues = {}  # host -> heap of (key, seq, item)
+        self._active = {}  # host -> transfers in flight
+        self._limits = {}  # host -> max concurrent transfers
+        self._seq = itertools.count()
+        self._queued = 0
+        self._closed = False
+        self._threads = []
+        self._started_at = None
+        self.total = 0
+        self.done = 0
+        self.succeeded = 0
+        self.bytes_done = 0
+        self.bytes_expected = 0
+
+    def _key(self, item):
+        ts = item.dt.timestamp()
+        return (-ts if self.priority == PRIORITY_NEWEST else ts, item.file)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"download-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, items):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("DownloadScheduler is closed")
+            for item in items:
+                site = item.site_obj
+                host = site.host
+                limit = max(1, getattr(site, "max_sessions", 1) or 1)
+                self._limits[host] = min(self._limits.get(host, limit), limit)
+                heapq.heappush(
+                    self._queues.setdefault(host, []),
+                    (self._key(item), next(self._seq), item),
+                )
+                self._queued += 1
+                self.total += 1
+                self.bytes_expected += item.remote_size
+            self._cond.notify_all()
+
+    def close(self):
+        """No more items will be submitted; workers exit once drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def run(self, items):
+        self.start()
+        self.submit(items)
+        self.close()
+        self.join()
+        return self.succeeded
+
+    def _next(self):
+        with self._cond:
+            while True:
+                best = None
+                for host, queue in self._queues.items():
+                    if queue and self._active.get(host, 0) < self._limits[host]:
+                        if best is None or queue[0] < self._queues[best][0]:
+                            best = host
+                if best is not None:
+                    _, _, item = heapq.heappop(self._queues[best])
+                    self._queued -= 1
+                    self._active[best] = self._active.get(best, 0) + 1
+                    return best, item
+                if self._closed and self._queued == 0:
+                    return None, None
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            host, item = self._next()
+            if item is None:
+                return
+            try:
+                ok = bool(self.download_fn(item))
+            except Exception as e:
+                logger.error(f"Download of {item.file} crashed: {e}")
+                ok = False
+            with self._cond:
+                self._active[host] -= 1
+                self.done += 1
+                if ok:
+                    self.succeeded += 1
+                    self.bytes_done += item.local_size
+                else:
+                    # Failed items no longer count towards the remaining bytes
+                    self.bytes_expected -= item.remote_size
+                self._cond.notify_all()
+                message = self._progress_message(item, ok)
+            if self.progress_cb:
+                with self._cb_lock:
+                    self.progress_cb(message)
+
+    def rate(self):
+        elapsed = time.monotonic() - (self._started_at or time.monotonic())
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        rate = self.rate()
+        if rate <= 0:
+            return None
+        return max(0, self.bytes_expected - self.bytes_done) / rate
+
+    def _progress_message(self, item, ok):
+        verb = "Downloaded" if ok else "Failed"
+        return (
+            f"{verb} {item.file} ({self.done}/{self.total}) - "
+            f"{format_rate(self.rate())}, ETA {format_eta(self.eta())}"
+        )
@@ -1,28 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
-import time
-import os
-import re
 import logging
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from connectors import probe
+from models import MissingFilesLog, FileStatus
+from report import extract_station_name, format_size
+from schedule import SiteScheduler
+from vtable import VirtualTable
 
 logger = logging.getLogger(__name__)
 
-
-def extract_station_name(filename):
-    match = re.search(r"([A-Z]{4}\d{2}[A-Z])", filename.upper())
-    return match.group(1) if match else "UNKNOWN"
-
-
-def format_size(bytes_val):
-    if bytes_val <= 0:
-        return "—"
-    for unit in ["B", "KB", "MB", "GB"]:
-        if bytes_val < 1024:
-            return f"{bytes_val:.1f} {unit}"
-        bytes_val /= 1024
-    return f"{bytes_val:.1f} TB"
+STATUS_TAGS = {
+    FileStatus.MISSING_LOCALLY: "missing_local",
+    FileStatus.MISSING_REMOTELY: "missing_remote",
+    FileStatus.SIZE_MISMATCH: "mismatch",
+}
 
 
 class FTPSiteGUI:
@@ -44,12 +38,18 @@ class FTPSiteGUI:
         self.scheduler_var = tk.StringVar(value="Scheduler: Stopped")
         self.delay_minutes = tk.IntVar(value=15)
         self.full_log = None
-        self.scheduler_running = False
-        self.scheduler_thread = None
-        self.next_run_time = None
-        self.scheduler_lock = threading.Lock()  # Protect scheduler state
+        self.scheduler = SiteScheduler(
+            self._scheduled_run,
+            spread_minutes=manager.config.schedule_spread_minutes,
+            workers=manager.config.schedule_workers,
+        )
         self.missing_text = None
         self.missing_files_data = {}  # Store missing files separately
+        self.site_nodes = {}  # log name -> station tree iid
+        self.site_reachable = {}  # log name -> result of last background probe
+        self._filter_pending = False
+        self._sorted_cache = (None, 0, [])  # (log, item count, sorted items)
+        self.summary_rows = {}  # summary group -> tree iid
         self._build_ui()
         self._refresh_sites()
 
@@ -158,10 +158,11 @@ class FTPSiteGUI:
         )
         self.led.pack(side=tk.LEFT, padx=6)
         self.led.create_oval(4, 4, 14, 14, fill="red", tags="dot")
-        ttk.Label(row2, text="Minutes after hour:").pack(side=tk.LEFT, padx=8)
+        ttk.Label(row2, text="Publish delay (min):").pack(side=tk.LEFT, padx=8)
         ttk.Spinbox(
             row2, from_=1, to=59, textvariable=self.delay_minutes, width=5
         ).pack(side=tk.LEFT, padx=5)
+        self.delay_minutes.trace_add("write", self._delay_changed)
 
         ttk.Label(
             ctrl,
@@ -184,15 +185,11 @@ class FTPSiteGUI:
             "Status",
             "Type",
         )
-        tree_frame = ttk.Frame(tab1)
-        tree_frame.pack(fill="both", expand=True, padx=15, pady=10)
-        h_scroll = ttk.Scrollbar(tree_frame, orient="horizontal")
-        self.tree = ttk.Treeview(
-            tree_frame, columns=columns, show="headings", xscrollcommand=h_scroll.set
+        self.table = VirtualTable(
+            tab1, columns, row_values=self._row_values, row_tags=self._row_tags
         )
-        h_scroll.config(command=self.tree.xview)
-        h_scroll.pack(side="bottom", fill="x")
-        self.tree.pack(fill="both", expand=True)
+        self.table.pack(fill="both", expand=True, padx=15, pady=10)
+        self.tree = self.table.tree
 
         widths = [120, 110, 150, 450, 60, 90, 60, 90, 160, 100]
         for c, w in zip(columns, widths):
@@ -338,74 +335,25 @@ class FTPSiteGUI:
 
     def _refresh_summary(self):
         self.notebook.select(1)
-        for i in self.summary_tree.get_children():
-            self.summary_tree.delete(i)
-        self.missing_files_data.clear()  # Clear stored missing files data
-        self.missing_text.delete(1.0, tk.END)
-        self.missing_text.insert(tk.END, "Building 100% accurate summary...")
-
         if not self.full_log:
             self.status_var.set("Run SCAN first")
             return
 
-        days = self.summary_days_var.get()
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        groups = {}
-
         target_log = self.summary_filter.get()
         if target_log == "All Stations":
             target_log = None
+        groups = self.manager.summary.summary(
+            self.summary_days_var.get(), site_name=target_log
+        )
 
-        for site_items in self.full_log.log.values():
-            for item in site_items:
-                site = item["site_obj"]
-                if target_log and site.name != target_log:
-                    continue
-                station = getattr(
-                    site, "station_code", extract_station_name(item["file"])
-                )
-                rate_key = (
-                    f"{site.rate} {'[ExtClk]' if site.external_clock else ''}".strip()
-                )
-                group_key = f"{site.network} | {station} | {site.name} | {rate_key}"
-                if group_key not in groups:
-                    groups[group_key] = {
-                        "last_dt": None,
-                        "last_file": "",
-                        "missing": [],
-                    }
-
-                file_dt = item.get("file_dt")
-                if (
-                    not file_dt
-                    and item["local"] == "yes"
-                    and os.path.exists(item["local_path"])
-                ):
-                    try:
-                        mtime = os.path.getmtime(item["local_path"])
-                        file_dt = datetime.fromtimestamp(mtime, tz=timezone.utc)
-                        item["file_dt"] = file_dt
-                    except Exception as e:
-                        logger.warning(
-                            f"Could not get mtime for {item['local_path']}: {e}"
-                        )
-
-                if file_dt and (
-                    groups[group_key]["last_dt"] is None
-                    or file_dt > groups[group_key]["last_dt"]
-                ):
-                    groups[group_key]["last_dt"] = file_dt
-                    groups[group_key]["last_file"] = item["file"]
-
-                if item["status"] in [
-                    "missing locally",
-                    "missing remotely",
-                    "size mismatch",
-                ] and not item.get("is_current_utc", False):
-                    if file_dt is None or file_dt >= cutoff:
-                        groups[group_key]["missing"].append(item["file"])
-
-        for group, data in sorted(groups.items()):
+        # Update rows in place; only groups that appeared or vanished are
+        # inserted or deleted, so the selection survives a refresh
+        for group in list(self.summary_rows):
+            if group not in groups:
+                iid = self.summary_rows.pop(group)
+                self.summary_tree.delete(iid)
+                self.missing_files_data.pop(iid, None)
+        for index, (group, data) in enumerate(sorted(groups.items())):
             last_str = (
                 data["last_dt"].strftime("%Y-%m-%d %H:%M UTC")
                 if data["last_dt"]
@@ -413,15 +361,21 @@ class FTPSiteGUI:
             )
             missing_files = data["missing"]
             missing_count = len(missing_files)
-            tag = "ok" if missing_count == 0 else "missing"
-            iid = self.summary_tree.insert(
-                "",
-                "end",
-                values=(group, last_str, data["last_file"] or "—", missing_count),
-                tags=(tag,),
-            )
+            values = (group, last_str, data["last_file"] or "—", missing_count)
+            tags = ("ok" if missing_count == 0 else "missing",)
+            iid = self.summary_rows.get(group)
+            if iid is None:
+                iid = self.summary_tree.insert("", index, values=values, tags=tags)
+                self.summary_rows[group] = iid
+            else:
+                if self.summary_tree.index(iid) != index:
+                    self.summary_tree.move(iid, "", index)
+                current = self.summary_tree.item(iid)
+                if tuple(current["values"]) != values or tuple(current["tags"]) != tags:
+                    self.summary_tree.item(iid, values=values, tags=tags)
             # Store missing files separately using the iid as key
             self.missing_files_data[iid] = missing_files
+        self._show_missing_details()
 
         total_missing = sum(len(g["missing"]) for g in groups.values())
         filter_text = f" (filtered: {target_log})" if target_log else ""
@@ -450,139 +404,134 @@ class FTPSiteGUI:
             self._refresh_summary()
 
     def _scan_and_download(self, auto=False):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        self.table.clear()
         self.status_var.set("Scanning Greek network...")
         self.scan_btn.config(state="disabled")
+        live_log = MissingFilesLog()
 
         def task():
             def status_callback(msg):
                 self.root.after(0, lambda m=msg: self.status_var.set(m))
 
-            log = self.manager.scan_all(self.days_var.get(), status_callback)
+            def site_callback(site, items):
+                # Show each site's results as soon as its scan finishes
+                def update():
+                    live_log.add(site.name, items)
+                    if self.full_log is live_log:
+                        self._schedule_filter()
+
+                self.root.after(0, update)
+
+            if auto:
+                log, _ = self.manager.scan_and_download(
+                    self.days_var.get(),
+                    self.delay_minutes.get(),
+                    status_callback,
+                    site_cb=site_callback,
+                    download_cb=status_callback,
+                )
+            else:
+                log = self.manager.scan_all(
+                    self.days_var.get(), status_callback, site_cb=site_callback
+                )
 
             def finish():
                 self.full_log = log
                 self.scan_btn.config(state="normal")
                 self._filter_only()
-                if auto:
-                    self.manager.auto_download_completed(log, self.delay_minutes.get())
                 self._refresh_summary()
-                self._refresh_sites()
+                self._refresh_sites(probe_hosts=False)
                 self.status_var.set("Scan complete – v9.999.9.7")
 
             self.root.after(0, finish)
 
+        self.full_log = live_log
         threading.Thread(target=task, daemon=True).start()
 
-    def _filter_only(self):
-        if not self.full_log:
+    def _schedule_filter(self):
+        # Coalesce bursts of per-site updates into one table refresh
+        if self._filter_pending:
             return
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        items = []
-        now_utc = datetime.now(timezone.utc)
+        self._filter_pending = True
 
-        for site_items in self.full_log.log.values():
-            for item in site_items:
-                if (
-                    self.show_issues.get()
-                    and item["status"] in ["ok", "scheduled"]
-                    and not item.get("is_current_utc")
-                ):
-                    continue
-                if (
-                    self.filter_site.get() != "All Stations"
-                    and item["site"] != self.filter_site.get()
-                ):
-                    continue
-
-                if "file_dt" not in item:
-                    try:
-                        if " " in item["date"]:
-                            item["file_dt"] = datetime.strptime(
-                                item["date"], "%Y-%m-%d %H:%M"
-                            ).replace(tzinfo=timezone.utc)
-                        else:
-                            item["file_dt"] = datetime.strptime(
-                                item["date"], "%Y-%m-%d"
-                            ).replace(tzinfo=timezone.utc)
-                    except Exception as e:
-                        logger.warning(
-                            f"Could not parse date '{item['date']}' for {item['file']}: {e}"
-                        )
-                        item["file_dt"] = None
-
-                is_current_utc = (
-                    " " in item["date"]
-                    and item["date"].split()[0] == now_utc.strftime("%Y-%m-%d")
-                    and item["date"].split()[1][:2] == now_utc.strftime("%H")
-                )
-                if is_current_utc and item["remote"] == "yes":
-                    item["is_current_utc"] = True
-                    item["status"] = "new"
+        def run():
+            self._filter_pending = False
+            self._filter_only()
 
-                items.append(item)
+        self.root.after(250, run)
 
-        for item in sorted(
-            items,
-            key=lambda x: (
-                extract_station_name(x["file"]),
-                x["site"],
-                x["date"],
-                x["file"],
-            ),
-        ):
-            tag = (
-                "current_growing"
-                if item.get("is_current_utc")
-                else (
-                    "missing_local"
-                    if item["status"] == "missing locally"
-                    else (
-                        "missing_remote"
-                        if item["status"] == "missing remotely"
-                        else (
-                            "mismatch"
-                            if item["status"] == "size mismatch"
-                            else "scheduled"
-                        )
+    def _sorted_items(self):
+        """All items of ``full_log`` in display order, sorted once per change."""
+        log = self.full_log
+        count = sum(len(site_items) for site_items in log.log.values())
+        if self._sorted_cache[0] is log and self._sorted_cache[1] == count:
+            return self._sorted_cache[2]
+        items = []
+        for site_items in log.log.values():
+            for item in site_items:
+                if item.sort_key is None:
+                    item.sort_key = (
+                        extract_station_name(item.file),
+                        item.site,
+                        item.dt,
+                        item.file,
                     )
-                )
-            )
-
-            log_name = item["site"]
-            station_name = getattr(
-                item["site_obj"], "station_code", extract_station_name(item["file"])
-            )
-            local_size_str = (
-                format_size(item["local_size"]) if item["local"] == "yes" else "—"
-            )
-            remote_size_str = (
-                format_size(item["remote_size"]) if item["remote"] == "yes" else "—"
-            )
+                items.append(item)
+        items.sort(key=lambda x: x.sort_key)
+        self._sorted_cache = (log, count, items)
+        return items
 
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    log_name,
-                    station_name,
-                    item["date"],
-                    item["file"],
-                    item["local"],
-                    local_size_str,
-                    item["remote"],
-                    remote_size_str,
-                    item["status"],
-                    (
-                        "CURRENT (growing)"
-                        if item.get("is_current_utc")
-                        else "Future" if item["future"] else "Past"
-                    ),
-                ),
-                tags=(tag,),
-            )
+    def _filter_only(self):
+        if not self.full_log:
+            return
+        now_utc = datetime.now(timezone.utc)
+        issues_only = self.show_issues.get()
+        target_log = self.filter_site.get()
+        current = {}  # log name -> start of the session being written now
+
+        rows = []
+        for item in self._sorted_items():
+            if target_log != "All Stations" and item.site != target_log:
+                continue
+            site = item.site_obj
+            if site.frequency != "daily" and item.remote_exists:
+                if site.name not in current:
+                    current[site.name] = site.session_start(now_utc)
+                if item.dt == current[site.name] and not item.is_current_utc:
+                    item.is_current_utc = True
+                    item.status = FileStatus.NEW
+                    self.manager.summary.update(item)
+            if (
+                issues_only
+                and item.status in (FileStatus.OK, FileStatus.SCHEDULED)
+                and not item.is_current_utc
+            ):
+                continue
+            rows.append(item)
+        self.table.set_rows(rows)
+
+    def _row_tags(self, item):
+        if item.is_current_utc:
+            return ("current_growing",)
+        return (STATUS_TAGS.get(item.status, "scheduled"),)
+
+    def _row_values(self, item):
+        return (
+            item.site,
+            getattr(item.site_obj, "station_code", extract_station_name(item.file)),
+            item.date,
+            item.file,
+            item["local"],
+            format_size(item.local_size) if item.local_exists else "—",
+            item["remote"],
+            format_size(item.remote_size) if item.remote_exists else "—",
+            item.status.label,
+            (
+                "CURRENT (growing)"
+                if item.is_current_utc
+                else "Future" if item.future else "Past"
+            ),
+        )
 
     def _download(self):
         if not self.full_log:
@@ -591,8 +540,8 @@ class FTPSiteGUI:
             item
             for sl in self.full_log.log.values()
             for item in sl
-            if item["status"] in ["missing locally", "size mismatch"]
-            and not item.get("is_current_utc")
+            if item.status in (FileStatus.MISSING_LOCALLY, FileStatus.SIZE_MISMATCH)
+            and not item.is_current_utc
         ]
         if not items:
             messagebox.showinfo("Done", "No completed files to download")
@@ -610,79 +559,94 @@ class FTPSiteGUI:
 
                 self.root.after(0, update)
 
-            self.manager.download_missing(items, progress_callback)
+            downloaded = self.manager.download_missing(items, progress_callback)
 
             def finish():
                 self.dl_btn.config(state="normal")
                 self._refresh_after_download()
-                messagebox.showinfo("Success", f"Downloaded {len(items)} files!")
+                messagebox.showinfo(
+                    "Success", f"Downloaded {downloaded} of {len(items)} files!"
+                )
 
             self.root.after(0, finish)
 
         threading.Thread(target=dl, daemon=True).start()
 
     def _toggle_scheduler(self):
-        with self.scheduler_lock:
-            if not self.scheduler_running:
-                self.scheduler_running = True
-                self.scheduler_btn.config(text="STOP SCHEDULER")
-                self.led.delete("dot")
-                self.led.create_oval(
-                    4, 4, 14, 14, fill="lime", outline="green", width=3, tags="dot"
-                )
-                self._schedule_next_run()
-                self.scheduler_thread = threading.Thread(
-                    target=self._scheduler_loop, daemon=True
-                )
-                self.scheduler_thread.start()
-                self._scan_and_download(auto=True)
-            else:
-                self.scheduler_running = False
-                self.scheduler_btn.config(text="START SCHEDULER")
-                self.led.delete("dot")
-                self.led.create_oval(4, 4, 14, 14, fill="red", tags="dot")
-                self.scheduler_var.set("Scheduler stopped")
-
-    def _schedule_next_run(self):
-        now = datetime.now()
-        delay = self.delay_minutes.get()
-        next_hour = (now + timedelta(hours=1)).replace(
-            minute=delay, second=0, microsecond=0
-        )
-        # Ensure next_run_time is always in the future
-        if next_hour <= now:
-            next_hour += timedelta(hours=1)
-        with self.scheduler_lock:
-            self.next_run_time = next_hour
-        remaining = int((next_hour - now).total_seconds())
-        self.scheduler_var.set(
-            f"Next run: {next_hour.strftime('%H:%M')} (in {self._format_countdown(remaining)})"
-        )
-
-    def _scheduler_loop(self):
-        while True:
-            with self.scheduler_lock:
-                if not self.scheduler_running:
-                    break
-                next_run = self.next_run_time
+        if not self.scheduler.running:
+            self.scheduler_btn.config(text="STOP SCHEDULER")
+            self.led.delete("dot")
+            self.led.create_oval(
+                4, 4, 14, 14, fill="lime", outline="green", width=3, tags="dot"
+            )
+            self.scheduler.delay_minutes = self.delay_minutes.get()
+            # Every site once now, then each on its own cadence
+            self.scheduler.start(self.manager.sites, run_now=True)
+            self._tick_scheduler()
+        else:
+            self.scheduler.stop()
+            self.scheduler_btn.config(text="START SCHEDULER")
+            self.led.delete("dot")
+            self.led.create_oval(4, 4, 14, 14, fill="red", tags="dot")
+            self.scheduler_var.set("Scheduler stopped")
+
+    def _delay_changed(self, *args):
+        try:
+            delay = self.delay_minutes.get()
+        except tk.TclError:
+            return  # spinbox mid-edit
+        if self.scheduler.running:
+            self.scheduler.set_delay(delay)
+
+    def _tick_scheduler(self):
+        # Countdown display only; runs are started by the scheduler thread
+        if not self.scheduler.running:
+            return
+        runs = self.scheduler.next_runs()
+        busy = len(self.scheduler.in_flight())
+        text = f"{busy} site(s) running" if busy else "Idle"
+        if runs:
+            due, name = runs[0]
+            remaining = max(0, int((due - datetime.now(timezone.utc)).total_seconds()))
+            text += (
+                f" | Next: {name} at {due.strftime('%H:%M:%S')} UTC"
+                f" (in {self._format_countdown(remaining)})"
+            )
+        self.scheduler_var.set(text)
+        self.root.after(1000, self._tick_scheduler)
+
+    def _scheduled_run(self, sites):
+        """Scheduler job: scan and download ``sites`` into the current log."""
+
+        def status_callback(msg):
+            self.root.after(0, lambda m=msg: self.status_var.set(m))
+
+        def site_callback(site, items):
+            def update():
+                # A new log object, so the table re-sorts the replaced site
+                log = MissingFilesLog()
+                if self.full_log:
+                    log.log.update(self.full_log.log)
+                log.add(site.name, items)
+                self.full_log = log
+                self._schedule_filter()
 
-            now = datetime.now()
-            if next_run and now >= next_run:
-                self.root.after(0, lambda: self._scan_and_download(auto=True))
-                self._schedule_next_run()
-            else:
-                # Only update countdown if not at run time
-                if next_run:
-                    remaining = int((next_run - now).total_seconds())
-                    if remaining > 0:
-                        # Capture values in local scope to avoid closure issues
-                        next_time_str = next_run.strftime("%H:%M")
-                        countdown_str = self._format_countdown(remaining)
-                        status_text = f"Next run: {next_time_str} (in {countdown_str})"
-                        self.root.after(
-                            0, lambda msg=status_text: self.scheduler_var.set(msg)
-                        )
-            time.sleep(1)
+            self.root.after(0, update)
+
+        self.manager.scan_and_download(
+            self.days_var.get(),
+            self.delay_minutes.get(),
+            status_callback,
+            site_cb=site_callback,
+            download_cb=status_callback,
+            sites=sites,
+        )
+
+        def finish():
+            self._refresh_summary()
+            self._refresh_sites(probe_hosts=False)
+
+        self.root.after(0, finish)
 
     def _format_countdown(self, seconds):
         m, s = divmod(seconds, 60)
@@ -698,29 +662,38 @@ class FTPSiteGUI:
                 if self.summary_filter.get() == self.selected_log_name:
                     self._refresh_summary()
 
-    def _refresh_sites(self):
+    def _cached_items(self, site_name):
+        """Items for ``site_name`` from the last scan, or [] if none yet."""
+        if not self.full_log:
+            return []
+        return self.full_log.log.get(site_name, [])
+
+    def _detect_station(self, site):
+        for item in self._cached_items(site.name):
+            if item.local_exists or item.remote_exists:
+                return extract_station_name(item.file)
+        return ""
+
+    def _refresh_sites(self, probe_hosts=True):
+        # Built from config plus the cached last scan only; reachability is
+        # probed in the background so startup never waits on receivers
+        if self.scheduler.running:
+            self.scheduler.update(self.manager.sites)
         for item in self.tree_sites.get_children():
             self.tree_sites.delete(item)
+        self.site_nodes = {}
 
         networks = {}
         for site in self.manager.sites:
             net = site.network or "Unknown"
             if net not in networks:
                 networks[net] = {}
-            try:
-                for item in self.manager.scanner.scan_site(site, 1):
-                    if item["local"] == "yes" or item["remote"] == "yes":
-                        station = getattr(
-                            site, "station_code", extract_station_name(item["file"])
-                        )
-                        rate_key = f"{site.rate} {'[ExtClk]' if site.external_clock else ''}".strip()
-                        key = f"{station} | {site.name} | {rate_key}"
-                        if key not in networks[net]:
-                            networks[net][key] = []
-                        networks[net][key].append(site)
-                        break
-            except Exception as e:
-                logger.warning(f"Failed to scan site {site.name} for tree refresh: {e}")
+            station = site.station_code or self._detect_station(site) or "UNKNOWN"
+            rate_key = f"{site.rate} {'[ExtClk]' if site.external_clock else ''}".strip()
+            key = f"{station} | {site.name} | {rate_key}"
+            if key not in networks[net]:
+                networks[net][key] = []
+            networks[net][key].append(site)
 
         for net, stations in sorted(networks.items()):
             net_id = self.tree_sites.insert(
@@ -734,10 +707,11 @@ class FTPSiteGUI:
                 station_id = self.tree_sites.insert(
                     net_id, "end", text=f"  {station_name}", open=True
                 )
-                self.tree_sites.insert(
+                offline = self.site_reachable.get(log_name) is False
+                self.site_nodes[log_name] = self.tree_sites.insert(
                     station_id,
                     "end",
-                    text=f"   {log_name} - {rate}",
+                    text=f"   {log_name} - {rate}{' [offline]' if offline else ''}",
                     values=(log_name,),
                 )
 
@@ -748,22 +722,39 @@ class FTPSiteGUI:
         self.combo["values"] = station_list
         if self.manager.sites:
             self.combo.current(0)
+        if probe_hosts:
+            self._probe_sites_async()
+
+    def _probe_sites_async(self):
+        sites = [s for s in self.manager.sites if s.host]
+        if not sites:
+            return
+
+        def task():
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                results = list(pool.map(probe, sites))
+
+            def finish():
+                for site, reachable in zip(sites, results):
+                    self.site_reachable[site.name] = reachable
+                    node = self.site_nodes.get(site.name)
+                    if not node or not self.tree_sites.exists(node):
+                        continue
+                    text = self.tree_sites.item(node, "text").replace(" [offline]", "")
+                    if not reachable:
+                        text += " [offline]"
+                    self.tree_sites.item(node, text=text)
+
+            self.root.after(0, finish)
+
+        threading.Thread(target=task, daemon=True).start()
 
     def _edit_dialog(self, site=None, idx=None):
         win = tk.Toplevel(self.root)
         win.title("Add Station" if not site else "Edit Station")
         win.geometry("720x1100")
 
-        detected_station = ""
-        if site:
-            try:
-                sample = self.manager.scanner.scan_site(site, 1)
-                if sample and (
-                    sample[0]["local"] == "yes" or sample[0]["remote"] == "yes"
-                ):
-                    detected_station = extract_station_name(sample[0]["file"])
-            except Exception as e:
-                logger.warning(f"Failed to detect station for {site.name}: {e}")
+        detected_station = self._detect_station(site) if site else ""
 
         fields = [
             ("network", "Network (e.g. NOA)"),
@@ -780,10 +771,14 @@ class FTPSiteGUI:
             ("format", "Format"),
             ("host", "Host"),
             ("port", "Port (default: 21 for FTP, 22 for SFTP)"),
+            ("max_sessions", "Max Sessions (default: 2)"),
+            ("listing_ttl", "Listing Cache TTL, seconds (0 = off, default: 60)"),
+            ("max_kbps", "Bandwidth Limit, KB/s (0 = unlimited)"),
+            ("publish_delay", "Publish Delay, minutes (blank = scheduler default)"),
             ("protocol", "Protocol"),
             ("user", "User"),
             ("password", "Password"),
-            ("path", "Path"),
+            ("path", "Path (strftime codes allowed, e.g. /%Y/%j)"),
             ("pattern", "Pattern"),
             ("frequency", "Frequency"),
             ("output_dir", "Local Folder"),
@@ -791,6 +786,7 @@ class FTPSiteGUI:
         ents = {}
         ext_clk = tk.BooleanVar(value=site.external_clock if site else False)
         letter = tk.BooleanVar(value=site.use_letter_hour if site else False)
+        checksum = tk.BooleanVar(value=site.verify_checksum if site else False)
         format_var = tk.StringVar(value=getattr(site, "format", "Topcon"))
         protocol_var = tk.StringVar(
             value=getattr(site, "protocol", "ftp") if site else "ftp"
@@ -833,7 +829,7 @@ class FTPSiteGUI:
                 combo = ttk.Combobox(
                     win,
                     textvariable=frequency_var,
-                    values=["hourly", "daily"],
+                    values=["hourly", "daily", "15min", "5min"],
                     state="readonly",
                     width=53,
                 )
@@ -845,7 +841,8 @@ class FTPSiteGUI:
                 )
                 e = ttk.Entry(win, width=55)
                 if site and key in site.__dict__:
-                    e.insert(0, getattr(site, key, ""))
+                    value = getattr(site, key, "")
+                    e.insert(0, "" if value is None else value)
                 elif (
                     key == "station_code"
                     and detected_station
@@ -861,6 +858,9 @@ class FTPSiteGUI:
         ttk.Checkbutton(win, text="Use letter hour (a-x)", variable=letter).grid(
             row=len(fields) + 1, column=0, columnspan=2, pady=10
         )
+        ttk.Checkbutton(
+            win, text="Verify downloads with server checksum", variable=checksum
+        ).grid(row=len(fields) + 2, column=0, columnspan=2, pady=10)
 
         def save():
             data = {
@@ -869,6 +869,7 @@ class FTPSiteGUI:
             }
             data["external_clock"] = ext_clk.get()
             data["use_letter_hour"] = letter.get()
+            data["verify_checksum"] = checksum.get()
 
             # Validation
             errors = []
@@ -892,6 +893,54 @@ class FTPSiteGUI:
                 except ValueError:
                     errors.append("Port must be a valid number")
 
+            if data.get("max_sessions"):
+                try:
+                    sessions = int(data["max_sessions"])
+                    if sessions < 1:
+                        errors.append("Max Sessions must be at least 1")
+                    else:
+                        data["max_sessions"] = sessions
+                except ValueError:
+                    errors.append("Max Sessions must be a valid number")
+            else:
+                data.pop("max_sessions", None)
+
+            if data.get("listing_ttl"):
+                try:
+                    ttl = int(data["listing_ttl"])
+                    if ttl < 0:
+                        errors.append("Listing Cache TTL cannot be negative")
+                    else:
+                        data["listing_ttl"] = ttl
+                except ValueError:
+                    errors.append("Listing Cache TTL must be a valid number")
+            else:
+                data.pop("listing_ttl", None)
+
+            if data.get("max_kbps"):
+                try:
+                    kbps = int(data["max_kbps"])
+                    if kbps < 0:
+                        errors.append("Bandwidth Limit cannot be negative")
+                    else:
+                        data["max_kbps"] = kbps
+                except ValueError:
+                    errors.append("Bandwidth Limit must be a valid number")
+            else:
+                data.pop("max_kbps", None)
+
+            if data.get("publish_delay"):
+                try:
+                    publish_delay = int(data["publish_delay"])
+                    if publish_delay < 0:
+                        errors.append("Publish Delay cannot be negative")
+                    else:
+                        data["publish_delay"] = publish_delay
+                except ValueError:
+                    errors.append("Publish Delay must be a valid number")
+            else:
+                data["publish_delay"] = None  # follow the scheduler default
+
             # Pattern validation (basic check for strftime compatibility)
             if data.get("pattern"):
                 try:
@@ -902,6 +951,12 @@ class FTPSiteGUI:
             else:
                 errors.append("Pattern is required")
 
+            if "%" in data.get("path", ""):
+                try:
+                    datetime.now().strftime(data["path"])
+                except Exception:
+                    errors.append("Path contains invalid strftime codes")
+
             if errors:
                 messagebox.showerror("Validation Error", "\n".join(errors))
                 return
@@ -917,7 +972,7 @@ class FTPSiteGUI:
                 messagebox.showerror("Error", str(e))
 
         ttk.Button(win, text="Save Station", command=save).grid(
-            row=len(fields) + 2, column=0, columnspan=2, pady=20
+            row=len(fields) + 3, column=0, columnspan=2, pady=20
         )
 
     def _add_site(self):
@@ -956,4 +1011,8 @@ class FTPSiteGUI:
         self._scan_and_download(auto=False)
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.scheduler.stop()
+            self.manager.close()
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker configuration
+BREAKER_THRESHOLD = 3  # consecutive failures that open the breaker
+BREAKER_COOLDOWN = 300  # seconds an open host is skipped before a probe
+BREAKER_MAX_COOLDOWN = 3600  # cooldown doubles per failed probe up to this
+CONNECT_TIMEOUT_FLOOR = 3  # adaptive connect timeout never goes below this
+READ_TIMEOUT_RTTS = 20  # read timeout is at least this many connect times
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class HostHealth:
+    __slots__ = ("state", "failures", "opened_at", "cooldown", "srtt", "rttvar")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # consecutive
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.srtt = None  # smoothed connect time, seconds
+        self.rttvar = 0.0
+
+
+class HealthRegistry:
+    """Per-host circuit breaker and latency estimate shared by the connectors.
+
+    After ``BREAKER_THRESHOLD`` consecutive failures a host is skipped for
+    a cooldown. Then a single call is let through as a
+    probe: success closes the breaker, failure reopens it with twice the
+    cooldown. Connect times feed a smoothed RTT (as TCP computes its RTO)
+    from which timeouts are derived, and only healthy hosts get retries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _get(self, host):
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth()
+        return health
+
+    def allow(self, host):
+        """Whether a call to ``host`` may go ahead now."""
+        with self._lock:
+            health = self._get(host)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN:
+                if time.monotonic() - health.opened_at < health.cooldown:
+                    return False
+                health.state = HALF_OPEN
+                logger.info(f"{host}: cooldown over, probing")
+                return True
+            return False  # a probe is already in flight
+
+    def attempts(self, host, max_retries):
+        """Retry budget: full for a healthy host, a single try otherwise."""
+        with self._lock:
+            health = self._get(host)
+            if health.state == CLOSED and health.failures == 0:
+                return max_retries
+            return 1
+
+    def success(self, host):
+        with self._lock:
+            health = self._get(host)
+            if health.state != CLOSED:
+                logger.info(f"{host}: reachable again, closing circuit")
+            health.state = CLOSED
+            health.failures = 0
+            health.cooldown = BREAKER_COOLDOWN
+
+    def failure(self, host):
+        """Record a failed call."""
+        with self._lock:
+            health = self._get(host)
+            health.failures += 1
+            if health.state == HALF_OPEN:
+                health.cooldown = min(health.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                self._open(host, health)
+            elif health.state == CLOSED and health.failures >= BREAKER_THRESHOLD:
+                self._open(host, health)
+
+    def _open(self, host, health):
+        health.state = OPEN
+        health.opened_at = time.monotonic()
+        logger.warning(
+            f"{host}: {health.failures} consecutive failures, "
+            f"skipping for {health.cooldown}s"
+        )
+
+    def observe(self, host, rtt):
+        """Feed one measured connect time into the host's RTT estimate."""
+        with self._lock:
+            health = self._get(host)
+            if health.srtt is None:
+                health.srtt = rtt
+                health.rttvar = rtt / 2
+            else:
+                health.rttvar = 0.75 * health.rttvar + 0.25 * abs(health.srtt - rtt)
+                health.srtt = 0.875 * health.srtt + 0.125 * rtt
+
+    def connect_timeout(self, host, default):
+        """RTO-style connect timeout, between the floor and ``default``."""
+        with self._lock:
+            health = self._get(host)
+            if health.srtt is None:
+                return default
+            rto = health.srtt + 4 * health.rttvar
+        return max(CONNECT_TIMEOUT_FLOOR, min(default, rto))
+
+    def read_timeout(self, host, default):
+        """``default``, stretched for hosts behind slow high-latency links."""
+        with self._lock:
+            srtt = self._get(host).srtt
+        return default if srtt is None else max(default, srtt * READ_TIMEOUT_RTTS)
+
+    def reset(self):
+        """Forget every host."""
+        with self._lock:
+            self._hosts.clear()
+
+    def state(self, host):
+        with self._lock:
+            return self._get(host).state
+
+
+HEALTH = HealthRegistry()
@@ -0,0 +1,71 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+
+class LocalInventory:
+    """Index of local download directories built with one os.scandir pass.
+
+    Each directory maps file name -> ``os.DirEntry`` (or a ``(size, mtime)``
+    tuple once refreshed). Existence checks need no syscall at all and the
+    stat of an existing file is cached by its DirEntry, so a scan costs one
+    directory read plus one stat per file actually present.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs: Dict[str, Dict] = {}
+
+    def scan(self, directory: str) -> Dict:
+        """(Re)index ``directory``; missing directories index as empty."""
+        directory = os.path.normpath(directory)
+        entries = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    entries[entry.name] = entry
+        except OSError:
+            pass
+        with self._lock:
+            self._dirs[directory] = entries
+        return entries
+
+    def stat(self, path: str) -> Optional[Tuple[int, float]]:
+        """``(size, mtime)`` of ``path`` from the index, or None if absent."""
+        directory, name = os.path.split(os.path.normpath(path))
+        with self._lock:
+            entries = self._dirs.get(directory)
+        if entries is None:
+            entries = self.scan(directory)
+        entry = entries.get(name)
+        if entry is None or isinstance(entry, tuple):
+            return entry
+        try:
+            st = entry.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def refresh(self, path: str) -> Optional[Tuple[int, float]]:
+        """Re-stat a single file that changed, e.g. after a download."""
+        directory, name = os.path.split(os.path.normpath(path))
+        try:
+            st = os.stat(path)
+            info = (st.st_size, st.st_mtime)
+        except OSError:
+            info = None
+        with self._lock:
+            entries = self._dirs.get(directory)
+            if entries is not None:
+                if info is None:
+                    entries.pop(name, None)
+                else:
+                    entries[name] = info
+        return info
+
+    def invalidate(self, directory: str = None):
+        with self._lock:
+            if directory is None:
+                self._dirs.clear()
+            else:
+                self._dirs.pop(os.path.normpath(directory), None)
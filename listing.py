@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from connectors import ConnectorFactory
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Seconds a directory listing is reused before it is revalidated
+# (default for SiteConfig.listing_ttl; 0 turns the cache off for a site)
+LISTING_TTL = 60
+# Directories kept in memory; the least recently used one is evicted first
+LISTING_CACHE_DIRS = 256
+
+
+class _Listing:
+    __slots__ = ("names", "files", "sizes", "mtime", "fetched", "closed")
+
+    def __init__(self, names, files, sizes, mtime, closed):
+        self.names = names  # expected names the listing was filtered to
+        self.files = files
+        self.sizes = sizes
+        self.mtime = mtime  # directory modify time when listed, if known
+        self.fetched = time.monotonic()
+        self.closed = closed
+
+    def covers(self, names):
+        return names <= self.names
+
+
+class ListingCache:
+    """Remote directory listings shared by every scan of the process.
+
+    A listing is reused for ``site.listing_ttl`` seconds. Once that expires
+    a settled directory, one holding no file that may still be growing, is
+    revalidated with a single directory-mtime query (MLST/stat) and only
+    listed again if it changed. Past directories that are settled and
+    already held every expected file are kept until evicted, whatever the
+    TTL.
+    """
+
+    def __init__(self, max_dirs=LISTING_CACHE_DIRS):
+        self.max_dirs = max_dirs
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (protocol, host, port, path) -> _Listing
+
+    def list(self, site, path, names, closed=False, settled=False):
+        """``(files, sizes)`` for ``names`` in ``path``, listed only if needed.
+
+        ``closed`` marks a past directory where no new files will appear,
+        ``settled`` one whose files' sizes can no longer change.
+        """
+        key = (site.protocol, site.host, site.port, path)
+        ttl = getattr(site, "listing_ttl", LISTING_TTL)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        connector = ConnectorFactory.get(site.protocol)
+
+        mtime = None
+        if entry is not None and entry.covers(names):
+            if entry.closed or time.monotonic() - entry.fetched < ttl:
+                METRICS.inc("dgnet_listing_cache_total", result="hit")
+                return entry.files, entry.sizes
+            if settled and entry.mtime is not None:
+                mtime = connector.dir_mtime(site, path)
+                if mtime is not None and mtime == entry.mtime:
+                    entry.fetched = time.monotonic()
+                    METRICS.inc("dgnet_listing_cache_total", result="revalidated")
+                    return entry.files, entry.sizes
+                logger.debug(f"{site.host}:{path} changed, listing again")
+
+        if mtime is None and settled and ttl > 0:
+            mtime = connector.dir_mtime(site, path)
+        METRICS.inc("dgnet_listing_cache_total", result="miss")
+        files, sizes = connector.list_and_size(site, expected=names, path=path)
+        files = set(files)
+        # Only complete, settled past directories are worth keeping without
+        # a TTL; the last file of yesterday may still be growing after midnight
+        closed = closed and settled and names <= files
+        if ttl > 0 or closed:
+            self._store(key, _Listing(set(names), files, sizes, mtime, closed))
+        return files, sizes
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_dirs:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, site=None):
+        """Forget cached listings for ``site``'s receiver, or everything."""
+        with self._lock:
+            if site is None:
+                self._entries.clear()
+                return
+            for key in [
+                k for k in self._entries if k[:3] == (site.protocol, site.host, site.port)
+            ]:
+                del self._entries[key]
@@ -1,6 +1,5 @@
 import logging
-from gui import FTPSiteGUI
-from manager import FTPSiteManager
+import sys
 
 # Configure logging
 logging.basicConfig(
@@ -10,6 +9,15 @@ logging.basicConfig(
 )
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Headless subcommands never import tkinter
+        from cli import main
+
+        sys.exit(main())
+
+    from gui import FTPSiteGUI
+    from manager import FTPSiteManager
+
     manager = FTPSiteManager()
     app = FTPSiteGUI(manager)
     app.run()
@@ -1,9 +1,21 @@
 import json, os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import List, Dict, Callable
-from models import SiteConfig, MissingFilesLog
+from models import SiteConfig, MissingFilesLog, ScanResult, FileStatus
 from scanner import SiteScanner
+from state import ScanStateStore
+from inventory import LocalInventory
+from listing import ListingCache
+from report import SummaryAggregator
+from downloader import DownloadScheduler
+from verify import Verifier, CORRUPT_SUFFIX
 from connectors import ConnectorFactory
+from pool import POOL
+from transfer import BANDWIDTH
+from metrics import METRICS
 from config import Config
 from datetime import datetime, timedelta, timezone
 
@@ -14,88 +26,296 @@ class FTPSiteManager:
     def __init__(self):
         self.config = Config()
         self.sites: List[SiteConfig] = []
-        self.scanner = SiteScanner()
+        self.state = ScanStateStore(self.config.state_file)
+        self.inventory = LocalInventory()
+        self.listings = ListingCache(self.config.listing_cache_dirs)
+        self.scanner = SiteScanner(self.state, self.inventory, self.listings)
+        self.summary = SummaryAggregator()  # kept current by scans and downloads
+        self.verifier = Verifier(self._verified, self.config.verify_workers)
+        # Scheduled runs may overlap, each with its own pools; these slots
+        # keep scan_workers and download_workers caps across all of them
+        self._scan_slots = threading.BoundedSemaphore(max(1, self.config.scan_workers))
+        self._download_slots = threading.BoundedSemaphore(
+            max(1, self.config.download_workers)
+        )
+        BANDWIDTH.set_global(self.config.bandwidth_limit_kbps)
+        ConnectorFactory.backend = self.config.connector_backend
         self._load_sites()
 
     def scan_all(
-        self, days_back=1, progress_cb: Callable[[str], None] = None
+        self,
+        days_back=1,
+        progress_cb: Callable[[str], None] = None,
+        max_workers: int = None,
+        sites: List[SiteConfig] = None,
+        site_cb: Callable[[SiteConfig, List[ScanResult]], None] = None,
     ) -> MissingFilesLog:
         log = MissingFilesLog()
         log.clear()
+        configured = self.sites if sites is None else sites
 
-        if not self.sites:
+        if not configured:
             logger.warning("No sites configured for scanning")
             if progress_cb:
                 progress_cb("No sites to scan")
             return log
 
-        for site in self.sites:
+        sites = []
+        for site in configured:
             # Skip sites with invalid configuration
             if not site.host or not site.protocol:
                 logger.warning(f"Skipping site {site.name}: missing host or protocol")
                 continue
+            sites.append(site)
 
-            if progress_cb:
-                progress_cb(f"Scanning {site.name} [{site.network} {site.rate}]...")
-            items = self.scanner.scan_site(site, days_back)
-            log.add(site.name, items)
+        started = time.monotonic()
+        workers = max_workers or self.config.scan_workers
+        if workers <= 1 or len(sites) <= 1:
+            for site in sites:
+                if progress_cb:
+                    progress_cb(f"Scanning {site.name} [{site.network} {site.rate}]...")
+                items = self._scan_site(site, days_back)
+                log.add(site.name, items)
+                self.summary.replace_site(site.name, items)
+                if site_cb:
+                    site_cb(site, items)
+        else:
+            self._scan_concurrent(
+                sites, days_back, workers, log, progress_cb, site_cb
+            )
+        METRICS.set("dgnet_scan_all_seconds", time.monotonic() - started)
+        self.export_metrics()
         if progress_cb:
             progress_cb("Scan complete")
         return log
 
-    def auto_download_completed(self, log: MissingFilesLog, delay_minutes: int):
+    def _scan_concurrent(
+        self, sites, days_back, workers, log, progress_cb=None, site_cb=None
+    ):
+        """Scan sites in a thread pool, capped globally and per receiver host.
+
+        Sites are dispatched from the calling thread only when their host has
+        a free slot, so workers never sit blocked on a busy receiver. Results
+        are added to ``log`` as each site finishes and the log is rebuilt in
+        configuration order at the end, matching a sequential scan.
+        """
+        per_host = max(1, self.config.scan_per_host)
+        pending = list(enumerate(sites))
+        results = [None] * len(sites)
+        running = {}
+        host_active = {}
+        finished = 0
+
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(sites)), thread_name_prefix="scan"
+        ) as pool:
+            while pending or running:
+                waiting = []
+                for i, site in pending:
+                    if (
+                        len(running) < workers
+                        and host_active.get(site.host, 0) < per_host
+                    ):
+                        host_active[site.host] = host_active.get(site.host, 0) + 1
+                        if progress_cb:
+                            progress_cb(
+                                f"Scanning {site.name} [{site.network} {site.rate}]..."
+                            )
+                        future = pool.submit(self._scan_site, site, days_back)
+                        running[future] = i
+                    else:
+                        waiting.append((i, site))
+                pending = waiting
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    site = sites[i]
+                    host_active[site.host] -= 1
+                    finished += 1
+                    results[i] = future.result()
+                    log.add(site.name, results[i])
+                    self.summary.replace_site(site.name, results[i])
+                    if progress_cb:
+                        progress_cb(f"Scanned {site.name} ({finished}/{len(sites)})")
+                    if site_cb:
+                        site_cb(site, results[i])
+
+        # Restore configuration order so output matches a sequential scan
+        log.clear()
+        for site, items in zip(sites, results):
+            log.add(site.name, items)
+
+    def _scan_site(self, site, days_back):
+        with self._scan_slots:
+            return self.scanner.scan_site(site, days_back)
+
+    def completed_items(self, items, delay_minutes: int) -> List[ScanResult]:
+        """Items that are missing or short locally and old enough to fetch.
+
+        A site's own ``publish_delay`` overrides ``delay_minutes``.
+        """
         now = datetime.now(timezone.utc)
-        cutoff = now - timedelta(minutes=delay_minutes)
+        cutoffs = {}
+        completed = []
+        for item in items:
+            if (
+                item.status not in (FileStatus.MISSING_LOCALLY, FileStatus.SIZE_MISMATCH)
+                or item.is_current_utc
+            ):
+                continue
+            site = item.site_obj
+            if site.name not in cutoffs:
+                delay = site.publish_delay
+                delay = delay_minutes if delay is None else delay
+                cutoffs[site.name] = now - timedelta(minutes=delay)
+            if item.dt < cutoffs[site.name]:
+                completed.append(item)
+        return completed
+
+    def auto_download_completed(
+        self, log: MissingFilesLog, delay_minutes: int, progress_cb=None
+    ):
         items = []
         for site_items in log.log.values():
-            for item in site_items:
-                if item["status"] in [
-                    "missing locally",
-                    "size mismatch",
-                ] and not item.get("is_current_utc"):
-                    try:
-                        # Parse dates and ensure they have timezone info
-                        if " " in item["date"]:
-                            d, t = item["date"].split()
-                            file_dt = datetime.strptime(
-                                f"{d} {t}", "%Y-%m-%d %H:%M"
-                            ).replace(tzinfo=timezone.utc)
-                        else:
-                            file_dt = datetime.strptime(
-                                item["date"], "%Y-%m-%d"
-                            ).replace(tzinfo=timezone.utc)
-                        if file_dt < cutoff:
-                            items.append(item)
-                    except Exception as e:
-                        logger.warning(
-                            f"Could not parse date '{item['date']}' for {item['file']}: {e}"
-                        )
+            items.extend(self.completed_items(site_items, delay_minutes))
         if items:
-            self.download_missing(items, lambda msg: None)
+            return self.download_missing(items, progress_cb or (lambda msg: None))
+        return 0
 
-    def download_missing(self, items, progress_cb=None):
-        total = len(items)
-        for i, item in enumerate(items):
-            if progress_cb:
-                progress_cb(f"Downloading {item['file']} ({i+1}/{total})")
-            conn = ConnectorFactory.get(item["site_obj"].protocol)
-            success = conn.download(item["site_obj"], item["file"], item["local_path"])
-            if success and os.path.exists(item["local_path"]):
-                item["local_size"] = os.path.getsize(item["local_path"])
-                item["status"] = "ok"
-                item["local"] = "yes"
-                item["size_ok"] = "yes"
+    def scan_and_download(
+        self,
+        days_back=1,
+        delay_minutes=15,
+        progress_cb: Callable[[str], None] = None,
+        site_cb: Callable[[SiteConfig, List[ScanResult]], None] = None,
+        download_cb: Callable[[str], None] = None,
+        sites: List[SiteConfig] = None,
+    ):
+        """Scan and download as one pipeline.
+
+        Each site's completed files are queued for download as soon as that
+        site's scan finishes, so transfers overlap with the remaining scans.
+        Returns the scan log and the number of files downloaded.
+        """
+        scheduler = DownloadScheduler(
+            self._download_item,
+            workers=self.config.download_workers,
+            priority=self.config.download_priority,
+            progress_cb=download_cb,
+        ).start()
+
+        def on_site(site, items):
+            completed = self.completed_items(items, delay_minutes)
+            if completed:
+                scheduler.submit(completed)
+            if site_cb:
+                site_cb(site, items)
+
+        started = time.monotonic()
+        try:
+            log = self.scan_all(days_back, progress_cb, sites=sites, site_cb=on_site)
+        finally:
+            scheduler.close()
+            scheduler.join()
+            self.verifier.wait()
+            METRICS.set("dgnet_download_run_seconds", time.monotonic() - started)
+            self.export_metrics()
+        return log, scheduler.succeeded
+
+    def download_missing(self, items, progress_cb=None, priority=None, workers=None):
+        scheduler = DownloadScheduler(
+            self._download_item,
+            workers=workers or self.config.download_workers,
+            priority=priority or self.config.download_priority,
+            progress_cb=progress_cb,
+        )
+        started = time.monotonic()
+        succeeded = scheduler.run(items)
+        self.verifier.wait()
+        METRICS.set("dgnet_download_run_seconds", time.monotonic() - started)
+        self.export_metrics()
+        return succeeded
+
+    def export_metrics(self):
+        METRICS.export(self.config.metrics_prometheus, self.config.metrics_json)
+
+    def close(self):
+        """Log out pooled sessions and stop the asyncio backend's loop, on exit."""
+        if ConnectorFactory.backend == "asyncio":
+            from aioconnectors import LOOP
+
+            LOOP.stop()
+        POOL.close_all()
+
+    def _download_item(self, item: ScanResult):
+        conn = ConnectorFactory.get(item.site_obj.protocol)
+        local_path = item.local_path
+        with self._download_slots:
+            success = conn.download(
+                item.site_obj,
+                item.file,
+                local_path,
+                remote_size=item.remote_size,
+                path=item.remote_dir,
+            )
+        local = self.inventory.refresh(local_path) if success else None
+        if not local:
+            METRICS.inc("dgnet_downloads_total", site=item.site, result="failed")
+            return False
+        item.local_size, item.local_mtime = local
+        item.file_dt = None
+        item.local_exists = True
+        # Compare against the listing: a short or overgrown file is not "ok"
+        item.size_ok = not item.remote_size or local[0] == item.remote_size
+        if not item.size_ok:
+            logger.warning(
+                f"{item.file}: {local[0]} bytes on disk, listing said {item.remote_size}"
+            )
+            item.status = FileStatus.SIZE_MISMATCH
+            self.summary.update(item)
+            METRICS.inc("dgnet_downloads_total", site=item.site, result="size_mismatch")
+            return False
+        item.status = FileStatus.OK
+        self.summary.update(item)
+        METRICS.inc("dgnet_downloads_total", site=item.site, result="ok")
+        self.verifier.submit(item)
+        return True
+
+    def _verified(self, item: ScanResult, problem):
+        """Verifier callback: quarantine files that failed the checks."""
+        if problem is None:
+            return
+        local_path = item.local_path
+        logger.error(f"Downloaded {item.file} failed verification: {problem}")
+        try:
+            os.replace(local_path, local_path + CORRUPT_SUFFIX)
+        except OSError as e:
+            logger.error(f"Could not quarantine {local_path}: {e}")
+        self.inventory.refresh(local_path)
+        self.state.forget(item.site, [item.file])
+        item.local_exists = False
+        item.local_size = 0
+        item.local_mtime = 0.0
+        item.size_ok = False
+        item.status = FileStatus.MISSING_LOCALLY
+        self.summary.update(item)
 
     def add_site(self, **kw):
         self.sites.append(SiteConfig(**kw))
         self._save()
 
     def edit_site(self, i, **kw):
+        # Group keys are built from the site settings, rebuilt on next scan
+        self.summary.remove_site(self.sites[i].name)
+        self.listings.invalidate(self.sites[i])
         for k, v in kw.items():
             setattr(self.sites[i], k, v)
         self._save()
 
     def delete_site(self, i):
+        self.state.forget(self.sites[i].name)
+        self.summary.remove_site(self.sites[i].name)
         del self.sites[i]
         self._save()
 
@@ -0,0 +1,214 @@
+"""In-process metrics registry with Prometheus text and JSON export.
+
+Connectors, the scanner and the manager record into ``METRICS``; the
+manager writes the files named in ``Config`` after every scan or download
+run, e.g. for node_exporter's textfile collector.
+"""
+
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# Seconds; covers LAN round-trips up to slow multi-minute transfers
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help)
+METRIC_DEFS = {
+    "dgnet_connect_seconds": (HISTOGRAM, "TCP connect time per receiver host"),
+    "dgnet_login_seconds": (HISTOGRAM, "FTP login / SSH authentication time"),
+    "dgnet_listing_seconds": (HISTOGRAM, "Remote directory listing time"),
+    "dgnet_listing_entries": (GAUGE, "Entries returned by the last listing"),
+    "dgnet_listing_cache_total": (COUNTER, "Listing cache lookups by result"),
+    "dgnet_download_seconds": (HISTOGRAM, "Time per file transfer"),
+    "dgnet_download_bytes_total": (COUNTER, "Bytes downloaded"),
+    "dgnet_download_throughput_bytes": (GAUGE, "Bytes/s of the last transfer"),
+    "dgnet_downloads_total": (COUNTER, "Finished transfers by result"),
+    "dgnet_retries_total": (COUNTER, "Connector calls retried after a network error"),
+    "dgnet_breaker_skips_total": (COUNTER, "Calls skipped by an open circuit breaker"),
+    "dgnet_scan_seconds": (HISTOGRAM, "Scan duration per site"),
+    "dgnet_scan_files": (GAUGE, "Files per status in the last scan of a site"),
+    "dgnet_scan_all_seconds": (GAUGE, "Duration of the last full scan"),
+    "dgnet_download_run_seconds": (GAUGE, "Duration of the last download run"),
+    "dgnet_schedule_runs_total": (COUNTER, "Site runs started by the scheduler"),
+    "dgnet_schedule_skips_total": (COUNTER, "Scheduled runs skipped, previous one in flight"),
+}
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()  # overlapping runs export too
+        self._values = {}  # name -> {labels key -> number or _Histogram}
+
+    def _series(self, name):
+        series = self._values.get(name)
+        if series is None:
+            series = self._values[name] = {}
+        return series
+
+    def inc(self, name, value=1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series(name)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._series(name)[_labels_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series(name)
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self.buckets)
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(hist.counts):
+                hist.counts[i] += 1
+            hist.sum += value
+            hist.count += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the ``with`` block into histogram ``name``."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for name, series in self._values.items():
+                snapshot[name] = {
+                    key: (
+                        (list(v.counts), v.sum, v.count)
+                        if isinstance(v, _Histogram)
+                        else v
+                    )
+                    for key, v in series.items()
+                }
+            return snapshot
+
+    def to_prometheus(self):
+        lines = []
+        for name, series in sorted(self._snapshot().items()):
+            kind, help_text = METRIC_DEFS.get(name, (GAUGE, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(series.items()):
+                if not isinstance(value, tuple):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = (("le", _format_value(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                le = (("le", "+Inf"),)
+                lines.append(f"{name}_bucket{_format_labels(key, le)} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        result = {}
+        for name, series in sorted(self._snapshot().items()):
+            kind, help_text = METRIC_DEFS.get(name, (GAUGE, name))
+            samples = []
+            for key, value in sorted(series.items()):
+                sample = {"labels": dict(key)}
+                if isinstance(value, tuple):
+                    counts, total, count = value
+                    sample.update(
+                        count=count,
+                        sum=total,
+                        buckets={str(b): n for b, n in zip(self.buckets, counts)},
+                    )
+                else:
+                    sample["value"] = value
+                samples.append(sample)
+            result[name] = {"type": kind, "help": help_text, "samples": samples}
+        return result
+
+    def export(self, prometheus_path=None, json_path=None):
+        """Write the registry to the given files, atomically; None skips."""
+        with self._export_lock:
+            for path, render in (
+                (prometheus_path, self.to_prometheus),
+                (json_path, lambda: json.dumps(self.to_dict(), indent=2)),
+            ):
+                if path:
+                    self._write(path, render())
+
+    @staticmethod
+    def _write(path, text):
+        # A temporary file of its own, so no other writer can clobber it
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w",
+                dir=os.path.dirname(path) or ".",
+                prefix=f"{os.path.basename(path)}.",
+                suffix=".tmp",
+                delete=False,
+            ) as f:
+                tmp = f.name
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Cannot write metrics to {path}: {e}")
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+
+METRICS = MetricsRegistry()
@@ -1,3 +1,6 @@
+import os
+import re
+from enum import IntEnum
 from typing import List, Dict
 
 
@@ -20,6 +23,11 @@ class SiteConfig:
         station_code="",
         format="Topcon",
         port=None,
+        max_sessions=2,
+        listing_ttl=60,
+        verify_checksum=False,
+        max_kbps=0,
+        publish_delay=None,
     ):
         self.name = name
         self.host = host
@@ -41,6 +49,39 @@ class SiteConfig:
             self.port = int(port)
         else:
             self.port = 22 if self.protocol == "sftp" else 21
+        # Concurrent sessions the receiver accepts (many allow only 1-2)
+        self.max_sessions = int(max_sessions)
+        # Seconds a remote listing is reused between scans (0 = always list)
+        self.listing_ttl = int(listing_ttl)
+        # Compare downloads with a server-side checksum (XCRC/HASH, sha256sum)
+        self.verify_checksum = bool(verify_checksum)
+        # Download bandwidth cap for this site in KB/s (0 = unlimited)
+        self.max_kbps = int(max_kbps)
+        # Minutes after a session ends until its file is complete on the
+        # receiver (None = the scheduler default)
+        self.publish_delay = None if publish_delay in (None, "") else int(publish_delay)
+
+    @property
+    def session_minutes(self):
+        """Minutes covered by one file: daily, hourly or e.g. "15min"."""
+        if self.frequency == "daily":
+            return 1440
+        match = re.fullmatch(r"(\d+)\s*(?:m|min|minutes?)", self.frequency)
+        if match and 0 < int(match.group(1)) < 1440:
+            return int(match.group(1))
+        return 60
+
+    def session_start(self, when):
+        """Start of the file session containing ``when``."""
+        minutes = self.session_minutes
+        since_midnight = when.hour * 60 + when.minute
+        since_midnight -= since_midnight % minutes
+        return when.replace(
+            hour=since_midnight // 60,
+            minute=since_midnight % 60,
+            second=0,
+            microsecond=0,
+        )
 
     def to_dict(self):
         return self.__dict__.copy()
@@ -59,3 +100,161 @@ class MissingFilesLog:
 
     def add(self, site_name: str, items: List[Dict]):
         self.log[site_name] = items
+
+
+class FileStatus(IntEnum):
+    OK = 0
+    SCHEDULED = 1
+    NEW = 2
+    MISSING_REMOTELY = 3
+    MISSING_LOCALLY = 4
+    SIZE_MISMATCH = 5
+
+    @property
+    def label(self):
+        return STATUS_LABELS[self]
+
+    @classmethod
+    def from_label(cls, label):
+        return STATUS_BY_LABEL[label]
+
+
+STATUS_LABELS = {
+    FileStatus.OK: "ok",
+    FileStatus.SCHEDULED: "scheduled",
+    FileStatus.NEW: "new",
+    FileStatus.MISSING_REMOTELY: "missing remotely",
+    FileStatus.MISSING_LOCALLY: "missing locally",
+    FileStatus.SIZE_MISMATCH: "size mismatch",
+}
+STATUS_BY_LABEL = {label: status for status, label in STATUS_LABELS.items()}
+
+
+def _yes_no(value):
+    return "yes" if value else "no"
+
+
+class ScanResult:
+    """One expected file from a site scan.
+
+    Stored compactly with ``__slots__``: enum status, boolean flags, integer
+    sizes and the precomputed expected datetime. Site name, local path and
+    the date label are derived from ``site_obj`` rather than copied. Item
+    access (``item["local"] == "yes"``) is kept for older callers.
+    """
+
+    __slots__ = (
+        "site_obj",
+        "file",
+        "dt",
+        "remote_dir",
+        "status",
+        "local_exists",
+        "remote_exists",
+        "size_ok",
+        "future",
+        "is_current_utc",
+        "local_size",
+        "remote_size",
+        "local_mtime",
+        "file_dt",
+        "sort_key",
+    )
+
+    def __init__(
+        self,
+        site_obj,
+        file,
+        dt,
+        status,
+        local_exists=False,
+        remote_exists=False,
+        size_ok=False,
+        future=False,
+        is_current_utc=False,
+        local_size=0,
+        remote_size=0,
+        local_mtime=0.0,
+        remote_dir=None,
+    ):
+        self.site_obj = site_obj
+        self.file = file
+        self.dt = dt
+        self.remote_dir = remote_dir
+        self.status = status
+        self.local_exists = local_exists
+        self.remote_exists = remote_exists
+        self.size_ok = size_ok
+        self.future = future
+        self.is_current_utc = is_current_utc
+        self.local_size = local_size
+        self.remote_size = remote_size
+        self.local_mtime = local_mtime
+        self.file_dt = None
+        self.sort_key = None  # display ordering, filled in once by the GUI
+
+    @property
+    def site(self):
+        return self.site_obj.name
+
+    @property
+    def local_path(self):
+        return os.path.join(self.site_obj.output_dir, self.file)
+
+    @property
+    def date(self):
+        if self.site_obj.frequency == "daily":
+            return self.dt.strftime("%Y-%m-%d")
+        return self.dt.strftime("%Y-%m-%d %H:%M")
+
+    # Dict view, mapping the old per-file dict keys onto the slots
+    _GET = {
+        "site": lambda r: r.site,
+        "date": lambda r: r.date,
+        "dt": lambda r: r.dt,
+        "file": lambda r: r.file,
+        "site_obj": lambda r: r.site_obj,
+        "local": lambda r: _yes_no(r.local_exists),
+        "remote": lambda r: _yes_no(r.remote_exists),
+        "local_size": lambda r: r.local_size,
+        "remote_size": lambda r: r.remote_size,
+        "size_ok": lambda r: _yes_no(r.size_ok),
+        "status": lambda r: r.status.label,
+        "future": lambda r: r.future,
+        "is_current_utc": lambda r: r.is_current_utc,
+        "local_path": lambda r: r.local_path,
+        "remote_dir": lambda r: r.remote_dir,
+        "file_dt": lambda r: r.file_dt,
+    }
+    _SET = {
+        "local": lambda r, v: setattr(r, "local_exists", v == "yes"),
+        "remote": lambda r, v: setattr(r, "remote_exists", v == "yes"),
+        "size_ok": lambda r, v: setattr(r, "size_ok", v == "yes"),
+        "status": lambda r, v: setattr(r, "status", FileStatus.from_label(v)),
+        "local_size": lambda r, v: setattr(r, "local_size", v),
+        "remote_size": lambda r, v: setattr(r, "remote_size", v),
+        "is_current_utc": lambda r, v: setattr(r, "is_current_utc", v),
+        "file_dt": lambda r, v: setattr(r, "file_dt", v),
+    }
+
+    def __getitem__(self, key):
+        return self._GET[key](self)
+
+    def __setitem__(self, key, value):
+        self._SET[key](self, value)
+
+    def __contains__(self, key):
+        return key in self._GET
+
+    def get(self, key, default=None):
+        getter = self._GET.get(key)
+        return default if getter is None else getter(self)
+
+    def keys(self):
+        return self._GET.keys()
+
+    def to_dict(self):
+        return {key: getter(self) for key, getter in self._GET.items()}
+
+    def __repr__(self):
+        return f"ScanResult({self.site!r}, {self.file!r}, {self.status.label!r})"
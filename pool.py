@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration
+POOL_MAX_PER_HOST = 2  # many receivers only allow 1-2 concurrent sessions
+POOL_IDLE_TIMEOUT = 120  # seconds before an idle session is closed
+POOL_KEEPALIVE = 30  # seconds between NOOP/keepalive on idle sessions
+POOL_ACQUIRE_TIMEOUT = 300  # seconds to wait for a free slot on a busy host
+
+
+class PoolExhausted(RuntimeError):
+    """No session slot for a host became free in time.
+
+    Local contention, not an OSError, so it never counts against the host.
+    """
+
+
+class ConnectionPool:
+    """Keeps logged-in sessions open between connector calls.
+
+    Sessions are keyed by ``(protocol, host, port, user)`` and must provide
+    ``is_alive()``, ``keepalive()`` and ``close()``. A session may also define
+    ``recoverable``, a tuple of exception types that leave it usable; any
+    other exception raised while a session is checked out discards it.
+    """
+
+    def __init__(
+        self,
+        max_per_host=POOL_MAX_PER_HOST,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        keepalive_interval=POOL_KEEPALIVE,
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._cond = threading.Condition()
+        self._idle = {}  # key -> [[session, last_used, last_keepalive], ...]
+        self._open = {}  # host -> sessions open (idle + checked out)
+        self._reaper = None
+
+    @contextmanager
+    def session(self, key, factory, limit=None):
+        sess = self._acquire(key, factory, limit)
+        try:
+            yield sess
+        except getattr(sess, "recoverable", ()):
+            self._release(key, sess)
+            raise
+        except BaseException:
+            self._discard(key, sess)
+            raise
+        else:
+            self._release(key, sess)
+
+    def _acquire(self, key, factory, limit=None):
+        host = key[1]
+        cap = max(1, limit or self.max_per_host)
+        deadline = time.monotonic() + POOL_ACQUIRE_TIMEOUT
+        with self._cond:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    sess, last_used, _ = idle.pop()
+                    # Sessions idle past a keepalive interval may have been
+                    # dropped by the receiver; check before handing them out
+                    if time.monotonic() - last_used < self.keepalive_interval:
+                        return sess
+                    self._cond.release()
+                    try:
+                        alive = sess.is_alive()
+                    finally:
+                        self._cond.acquire()
+                    if alive:
+                        return sess
+                    logger.info(f"Pooled session to {host} went stale, reconnecting")
+                    self._close(host, sess)
+                    continue
+                if self._open.get(host, 0) < cap:
+                    self._open[host] = self._open.get(host, 0) + 1
+                    break
+                if self._evict_other_idle(host, key):
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhausted(f"No free session slot for {host}")
+                self._cond.wait(remaining)
+
+        try:
+            sess = factory()
+        except BaseException:
+            with self._cond:
+                self._open[host] -= 1
+                self._cond.notify_all()
+            raise
+        self._ensure_reaper()
+        return sess
+
+    def _release(self, key, sess):
+        now = time.monotonic()
+        with self._cond:
+            self._idle.setdefault(key, []).append([sess, now, now])
+            self._cond.notify_all()
+
+    def _discard(self, key, sess):
+        with self._cond:
+            self._close(key[1], sess)
+
+    def _close(self, host, sess):
+        # Caller holds the lock
+        self._open[host] = max(0, self._open.get(host, 0) - 1)
+        self._cond.notify_all()
+        try:
+            sess.close()
+        except Exception:
+            pass
+
+    def _evict_other_idle(self, host, key):
+        # Free a slot held by an idle session for another user/port on the host
+        for other, idle in self._idle.items():
+            if other != key and other[1] == host and idle:
+                sess, _, _ = idle.pop(0)
+                self._close(host, sess)
+                return True
+        return False
+
+    def _ensure_reaper(self):
+        with self._cond:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(
+                target=self._reap_loop, name="pool-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1, min(self.keepalive_interval, self.idle_timeout) / 2)
+        while True:
+            time.sleep(interval)
+            self.reap()
+
+    def reap(self):
+        """Close sessions idle past the timeout and keep the rest alive."""
+        now = time.monotonic()
+        to_ping = []
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for entry in idle:
+                    sess, last_used, last_keepalive = entry
+                    if now - last_used >= self.idle_timeout:
+                        self._close(key[1], sess)
+                    elif now - last_keepalive >= self.keepalive_interval:
+                        to_ping.append((key, entry))
+                    else:
+                        keep.append(entry)
+                idle[:] = keep
+
+        for key, entry in to_ping:
+            sess = entry[0]
+            try:
+                sess.keepalive()
+            except Exception as e:
+                logger.info(f"Keepalive to {key[1]} failed, dropping session: {e}")
+                self._discard(key, sess)
+                continue
+            entry[2] = time.monotonic()
+            with self._cond:
+                self._idle.setdefault(key, []).append(entry)
+                self._cond.notify_all()
+
+    def close_all(self):
+        with self._cond:
+            for key, idle in self._idle.items():
+                for sess, _, _ in idle:
+                    self._close(key[1], sess)
+            self._idle.clear()
+
+
+POOL = ConnectionPool()
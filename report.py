@@ -0,0 +1,138 @@
+import re
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from models import MissingFilesLog, FileStatus
+
+logger = logging.getLogger(__name__)
+
+MISSING_CODES = (
+    FileStatus.MISSING_LOCALLY,
+    FileStatus.MISSING_REMOTELY,
+    FileStatus.SIZE_MISMATCH,
+)
+MISSING_STATUSES = [status.label for status in MISSING_CODES]
+
+
+def extract_station_name(filename):
+    match = re.search(r"([A-Z]{4}\d{2}[A-Z])", filename.upper())
+    return match.group(1) if match else "UNKNOWN"
+
+
+def format_size(bytes_val):
+    if bytes_val <= 0:
+        return "—"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if bytes_val < 1024:
+            return f"{bytes_val:.1f} {unit}"
+        bytes_val /= 1024
+    return f"{bytes_val:.1f} TB"
+
+
+def summary_group(site, filename):
+    if hasattr(site, "station_code"):
+        station = site.station_code
+    else:
+        station = extract_station_name(filename)
+    rate_key = f"{site.rate} {'[ExtClk]' if site.external_clock else ''}".strip()
+    return f"{site.network} | {station} | {site.name} | {rate_key}"
+
+
+class SummaryAggregator:
+    """Per-station summary kept up to date as scan items change state.
+
+    Each group tracks the newest local file and the missing files keyed by
+    name, so a scan replaces one site's groups and a finished download
+    touches one group. Reading the summary costs O(groups) plus the missing
+    files themselves, whatever the size of the scan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # group -> {"site", "last_dt", "last_file", "missing": {file: expected dt}}
+        self._groups = {}
+        self._site_groups = {}  # log name -> set of groups
+
+    def replace_site(self, site_name: str, items):
+        """Drop everything known about ``site_name`` and add a fresh scan."""
+        with self._lock:
+            self._drop(site_name)
+            for item in items:
+                self._apply(item)
+
+    def remove_site(self, site_name: str):
+        with self._lock:
+            self._drop(site_name)
+
+    def update(self, item):
+        """Re-apply one item after its status or local file changed."""
+        with self._lock:
+            self._apply(item)
+
+    def _drop(self, site_name):
+        for group in self._site_groups.pop(site_name, ()):
+            self._groups.pop(group, None)
+
+    def _apply(self, item):
+        site = item.site_obj
+        group_key = summary_group(site, item.file)
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._groups[group_key] = {
+                "site": site.name,
+                "last_dt": None,
+                "last_file": "",
+                "missing": {},
+            }
+            self._site_groups.setdefault(site.name, set()).add(group_key)
+
+        # Local mtime comes from the scan's stat, no filesystem access here
+        file_dt = item.file_dt
+        if file_dt is None and item.local_exists and item.local_mtime:
+            file_dt = datetime.fromtimestamp(item.local_mtime, tz=timezone.utc)
+            item.file_dt = file_dt
+
+        if file_dt and (group["last_dt"] is None or file_dt > group["last_dt"]):
+            group["last_dt"] = file_dt
+            group["last_file"] = item.file
+
+        if item.status in MISSING_CODES and not item.is_current_utc:
+            group["missing"][item.file] = item.dt
+        else:
+            group["missing"].pop(item.file, None)
+
+    def summary(self, days: int, site_name: Optional[str] = None) -> Dict[str, Dict]:
+        """``{group: {"last_dt", "last_file", "missing"}}``, see build_summary."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        with self._lock:
+            return {
+                group_key: {
+                    "last_dt": group["last_dt"],
+                    "last_file": group["last_file"],
+                    "missing": [
+                        f
+                        for f, expected_dt in group["missing"].items()
+                        if expected_dt >= cutoff
+                    ],
+                }
+                for group_key, group in self._groups.items()
+                if not site_name or group["site"] == site_name
+            }
+
+
+def build_summary(
+    log: MissingFilesLog, days: int, site_name: Optional[str] = None
+) -> Dict[str, Dict]:
+    """Group scan items into per-station summaries.
+
+    Returns ``{group: {"last_dt", "last_file", "missing"}}`` where
+    ``last_dt`` is the newest local file time and ``missing`` lists the
+    non-current files still missing or mismatched within ``days``.
+    """
+    aggregator = SummaryAggregator()
+    for name, site_items in log.log.items():
+        if not site_name or name == site_name:
+            aggregator.replace_site(name, site_items)
+    return aggregator.summary(days, site_name)
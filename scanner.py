@@ -1,47 +1,135 @@
 import datetime, os
 import logging
+import re
+import time
+from collections import Counter
+from functools import lru_cache
 from datetime import timezone
 from typing import List, Dict
-from models import SiteConfig
-from connectors import ConnectorFactory
+from models import SiteConfig, ScanResult, FileStatus
+from state import ScanStateStore
+from inventory import LocalInventory
+from listing import ListingCache
+from metrics import METRICS
 
 logger = logging.getLogger(__name__)
 
 
+# strftime codes that only depend on the day; %H and %M vary per session
+DAY_CODES = set("aAbBCdDeFgGhjmuUVwWxyYZz")
+SESSION_CODES = {"H", "M"}
+
+
+class CompiledPattern:
+    """A strftime pattern compiled for batch formatting.
+
+    The day-level part is rendered with strftime once per day and %H/%M are
+    left as format fields filled in for each session. Patterns using other
+    time-of-day codes fall back to one strftime per session.
+    """
+
+    def __init__(self, pattern: str, use_letter_hour: bool = False):
+        self.pattern = pattern
+        self.use_letter_hour = use_letter_hour
+        codes = set(re.findall(r"%(.)", pattern.replace("%%", "")))
+        self.per_day = not (codes - DAY_CODES - SESSION_CODES)
+        parts = pattern.replace("{", "{{").replace("}", "}}").split("%%")
+        self.template = "%%".join(
+            p.replace("%H", "{0}").replace("%M", "{1}") for p in parts
+        )
+        self.hours = [
+            chr(97 + h) if use_letter_hour else f"{h:02d}" for h in range(24)
+        ]
+
+    def day(self, day_dt: datetime.datetime) -> str:
+        return day_dt.strftime(self.template) if self.per_day else ""
+
+    def batch(self, day_dt: datetime.datetime, slots) -> List[str]:
+        """Names for every session slot of one day."""
+        if not self.per_day:
+            return [self.format("", day_dt + slot[0]) for slot in slots]
+        fmt = self.day(day_dt).format
+        hours = self.hours
+        return [fmt(hours[slot[1]], slot[2]) for slot in slots]
+
+    def format(self, day_template: str, dt: datetime.datetime) -> str:
+        if self.per_day:
+            return day_template.format(self.hours[dt.hour], f"{dt.minute:02d}")
+        pattern = self.pattern
+        if self.use_letter_hour:
+            pattern = pattern.replace("%H", self.hours[dt.hour])
+        return dt.strftime(pattern)
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str, use_letter_hour: bool = False) -> CompiledPattern:
+    return CompiledPattern(pattern, use_letter_hour)
+
+
+@lru_cache(maxsize=None)
+def _session_slots(minutes: int):
+    """(offset from midnight, hour, "MM", " HH:MM") for each session of a day."""
+    return [
+        (
+            datetime.timedelta(minutes=m),
+            m // 60,
+            f"{m % 60:02d}",
+            f" {m // 60:02d}:{m % 60:02d}",
+        )
+        for m in range(0, 1440, minutes)
+    ]
+
+
 class FilePatternGenerator:
     @staticmethod
     def generate(site: SiteConfig, days_back: int) -> List[Dict]:
+        today = datetime.datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return FilePatternGenerator.generate_days(
+            site, [today - datetime.timedelta(days=d) for d in range(days_back)]
+        )
+
+    @staticmethod
+    def generate_days(site: SiteConfig, days) -> List[Dict]:
+        daily = site.frequency == "daily"
+        # Letter hours (a-x) only apply to sub-daily files
+        names = compile_pattern(site.pattern, site.use_letter_hour and not daily)
+        # site.path may hold strftime codes, e.g. /%Y/%j/ or /%Y/%m/%d/hourly/
+        dirs = compile_pattern(site.path) if "%" in site.path else None
+        slots = _session_slots(site.session_minutes)
         expected = []
-        now = datetime.datetime.now(timezone.utc)
-        for day_offset in range(days_back):
-            base = now - datetime.timedelta(days=day_offset)
-            if site.frequency == "daily":
-                dt = base.replace(hour=0, minute=0, second=0, microsecond=0)
-                fname = dt.strftime(site.pattern)
-                expected.append(
-                    {"dt": dt, "file": fname, "date": dt.strftime("%Y-%m-%d")}
-                )
-            else:
-                for hour in range(24):
-                    dt = base.replace(hour=hour, minute=0, second=0, microsecond=0)
-                    pattern = (
-                        site.pattern.replace("%H", chr(97 + hour))
-                        if site.use_letter_hour
-                        else site.pattern
-                    )
-                    fname = dt.strftime(pattern)
-                    expected.append(
-                        {"dt": dt, "file": fname, "date": dt.strftime("%Y-%m-%d %H:00")}
-                    )
+        for day in days:
+            label = day.strftime("%Y-%m-%d")
+            files = names.batch(day, slots)
+            remote_dirs = dirs.batch(day, slots) if dirs else [site.path] * len(slots)
+            expected.extend(
+                {
+                    "dt": day + slot[0],
+                    "file": fname,
+                    "date": label if daily else label + slot[3],
+                    "dir": remote_dir,
+                }
+                for slot, fname, remote_dir in zip(slots, files, remote_dirs)
+            )
         return expected
 
 
 class SiteScanner:
-    def scan_site(self, site: SiteConfig, days_back: int) -> List[Dict]:
+    def __init__(
+        self,
+        state: ScanStateStore = None,
+        inventory: LocalInventory = None,
+        listings: ListingCache = None,
+    ):
+        self.state = state
+        self.inventory = inventory or LocalInventory()
+        self.listings = listings or ListingCache()
+
+    def scan_site(self, site: SiteConfig, days_back: int) -> List[ScanResult]:
+        started = time.monotonic()
         expected = FilePatternGenerator.generate(site, days_back)
-        connector = ConnectorFactory.get(site.protocol)
-        remote_files, remote_sizes = connector.list_and_size(site)
-        remote_set = set(remote_files)
+        verified = self.state.load(site.name) if self.state else {}
 
         # Ensure output_dir is a valid local path
         try:
@@ -58,63 +146,112 @@ class SiteScanner:
             os.makedirs(site.output_dir, exist_ok=True)
             logger.info(f"Using fallback directory: {site.output_dir}")
 
+        # One directory read per scan instead of exists + getsize per file
+        self.inventory.scan(site.output_dir)
+
         now_utc = datetime.datetime.now(timezone.utc)
-        results = []
+        day_start = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # Closed days verified on an earlier scan stay "ok" while the local
+        # copy is untouched; only the open window is evaluated against the
+        # remote listing
+        local = []
+        open_dirs = {}  # resolved remote dir -> open-window names in it
+        dir_last = {}  # resolved remote dir -> newest expected time in it
+        open_last = {}  # resolved remote dir -> newest open-window time in it
         for exp in expected:
+            st = self.inventory.stat(os.path.join(site.output_dir, exp["file"]))
+            known = verified.get(exp["file"])
+            trusted = exp["dt"] < day_start and st is not None and known == st
+            if not trusted and exp["dt"] <= now_utc:
+                open_dirs.setdefault(exp["dir"], set()).add(exp["file"])
+                open_last[exp["dir"]] = max(
+                    open_last.get(exp["dir"], exp["dt"]), exp["dt"]
+                )
+            dir_last[exp["dir"]] = max(dir_last.get(exp["dir"], exp["dt"]), exp["dt"])
+            local.append((exp, st, known, trusted))
+
+        sessions = site.frequency != "daily"
+        current_session = site.session_start(now_utc)
+        # Files before the previous session are no longer being written
+        settled_before = current_session - datetime.timedelta(
+            minutes=site.session_minutes
+        )
+
+        # Each resolved directory is listed at most once per scan
+        remote = {}
+        for remote_dir, names in open_dirs.items():
+            remote[remote_dir] = self.listings.list(
+                site,
+                remote_dir,
+                names,
+                closed=dir_last[remote_dir] < day_start,
+                settled=open_last[remote_dir] < settled_before,
+            )
+        results = []
+        newly_verified = []
+        stale = []
+        for exp, st, known, trusted in local:
             fname = exp["file"]
-            local_path = os.path.join(site.output_dir, fname)
-            local_exists = os.path.exists(local_path)
-            local_size = os.path.getsize(local_path) if local_exists else 0
-            remote_exists = fname in remote_set
-            remote_size = remote_sizes.get(fname, 0)
+            local_exists = st is not None
+            local_size = st[0] if st else 0
+            if trusted:
+                remote_exists = True
+                remote_size = known[0]
+            else:
+                remote_set, remote_sizes = remote.get(exp["dir"], (set(), {}))
+                remote_exists = fname in remote_set
+                remote_size = remote_sizes.get(fname, 0)
             size_match = local_exists and remote_exists and local_size == remote_size
             is_future = exp["dt"] > now_utc
 
-            # Cache current date/hour for efficiency
-            is_current_utc = False
-            if " " in exp["date"]:
-                file_date, file_hour = exp["date"].split()
-                # Only compute current time strings once outside loop would be better,
-                # but this is correct for now
-                current_date = now_utc.strftime("%Y-%m-%d")
-                current_hour = now_utc.strftime("%H")
-                is_current_utc = file_date == current_date and file_hour.startswith(
-                    current_hour
-                )
+            is_current_utc = sessions and exp["dt"] == current_session
+
+            if is_future:
+                status = FileStatus.SCHEDULED
+            elif is_current_utc and remote_exists:
+                status = FileStatus.NEW
+            elif not remote_exists:
+                status = FileStatus.MISSING_REMOTELY
+            elif not local_exists:
+                status = FileStatus.MISSING_LOCALLY
+            elif not size_match:
+                status = FileStatus.SIZE_MISMATCH
+            else:
+                status = FileStatus.OK
 
-            status = (
-                "scheduled"
-                if is_future
-                else (
-                    "new"
-                    if is_current_utc and remote_exists
-                    else (
-                        "missing remotely"
-                        if not remote_exists
-                        else (
-                            "missing locally"
-                            if not local_exists
-                            else "size mismatch" if not size_match else "ok"
-                        )
-                    )
+            if status == FileStatus.OK and not trusted and exp["dt"] < day_start:
+                newly_verified.append((fname, local_size, st[1]))
+            elif known and not trusted and status != FileStatus.OK:
+                stale.append(fname)
+
+            results.append(
+                ScanResult(
+                    site,
+                    fname,
+                    exp["dt"],
+                    status,
+                    local_exists=local_exists,
+                    remote_exists=remote_exists,
+                    size_ok=size_match,
+                    future=is_future,
+                    is_current_utc=is_current_utc,
+                    local_size=local_size,
+                    remote_size=remote_size,
+                    local_mtime=st[1] if st else 0.0,
+                    remote_dir=exp["dir"],
                 )
             )
 
-            results.append(
-                {
-                    "site": site.name,
-                    "date": exp["date"],
-                    "file": fname,
-                    "site_obj": site,
-                    "local": "yes" if local_exists else "no",
-                    "remote": "yes" if remote_exists else "no",
-                    "local_size": local_size,
-                    "remote_size": remote_size,
-                    "size_ok": "yes" if size_match else "no",
-                    "status": status,
-                    "future": is_future,
-                    "is_current_utc": is_current_utc,
-                    "local_path": local_path,
-                }
+        if self.state:
+            self.state.mark_verified(site.name, newly_verified)
+            if stale:
+                self.state.forget(site.name, stale)
+
+        METRICS.observe("dgnet_scan_seconds", time.monotonic() - started, site=site.name)
+        counts = Counter(r.status for r in results)
+        for status in FileStatus:
+            METRICS.set(
+                "dgnet_scan_files", counts.get(status, 0), site=site.name, status=status.label
             )
         return results
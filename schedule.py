@@ -0,0 +1,192 @@
+"""Per-site scan/download schedule, independent of the GUI."""
+
+import heapq
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_DELAY = 15  # minutes after a session ends until its file is complete
+SCHEDULE_SPREAD = 10  # minutes over which site start times are spread
+SCHEDULE_WORKERS = 4  # scheduled runs in progress at once
+MAX_SLEEP = 60  # seconds; wall-clock jumps are noticed at least this often
+
+
+def start_offset(site, spread_minutes=SCHEDULE_SPREAD):
+    """Fixed per-site delay so sites on one cadence don't all start together.
+
+    Derived from the log name, so it survives restarts, and kept under
+    half the site's cadence.
+    """
+    window = min(spread_minutes, site.session_minutes / 2) * 60
+    return timedelta(seconds=zlib.crc32(site.name.encode()) % 1000 / 1000 * window)
+
+
+def next_run(site, after, delay_minutes=PUBLISH_DELAY, offset=timedelta(0)):
+    """First time after ``after`` (UTC) that a new file of ``site`` is due."""
+    lag = timedelta(minutes=delay_minutes) + offset
+    return site.session_start(after - lag) + timedelta(minutes=site.session_minutes) + lag
+
+
+class SiteScheduler:
+    """Calls ``job(sites)`` whenever sites have a new file to fetch.
+
+    Each site's next run follows its cadence (``frequency``), its publish
+    delay (``site.publish_delay``, else ``delay_minutes``) and its start
+    offset, in UTC. Sites due at the same moment go to one call, on a
+    small thread pool. A site whose previous run is still in flight is
+    skipped until its next slot.
+    """
+
+    def __init__(
+        self,
+        job,
+        delay_minutes=PUBLISH_DELAY,
+        spread_minutes=SCHEDULE_SPREAD,
+        workers=SCHEDULE_WORKERS,
+    ):
+        self.job = job
+        self.delay_minutes = delay_minutes
+        self.spread_minutes = spread_minutes
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._heap = []  # (due, log name); entries not in _due are stale
+        self._due = {}  # log name -> next run
+        self._keys = {}  # log name -> settings its next run was computed from
+        self._sites = {}  # log name -> SiteConfig
+        self._in_flight = set()
+        self._stopped = True
+        self._generation = 0  # bumped by start(); older loops see it and exit
+        self._pool = None
+
+    @property
+    def running(self):
+        return not self._stopped
+
+    def delay_for(self, site):
+        delay = getattr(site, "publish_delay", None)
+        return self.delay_minutes if delay is None else delay
+
+    def _next(self, site, after):
+        return next_run(
+            site, after, self.delay_for(site), start_offset(site, self.spread_minutes)
+        )
+
+    def _push(self, name, due):
+        self._due[name] = due
+        heapq.heappush(self._heap, (due, name))
+
+    def start(self, sites, run_now=False):
+        """Start scheduling ``sites``; ``run_now`` runs them all first."""
+        with self._cond:
+            if not self._stopped:
+                return self
+            self._stopped = False
+            self._generation += 1
+            generation = self._generation
+            self._heap.clear()
+            self._due.clear()
+            self._keys.clear()
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="schedule")
+        self.update(sites, run_now)
+        threading.Thread(
+            target=self._loop, args=(generation,), name="site-scheduler", daemon=True
+        ).start()
+        return self
+
+    def update(self, sites, run_now=False):
+        """Follow a changed site list; unchanged sites keep their next run."""
+        now = datetime.now(timezone.utc)
+        with self._cond:
+            self._sites = {s.name: s for s in sites if s.host and s.protocol}
+            for name in set(self._due) - set(self._sites):
+                del self._due[name]
+                del self._keys[name]
+            for name, site in self._sites.items():
+                key = (site.session_minutes, self.delay_for(site), self.spread_minutes)
+                if run_now or self._keys.get(name) != key:
+                    self._keys[name] = key
+                    self._push(name, now if run_now else self._next(site, now))
+            self._cond.notify_all()
+
+    def set_delay(self, minutes):
+        """Change the default publish delay and reschedule affected sites."""
+        with self._cond:
+            self.delay_minutes = minutes
+            sites = list(self._sites.values())
+        self.update(sites)
+
+    def stop(self, wait=False):
+        """Stop scheduling; ``wait`` also waits for runs in flight."""
+        with self._cond:
+            self._stopped = True
+            pool = self._pool
+            self._cond.notify_all()
+        if pool:
+            pool.shutdown(wait=wait)
+
+    def next_runs(self):
+        """``[(due, log name), ...]`` in run order."""
+        with self._cond:
+            return sorted((due, name) for name, due in self._due.items())
+
+    def in_flight(self):
+        with self._cond:
+            return set(self._in_flight)
+
+    def _current(self, generation):
+        return not self._stopped and generation == self._generation
+
+    def _loop(self, generation):
+        while True:
+            with self._cond:
+                while self._current(generation):
+                    while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                        heapq.heappop(self._heap)
+                    now = datetime.now(timezone.utc)
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    wait = MAX_SLEEP
+                    if self._heap:
+                        wait = min(wait, (self._heap[0][0] - now).total_seconds())
+                    self._cond.wait(wait)
+                if not self._current(generation):
+                    return
+                batch = self._take_due(now)
+                if batch:
+                    self._pool.submit(self._run, batch)
+
+    def _take_due(self, now):
+        batch = []
+        while self._heap and self._heap[0][0] <= now:
+            due, name = heapq.heappop(self._heap)
+            if self._due.get(name) != due:
+                continue
+            site = self._sites[name]
+            # After a long pause this skips the missed slots; the scan's
+            # days_back covers their files
+            self._push(name, self._next(site, now))
+            if name in self._in_flight:
+                logger.warning(f"{name}: previous run still in progress, skipping")
+                METRICS.inc("dgnet_schedule_skips_total", site=name)
+                continue
+            self._in_flight.add(name)
+            batch.append(site)
+        return batch
+
+    def _run(self, sites):
+        names = ", ".join(site.name for site in sites)
+        logger.info(f"Scheduled run: {names}")
+        METRICS.inc("dgnet_schedule_runs_total", len(sites))
+        try:
+            self.job(sites)
+        except Exception as e:
+            logger.error(f"Scheduled run for {names} failed: {e}")
+        finally:
+            with self._cond:
+                self._in_flight.difference_update(site.name for site in sites)
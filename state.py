@@ -0,0 +1,62 @@
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ScanStateStore:
+    """Persistent record of files already verified "ok" for each site.
+
+    Rows hold the local size and mtime seen when the file was verified, so a
+    later scan can trust a closed-day file without listing or comparing it
+    again as long as its local stat is unchanged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verified ("
+                " site TEXT NOT NULL,"
+                " file TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime REAL NOT NULL,"
+                " PRIMARY KEY (site, file))"
+            )
+
+    def load(self, site_name: str) -> Dict[str, Tuple[int, float]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT file, size, mtime FROM verified WHERE site = ?", (site_name,)
+            ).fetchall()
+        return {f: (size, mtime) for f, size, mtime in rows}
+
+    def mark_verified(self, site_name: str, entries: Iterable[Tuple[str, int, float]]):
+        rows = [(site_name, f, size, mtime) for f, size, mtime in entries]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO verified (site, file, size, mtime)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def forget(self, site_name: str, files: Iterable[str] = None):
+        """Drop verified rows for ``files``, or for the whole site if None."""
+        with self._lock, self._db:
+            if files is None:
+                self._db.execute("DELETE FROM verified WHERE site = ?", (site_name,))
+            else:
+                self._db.executemany(
+                    "DELETE FROM verified WHERE site = ? AND file = ?",
+                    [(site_name, f) for f in files],
+                )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the application modules from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import connectors  # noqa: E402
+from health import HEALTH  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from pool import POOL  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_connector_state():
+    """Each test starts without pooled sessions, breaker or metric state."""
+    yield
+    POOL.close_all()
+    connectors._list_method.clear()
+    connectors._dir_entries.clear()
+    HEALTH.reset()
+    METRICS.reset()
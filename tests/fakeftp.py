@@ -0,0 +1,154 @@
+"""Scripted FTP server on the loopback address for connector tests."""
+
+import socket
+import threading
+import time
+
+
+class FakeFTP:
+    """Serves ``files`` ({name: bytes}) from one directory, passive mode only.
+
+    ``replies`` maps a command verb to a list of reply lines used one per
+    call before falling back to the normal answer; a 421 reply closes the
+    connection. ``stall`` holds data connections open without sending
+    anything for that many seconds. ``list_lines`` replaces the LIST
+    output. ``mtimes`` ({name: POSIX time}) feeds MDTM, which otherwise
+    answers the time the server started. Commands received are kept in ``commands`` as (connection
+    number, line).
+    """
+
+    def __init__(self, files=None, replies=None, stall=0, list_lines=None, mtimes=None):
+        self.files = dict(files or {})
+        self.mtimes = dict(mtimes or {})
+        self.started = time.time()
+        self.list_lines = list_lines
+        self.replies = {verb: list(lines) for verb, lines in (replies or {}).items()}
+        self.stall = stall
+        self.commands = []
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        self.host, self.port = self._sock.getsockname()[:2]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.logins += 1
+                number = self.logins
+            threading.Thread(target=self._serve, args=(conn, number), daemon=True).start()
+
+    def _scripted(self, verb):
+        with self._lock:
+            script = self.replies.get(verb)
+            return script.pop(0) if script else None
+
+    def _serve(self, conn, number):
+        f = conn.makefile("rwb", buffering=0)
+        cwd = "/"
+        data = None
+        rest = 0
+
+        def send(line):
+            f.write(line.encode() + b"\r\n")
+
+        try:
+            send("220 fake receiver")
+            for raw in f:
+                line = raw.decode().rstrip("\r\n")
+                self.commands.append((number, line))
+                verb, _, arg = line.partition(" ")
+                verb = verb.upper()
+                reply = self._scripted(verb)
+                if reply:
+                    send(reply)
+                    if reply.startswith("421"):
+                        return
+                    continue
+                if verb == "USER":
+                    send("331 password please")
+                elif verb == "PASS":
+                    send("230 logged in")
+                elif verb == "PWD":
+                    send(f'257 "{cwd}"')
+                elif verb == "CWD":
+                    cwd = arg if arg.startswith("/") else cwd.rstrip("/") + "/" + arg
+                    send("250 ok")
+                elif verb in ("TYPE", "NOOP"):
+                    send("200 ok")
+                elif verb == "QUIT":
+                    send("221 bye")
+                    return
+                elif verb == "REST":
+                    rest = int(arg)
+                    send("350 restarting")
+                elif verb == "SIZE":
+                    if arg in self.files:
+                        send(f"213 {len(self.files[arg])}")
+                    else:
+                        send("550 no such file")
+                elif verb == "MDTM":
+                    if arg in self.files:
+                        when = time.gmtime(self.mtimes.get(arg, self.started))
+                        send(f"213 {time.strftime('%Y%m%d%H%M%S', when)}")
+                    else:
+                        send("550 no such file")
+                elif verb == "PASV":
+                    data = socket.create_server(("127.0.0.1", 0))
+                    port = data.getsockname()[1]
+                    send(f"227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 255}).")
+                elif verb in ("MLSD", "LIST", "NLST", "RETR"):
+                    if verb == "RETR" and arg not in self.files:
+                        send("550 no such file")
+                        continue
+                    send("150 opening data connection")
+                    self._transfer(data, self._payload(verb, arg, rest))
+                    data, rest = None, 0
+                    send("226 done")
+                else:
+                    send("502 not implemented")
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _payload(self, verb, arg, rest):
+        if verb == "RETR":
+            return self.files[arg][rest:]
+        if verb == "MLSD":
+            lines = [f"type=file;size={len(v)}; {k}" for k, v in self.files.items()]
+        elif verb == "LIST" and self.list_lines is not None:
+            lines = self.list_lines
+        elif verb == "LIST":
+            lines = [
+                f"-rw-r--r--   1 owner group {len(v):>8} Jan  5 12:00 {k}"
+                for k, v in self.files.items()
+            ]
+        else:
+            lines = list(self.files)
+        return "".join(line + "\r\n" for line in lines).encode()
+
+    def _transfer(self, listener, payload):
+        listener.settimeout(5)
+        try:
+            conn, _ = listener.accept()
+        finally:
+            listener.close()
+        with conn:
+            if self.stall:
+                time.sleep(self.stall)
+                return
+            conn.sendall(payload)
@@ -0,0 +1,59 @@
+import asyncio
+import ftplib
+import os
+
+import pytest
+
+from aioconnectors import SYNC_CONNECTORS, AsyncFTPSession
+from connectors import FTPConnector
+from fakeftp import FakeFTP
+from test_connectors import ftp_site
+
+
+@pytest.mark.parametrize("path", ["", "data"])
+def test_pooled_async_ftp_session_starts_from_home(path):
+    async def run(server):
+        sess = await AsyncFTPSession.open(ftp_site(server))
+        try:
+            await sess.chdir("/elsewhere")
+            await sess.chdir(path)
+            return ftplib.parse257(await sess.sendcmd("PWD"))
+        finally:
+            await sess.close()
+
+    with FakeFTP() as server:
+        assert asyncio.run(run(server)) == ("/" + path if path else "/")
+
+
+@pytest.mark.parametrize("backend", ["thread", "asyncio"])
+def test_rejected_rest_restarts_the_download(tmp_path, backend):
+    connector = FTPConnector if backend == "thread" else SYNC_CONNECTORS["ftp"]
+    local = tmp_path / "a.bin"
+    (tmp_path / "a.bin.part").write_bytes(b"stale")
+    with FakeFTP(
+        {"a.bin": b"0123456789"}, replies={"REST": ["502 REST not implemented"]}
+    ) as server:
+        assert connector.download(ftp_site(server), "a.bin", str(local), 10)
+        assert "REST 5" in [line for _, line in server.commands]
+    assert local.read_bytes() == b"0123456789"
+
+
+def test_checksums_share_the_async_session_pool(tmp_path):
+    connector = SYNC_CONNECTORS["ftp"]
+    digest = "ab" * 32
+    with FakeFTP({"a.bin": b"0123456789"}, replies={"XSHA256": [f"213 {digest}"]}) as server:
+        site = ftp_site(server)
+        assert connector.download(site, "a.bin", str(tmp_path / "a.bin"), 10)
+        assert connector.remote_hash(site, "a.bin") == ("sha256", digest)
+    assert server.logins == 1
+
+
+@pytest.mark.parametrize("age, expected", [(3600, b"xxxxx56789"), (-3600, b"0123456789")])
+def test_async_download_resumes_only_an_older_local_file(tmp_path, age, expected):
+    local = tmp_path / "a.bin"
+    local.write_bytes(b"xxxxx")
+    with FakeFTP({"a.bin": b"0123456789"}) as server:
+        then = server.started - age
+        os.utime(local, (then, then))
+        assert SYNC_CONNECTORS["ftp"].download(ftp_site(server), "a.bin", str(local), 10)
+    assert local.read_bytes() == expected
@@ -0,0 +1,239 @@
+import ftplib
+import os
+import socket
+import time
+
+import pytest
+
+import connectors
+from connectors import FTPConnector, SFTPConnector, is_network_error
+from fakeftp import FakeFTP
+from models import SiteConfig
+
+
+def ftp_site(server, **kw):
+    return SiteConfig(
+        "TEST", server.host, "ftp", user="u", password="p", port=server.port, **kw
+    )
+
+
+@pytest.mark.parametrize(
+    "error, network",
+    [
+        (ftplib.error_temp("421 Too many users"), True),
+        (ftplib.error_temp("450 File busy"), False),
+        (ftplib.error_perm("550 No such file"), False),
+        (ConnectionResetError(), True),
+        (FileNotFoundError(), False),
+    ],
+)
+def test_is_network_error(error, network):
+    assert is_network_error(error) is network
+
+
+def test_busy_receiver_is_retried(monkeypatch):
+    monkeypatch.setattr(connectors, "RETRY_DELAY", 0)
+    with FakeFTP({"a.bin": b"x" * 10}, replies={"CWD": ["421 Too many users"]}) as server:
+        files, sizes = FTPConnector.list_and_size(ftp_site(server, path="/data"))
+        assert files == ["a.bin"] and sizes == {"a.bin": 10}
+        assert server.logins == 2
+
+
+def test_stalled_passive_transfer_times_out(monkeypatch):
+    monkeypatch.setattr(connectors, "READ_TIMEOUT", 0.5)
+    with FakeFTP({"a.bin": b"x" * 10}, stall=5) as server:
+        sess = connectors.FTPSession.open(ftp_site(server))
+        try:
+            started = time.monotonic()
+            with pytest.raises(socket.timeout):
+                sess.ftp.retrbinary("RETR a.bin", lambda block: None)
+            assert time.monotonic() - started < 3
+        finally:
+            sess.close()
+
+
+@pytest.mark.parametrize("path", ["", "data"])
+def test_pooled_ftp_session_starts_from_home(path):
+    with FakeFTP() as server:
+        sess = connectors.FTPSession.open(ftp_site(server))
+        try:
+            sess.chdir("/elsewhere")
+            sess.chdir(path)
+            assert sess.ftp.pwd() == ("/" + path if path else "/")
+        finally:
+            sess.close()
+
+
+@pytest.mark.parametrize(
+    "line, entry",
+    [
+        ("-rw-r--r--   1 owner group     1234 Jan  5 12:00 NOA1.T02", ("NOA1.T02", 1234)),
+        ("-rw-r--r-- 1 500 500 1234 Jan  5  2024 NOA1.T02", ("NOA1.T02", 1234)),
+        ("-rw-r--r-- 1 owner 1234 Jan  5 12:00 NOA1.T02", ("NOA1.T02", 1234)),
+        ("-rw-r--r-- 1234 Jan  5 12:00 NOA1.T02", ("NOA1.T02", 1234)),
+        ("-rw-r--r-- 1 owner group 1234 2024-01-05 12:00 name with spaces", ("name with spaces", 1234)),
+        ("drwxr-xr-x 2 owner group 4096 Jan  5 12:00 2024", ("2024", None)),
+        ("lrwxrwxrwx 1 owner group 8 Jan  5 12:00 latest -> NOA1.T02", ("latest -> NOA1.T02", None)),
+        ("01-05-24  12:00PM                 1234 NOA1.T02", ("NOA1.T02", 1234)),
+        ("01-05-2024  09:15AM       <DIR>          2024", ("2024", None)),
+        ("total 12", None),
+        ("NOA1.T02", None),
+    ],
+)
+def test_parse_list_line(line, entry):
+    assert connectors.parse_list_line(line) == entry
+
+
+def test_parse_listing_skips_directories_and_counts_unknown_lines():
+    lines = [
+        "total 8",
+        "-rw-r--r-- 1 owner group 10 Jan  5 12:00 a.T02",
+        "drwxr-xr-x 2 owner group 4096 Jan  5 12:00 old",
+        "something else",
+        "",
+    ]
+    assert connectors.parse_listing(lines) == (["a.T02"], {"a.T02": 10}, 1)
+
+
+def test_refused_list_command_is_asked_again_later(monkeypatch):
+    files = {"a.bin": b"x" * 10}
+    with FakeFTP(files, replies={"MLSD": ["500 MLSD not understood"]}) as server:
+        site = ftp_site(server)
+        assert FTPConnector.list_and_size(site) == (["a.bin"], {"a.bin": 10})
+        assert FTPConnector.list_and_size(site) == (["a.bin"], {"a.bin": 10})
+        listed = [line.split()[0] for _, line in server.commands]
+        assert listed.count("MLSD") == 1 and listed.count("LIST") == 2
+
+        monkeypatch.setitem(
+            connectors._list_method, (site.host, site.port), ("LIST", 0)
+        )
+        FTPConnector.list_and_size(site)
+        listed = [line.split()[0] for _, line in server.commands]
+        assert listed.count("MLSD") == 2
+
+
+def test_expired_list_method_seen_by_two_scans(monkeypatch):
+    class RacingDict(dict):
+        """Another scan drops the expired entry right after this one reads it."""
+
+        def get(self, key, default=None):
+            value = super().get(key, default)
+            self.pop(key, None)
+            return value
+
+    site = SiteConfig("TEST", "receiver", "ftp")
+    expired = RacingDict({(site.host, site.port): ("LIST", 0)})
+    monkeypatch.setattr(connectors, "_list_method", expired)
+    assert connectors.list_methods(site) == connectors.FTP_LIST_METHODS
+    assert connectors.list_methods(site) == connectors.FTP_LIST_METHODS
+
+
+def test_odd_listing_is_not_taken_as_a_refusal():
+    files = {"a.bin": b"x" * 10}
+    with FakeFTP(files, replies={"MLSD": ["500 no"]}, list_lines=["a.bin 10"]) as server:
+        site = ftp_site(server)
+        assert FTPConnector.list_and_size(site) == (["a.bin"], {"a.bin": 10})
+        assert connectors._list_method[(site.host, site.port)][0] == "LIST"
+
+
+REMOTE = b"0123456789"
+
+
+def resume_commands(server):
+    return [line for _, line in server.commands if line.split()[0] in ("REST", "MDTM")]
+
+
+def test_part_file_is_resumed_with_rest(tmp_path):
+    local = tmp_path / "a.bin"
+    (tmp_path / "a.bin.part").write_bytes(b"xxxxx")
+    with FakeFTP({"a.bin": REMOTE}) as server:
+        assert FTPConnector.download(ftp_site(server), "a.bin", str(local), 10)
+        assert resume_commands(server) == ["REST 5"]
+    # The resumed tail follows the bytes already there
+    assert local.read_bytes() == b"xxxxx56789"
+    assert not (tmp_path / "a.bin.part").exists()
+
+
+def test_shorter_local_file_older_than_remote_is_resumed(tmp_path):
+    local = tmp_path / "a.bin"
+    local.write_bytes(b"xxxxx")
+    old = time.time() - 3600
+    os.utime(local, (old, old))
+    with FakeFTP({"a.bin": REMOTE}) as server:
+        assert FTPConnector.download(ftp_site(server), "a.bin", str(local), 10)
+        assert resume_commands(server) == ["MDTM a.bin", "REST 5"]
+    assert local.read_bytes() == b"xxxxx56789"
+
+
+def test_shorter_local_file_newer_than_remote_is_fetched_again(tmp_path):
+    local = tmp_path / "a.bin"
+    local.write_bytes(b"xxxxx")
+    replaced = {"a.bin": time.time() - 3600}
+    with FakeFTP({"a.bin": REMOTE}, mtimes=replaced) as server:
+        assert FTPConnector.download(ftp_site(server), "a.bin", str(local), 10)
+        assert resume_commands(server) == ["MDTM a.bin"]
+    assert local.read_bytes() == REMOTE
+
+
+def test_shorter_local_file_is_resumed_when_checksums_are_checked(tmp_path):
+    local = tmp_path / "a.bin"
+    local.write_bytes(b"xxxxx")
+    with FakeFTP({"a.bin": REMOTE}, mtimes={"a.bin": 0}) as server:
+        site = ftp_site(server, verify_checksum=True)
+        assert FTPConnector.download(site, "a.bin", str(local), 10)
+        assert resume_commands(server) == ["REST 5"]
+    assert local.read_bytes() == b"xxxxx56789"
+
+
+def test_part_longer_than_shrunk_remote_restarts_from_zero(tmp_path):
+    local = tmp_path / "a.bin"
+    (tmp_path / "a.bin.part").write_bytes(b"x" * 12)
+    with FakeFTP({"a.bin": REMOTE}) as server:
+        assert FTPConnector.download(ftp_site(server), "a.bin", str(local), 10)
+        assert resume_commands(server) == []
+    assert local.read_bytes() == REMOTE
+
+
+def test_short_transfer_keeps_the_part_file(tmp_path):
+    local = tmp_path / "a.bin"
+    with FakeFTP({"a.bin": REMOTE}) as server:
+        assert not FTPConnector.download(ftp_site(server), "a.bin", str(local), 20)
+    assert not local.exists()
+    assert (tmp_path / "a.bin.part").read_bytes() == REMOTE
+
+
+@pytest.fixture
+def sftp_server(tmp_path):
+    from benchmarks.servers import PASSWORD, USER, SFTPStandIn
+
+    root = tmp_path / "remote"
+    root.mkdir()
+    (root / "a.bin").write_bytes(REMOTE)
+    with SFTPStandIn(str(root)) as server:
+        yield SiteConfig(
+            "TEST", server.host, "sftp", user=USER, password=PASSWORD, port=server.port
+        )
+
+
+def test_sftp_part_file_is_resumed_from_its_offset(tmp_path, sftp_server):
+    local = tmp_path / "a.bin"
+    (tmp_path / "a.bin.part").write_bytes(b"xxxxx")
+    assert SFTPConnector.download(sftp_server, "a.bin", str(local), 10)
+    assert local.read_bytes() == b"xxxxx56789"
+
+
+def test_sftp_shorter_local_file_newer_than_remote_is_fetched_again(
+    tmp_path, sftp_server
+):
+    local = tmp_path / "a.bin"
+    local.write_bytes(b"xxxxx")
+    remote = tmp_path / "remote" / "a.bin"
+    old = time.time() - 3600
+    os.utime(remote, (old, old))
+    assert SFTPConnector.download(sftp_server, "a.bin", str(local), 10)
+    assert local.read_bytes() == REMOTE
+
+    local.write_bytes(b"xxxxx")
+    os.utime(local, (old - 60, old - 60))
+    assert SFTPConnector.download(sftp_server, "a.bin", str(local), 10)
+    assert local.read_bytes() == b"xxxxx56789"
@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from downloader import PRIORITY_NEWEST, PRIORITY_OLDEST, DownloadScheduler
+from models import FileStatus, ScanResult, SiteConfig
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def items_for(site, hours):
+    return [
+        ScanResult(
+            site,
+            f"{site.name}{hour:02d}",
+            START + timedelta(hours=hour),
+            FileStatus.MISSING_LOCALLY,
+            remote_size=1,
+        )
+        for hour in hours
+    ]
+
+
+class Recorder:
+    """Fake download_fn tracking peak transfers per host and the order taken."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.order = []
+
+    def __call__(self, item):
+        host = item.site_obj.host
+        with self.lock:
+            self.order.append(item.file)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[host] -= 1
+        return True
+
+
+def test_per_host_cap_takes_the_smallest_site_limit():
+    shared_a = SiteConfig("A", "receiver-1", "ftp", max_sessions=3)
+    shared_b = SiteConfig("B", "receiver-1", "ftp", max_sessions=1)
+    other = SiteConfig("C", "receiver-2", "ftp", max_sessions=2)
+    items = (
+        items_for(shared_a, range(6))
+        + items_for(shared_b, range(6))
+        + items_for(other, range(6))
+    )
+    download = Recorder(delay=0.02)
+    assert DownloadScheduler(download, workers=8).run(items) == len(items)
+    assert download.peak == {"receiver-1": 1, "receiver-2": 2}
+
+
+@pytest.mark.parametrize("priority", [PRIORITY_OLDEST, PRIORITY_NEWEST])
+def test_items_are_taken_in_priority_order_across_hosts(priority):
+    first = SiteConfig("A", "receiver-1", "ftp")
+    second = SiteConfig("B", "receiver-2", "ftp")
+    items = items_for(first, [0, 3, 4]) + items_for(second, [1, 2, 5])
+    download = Recorder()
+    DownloadScheduler(download, workers=1, priority=priority).run(items)
+
+    chronological = ["A00", "B01", "B02", "A03", "A04", "B05"]
+    if priority == PRIORITY_NEWEST:
+        chronological.reverse()
+    assert download.order == chronological
@@ -0,0 +1,87 @@
+import socket
+
+import pytest
+
+import pool
+from connectors import FTPConnector, connect, is_network_error, retry_on_network_error
+from health import BREAKER_THRESHOLD, CLOSED, HEALTH, OPEN
+from models import SiteConfig
+from pool import ConnectionPool, PoolExhausted
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_one_failed_connect_does_not_open_the_breaker():
+    site = SiteConfig("T", "127.0.0.1", "ftp", port=closed_port())
+    with pytest.raises(OSError):
+        connect(site)
+    HEALTH.failure(site.host)  # as counted by the retry decorator
+    assert HEALTH.state(site.host) == CLOSED and HEALTH.allow(site.host)
+
+
+def test_breaker_opens_at_threshold():
+    for _ in range(BREAKER_THRESHOLD - 1):
+        HEALTH.failure("receiver")
+    assert HEALTH.state("receiver") == CLOSED
+    HEALTH.failure("receiver")
+    assert HEALTH.state("receiver") == OPEN and not HEALTH.allow("receiver")
+
+
+class Session:
+    def is_alive(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def test_pool_exhaustion_is_not_a_network_error(monkeypatch):
+    monkeypatch.setattr(pool, "POOL_ACQUIRE_TIMEOUT", 0.1)
+    sessions = ConnectionPool(max_per_host=1)
+    key = ("ftp", "receiver", 21, "user")
+    with sessions.session(key, Session):
+        with pytest.raises(PoolExhausted) as raised:
+            with sessions.session(key, Session):
+                pass
+    assert not is_network_error(raised.value)
+    sessions.close_all()
+
+
+def almost_open(host):
+    for _ in range(BREAKER_THRESHOLD - 1):
+        HEALTH.failure(host)
+
+
+@pytest.mark.parametrize("error", [PoolExhausted("no slot"), ValueError("bug")])
+def test_errors_that_are_not_the_hosts_leave_its_breaker_alone(error):
+    @retry_on_network_error(default="default")
+    def call(site):
+        raise error
+
+    site = SiteConfig("T", "receiver", "ftp")
+    almost_open(site.host)
+    if isinstance(error, PoolExhausted):
+        assert call(site) == "default"
+    else:
+        with pytest.raises(ValueError):
+            call(site)
+    HEALTH.failure(site.host)
+    assert HEALTH.state(site.host) == OPEN
+
+
+def test_connector_waiting_for_a_pool_slot_does_not_reset_the_breaker(monkeypatch):
+    from fakeftp import FakeFTP
+    from test_connectors import ftp_site
+
+    monkeypatch.setattr(pool, "POOL_ACQUIRE_TIMEOUT", 0.1)
+    with FakeFTP({"a.bin": b"x"}) as server:
+        site = ftp_site(server, max_sessions=1)
+        with FTPConnector.session(site):
+            almost_open(site.host)
+            assert FTPConnector.list_and_size(site) == ([], {})
+    HEALTH.failure(site.host)
+    assert HEALTH.state(site.host) == OPEN
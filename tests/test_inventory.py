@@ -0,0 +1,55 @@
+import os
+
+from inventory import LocalInventory
+
+
+def test_scan_indexes_a_directory_once(tmp_path):
+    (tmp_path / "a.bin").write_bytes(b"x" * 10)
+    inventory = LocalInventory()
+    assert set(inventory.scan(str(tmp_path))) == {"a.bin"}
+    size, mtime = inventory.stat(str(tmp_path / "a.bin"))
+    assert (size, mtime) == (10, os.stat(tmp_path / "a.bin").st_mtime)
+    assert inventory.stat(str(tmp_path / "b.bin")) is None
+
+    # New files are not seen until the directory is read again
+    (tmp_path / "b.bin").write_bytes(b"y")
+    assert inventory.stat(str(tmp_path / "b.bin")) is None
+    inventory.scan(str(tmp_path))
+    assert inventory.stat(str(tmp_path / "b.bin"))[0] == 1
+
+
+def test_stat_reads_an_unknown_directory_on_first_use(tmp_path):
+    (tmp_path / "a.bin").write_bytes(b"x")
+    inventory = LocalInventory()
+    assert inventory.stat(str(tmp_path / "a.bin"))[0] == 1
+    assert inventory.stat(str(tmp_path / "missing" / "a.bin")) is None
+
+
+def test_refresh_after_a_download(tmp_path):
+    inventory = LocalInventory()
+    inventory.scan(str(tmp_path))
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"x" * 5)
+    assert inventory.refresh(str(path)) == (5, os.stat(path).st_mtime)
+    assert inventory.stat(str(path))[0] == 5
+
+    path.unlink()
+    assert inventory.refresh(str(path)) is None
+    assert inventory.stat(str(path)) is None
+
+
+def test_invalidate_forgets_directories(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    inventory = LocalInventory()
+    inventory.scan(str(first))
+    inventory.scan(str(second))
+    (first / "a.bin").write_bytes(b"x")
+    (second / "a.bin").write_bytes(b"x")
+
+    inventory.invalidate(str(first))
+    assert inventory.stat(str(first / "a.bin")) is not None
+    assert inventory.stat(str(second / "a.bin")) is None
+    inventory.invalidate()
+    assert inventory.stat(str(second / "a.bin")) is not None
@@ -0,0 +1,38 @@
+import listing
+from listing import ListingCache
+from models import SiteConfig
+
+
+class GrowingDirectory:
+    """Connector stub whose one file grows by 100 bytes per listing."""
+
+    def __init__(self):
+        self.listings = 0
+
+    def list_and_size(self, site, expected=None, path=None):
+        self.listings += 1
+        return ["NOA1.T02"], {"NOA1.T02": 100 * self.listings}
+
+    def dir_mtime(self, site, path=None):
+        return None
+
+
+def test_unsettled_past_directory_is_listed_again(monkeypatch):
+    connector = GrowingDirectory()
+    clock = [1000.0]
+    monkeypatch.setattr(listing.ConnectorFactory, "get", lambda protocol: connector)
+    monkeypatch.setattr(listing.time, "monotonic", lambda: clock[0])
+    site = SiteConfig("NOA1", "receiver", "ftp", listing_ttl=60)
+    cache = ListingCache()
+    names = {"NOA1.T02"}
+
+    # Just after midnight: yesterday is closed but its last file still grows
+    assert cache.list(site, "/2026/01/01", names, closed=True)[1] == {"NOA1.T02": 100}
+    clock[0] += 61
+    assert cache.list(site, "/2026/01/01", names, closed=True)[1] == {"NOA1.T02": 200}
+
+    # Once settled the complete directory is kept whatever the TTL
+    cache.list(site, "/2026/01/01", names, closed=True, settled=True)
+    clock[0] += 3600
+    cache.list(site, "/2026/01/01", names, closed=True, settled=True)
+    assert connector.listings == 3
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import manager
+from config import Config
+from models import SiteConfig
+
+
+class SmallConfig(Config):
+    def __init__(self):
+        super().__init__()
+        self.scan_workers = 2
+        self.metrics_prometheus = ""
+        self.metrics_json = ""
+
+
+def test_overlapping_scans_share_the_worker_cap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(manager, "Config", SmallConfig)
+    m = manager.FTPSiteManager()
+    lock = threading.Lock()
+    active = peak = 0
+
+    def scan_site(site, days_back):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return []
+
+    monkeypatch.setattr(m.scanner, "scan_site", scan_site)
+    sites = [SiteConfig(f"S{i}", f"host{i}", "ftp") for i in range(4)]
+    runs = [
+        threading.Thread(target=m.scan_all, kwargs={"sites": sites, "max_workers": 2})
+        for _ in range(3)
+    ]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+    assert peak == 2
+
+
+def test_close_stops_the_connector_loop(tmp_path, monkeypatch):
+    from aioconnectors import LOOP
+    from connectors import ConnectorFactory
+
+    class AsyncConfig(SmallConfig):
+        def __init__(self):
+            super().__init__()
+            self.connector_backend = "asyncio"
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(manager, "Config", AsyncConfig)
+    monkeypatch.setattr(ConnectorFactory, "backend", ConnectorFactory.backend)
+    m = manager.FTPSiteManager()
+    loop = LOOP.loop
+    m.close()
+    assert loop.is_closed()
+    assert "connector-loop" not in [t.name for t in threading.enumerate()]
+
+
+def test_corrupt_download_is_quarantined(tmp_path, monkeypatch):
+    import gzip
+    from datetime import datetime, timezone
+
+    from fakeftp import FakeFTP
+    from models import FileStatus, ScanResult
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(manager, "Config", SmallConfig)
+    m = manager.FTPSiteManager()
+    truncated = gzip.compress(b"x" * 1000)[:-8]
+    (tmp_path / "out").mkdir()
+    with FakeFTP({"NOA10010.26o.gz": truncated}) as server:
+        site = SiteConfig(
+            "NOA1",
+            server.host,
+            "ftp",
+            user="u",
+            password="p",
+            port=server.port,
+            output_dir=str(tmp_path / "out"),
+        )
+        item = ScanResult(
+            site,
+            "NOA10010.26o.gz",
+            datetime(2026, 1, 1, tzinfo=timezone.utc),
+            FileStatus.MISSING_LOCALLY,
+            remote_exists=True,
+            remote_size=len(truncated),
+        )
+        assert m._download_item(item)
+        m.verifier.wait()
+
+    assert item.status == FileStatus.MISSING_LOCALLY
+    assert not item.local_exists
+    assert m.inventory.stat(item.local_path) is None
+    assert (tmp_path / "out" / "NOA10010.26o.gz.corrupt").read_bytes() == truncated
@@ -0,0 +1,30 @@
+import threading
+
+from metrics import METRICS
+
+
+def test_concurrent_exports_leave_complete_files(tmp_path):
+    METRICS.inc("dgnet_test_total", site="A")
+    prom = tmp_path / "metrics.prom"
+    json_path = tmp_path / "metrics.json"
+    errors = []
+
+    def export():
+        try:
+            for _ in range(20):
+                METRICS.export(str(prom), str(json_path))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=export) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert 'dgnet_test_total{site="A"} 1' in prom.read_text()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "metrics.json",
+        "metrics.prom",
+    ]
@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta, timezone
+
+from models import FileStatus, ScanResult, SiteConfig
+from report import SummaryAggregator
+
+
+def test_summary_drops_missing_files_older_than_cutoff():
+    site = SiteConfig("NOA1", "receiver", "ftp", frequency="hourly")
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    old = ScanResult(site, "old.T02", now - timedelta(days=3), FileStatus.MISSING_LOCALLY)
+    recent = ScanResult(
+        site, "recent.T02", now - timedelta(hours=2), FileStatus.MISSING_REMOTELY
+    )
+    aggregator = SummaryAggregator()
+    aggregator.replace_site(site.name, [old, recent])
+
+    (group,) = aggregator.summary(days=1).values()
+    assert group["missing"] == ["recent.T02"]
+    (group,) = aggregator.summary(days=7).values()
+    assert sorted(group["missing"]) == ["old.T02", "recent.T02"]
@@ -0,0 +1,146 @@
+import datetime
+import os
+
+import pytest
+
+from inventory import LocalInventory
+from models import FileStatus, SiteConfig
+from scanner import FilePatternGenerator, SiteScanner
+from state import ScanStateStore
+
+
+def baseline_names(site, day):
+    """File names as the original one-strftime-per-file generator made them."""
+    if site.frequency == "daily":
+        return [day.strftime(site.pattern)]
+    names = []
+    for hour in range(24):
+        dt = day.replace(hour=hour)
+        pattern = (
+            site.pattern.replace("%H", chr(97 + hour))
+            if site.use_letter_hour
+            else site.pattern
+        )
+        names.append(dt.strftime(pattern))
+    return names
+
+
+@pytest.mark.parametrize("frequency", ["daily", "hourly"])
+@pytest.mark.parametrize("use_letter_hour", [False, True])
+@pytest.mark.parametrize(
+    "pattern", ["NOA1%j%H.%yd", "%Y%m%d%H%M_{x}.T02", "ST%j0.%yo"]
+)
+def test_names_match_baseline(frequency, use_letter_hour, pattern):
+    site = SiteConfig(
+        "NOA1",
+        "receiver",
+        "ftp",
+        pattern=pattern,
+        frequency=frequency,
+        use_letter_hour=use_letter_hour,
+    )
+    days = [datetime.datetime(2026, 1, 29), datetime.datetime(2026, 12, 31)]
+    generated = [e["file"] for e in FilePatternGenerator.generate_days(site, days)]
+    assert generated == [name for day in days for name in baseline_names(site, day)]
+
+
+class FakeListings:
+    """ListingCache stand-in serving ``files`` and recording what was asked."""
+
+    def __init__(self, files):
+        self.files = files
+        self.asked = []
+
+    def list(self, site, path, names, closed=False, settled=False):
+        self.asked.append(set(names))
+        return set(self.files), dict(self.files)
+
+
+@pytest.fixture
+def trusted_setup(tmp_path):
+    site = SiteConfig(
+        "NOA1", "receiver", "ftp", pattern="NOA1%j0.%yd", output_dir=str(tmp_path / "out")
+    )
+    today = datetime.datetime.now(datetime.timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    past = (today - datetime.timedelta(days=1)).strftime(site.pattern)
+    current = today.strftime(site.pattern)
+    os.makedirs(site.output_dir)
+    for name in (past, current):
+        with open(os.path.join(site.output_dir, name), "wb") as f:
+            f.write(b"x" * 10)
+    listings = FakeListings({past: 10, current: 10})
+    state = ScanStateStore(str(tmp_path / "state.db"))
+    yield site, past, listings, state, SiteScanner(state, LocalInventory(), listings)
+    state.close()
+
+
+def statuses(results):
+    return {r.file: r.status for r in results}
+
+
+def test_past_ok_file_is_trusted_without_a_listing(trusted_setup):
+    site, past, listings, state, scanner = trusted_setup
+    assert statuses(scanner.scan_site(site, 2))[past] == FileStatus.OK
+    assert past in listings.asked[-1]
+    size, _ = state.load(site.name)[past]
+    assert size == 10
+
+    assert statuses(scanner.scan_site(site, 2))[past] == FileStatus.OK
+    assert past not in listings.asked[-1]
+
+
+@pytest.mark.parametrize("change", ["size", "mtime"])
+def test_changed_local_file_is_no_longer_trusted(trusted_setup, change):
+    site, past, listings, state, scanner = trusted_setup
+    scanner.scan_site(site, 2)
+    path = os.path.join(site.output_dir, past)
+    if change == "size":
+        with open(path, "ab") as f:
+            f.write(b"x")
+    else:
+        os.utime(path, (1_000_000, 1_000_000))
+
+    results = statuses(scanner.scan_site(site, 2))
+    assert past in listings.asked[-1]
+    if change == "size":
+        assert results[past] == FileStatus.SIZE_MISMATCH
+        assert past not in state.load(site.name)
+    else:
+        assert results[past] == FileStatus.OK
+        assert state.load(site.name)[past] == (10, 1_000_000)
+
+
+def test_stale_entry_is_forgotten_once_the_file_is_not_ok(trusted_setup):
+    site, past, listings, state, scanner = trusted_setup
+    scanner.scan_site(site, 2)
+    os.remove(os.path.join(site.output_dir, past))
+
+    assert statuses(scanner.scan_site(site, 2))[past] == FileStatus.MISSING_LOCALLY
+    assert past not in state.load(site.name)
+
+
+@pytest.mark.parametrize("use_letter_hour", [False, True])
+@pytest.mark.parametrize("pattern", ["NOA1%Y%m%d%H%M.T02", "NOA1%j%H%M.%yd"])
+def test_sub_hourly_sessions(pattern, use_letter_hour):
+    site = SiteConfig(
+        "NOA1",
+        "receiver",
+        "ftp",
+        pattern=pattern,
+        frequency="15min",
+        use_letter_hour=use_letter_hour,
+    )
+    day = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+    expected = FilePatternGenerator.generate_days(site, [day])
+
+    assert len(expected) == 96
+    assert [e["dt"] for e in expected] == [
+        day + datetime.timedelta(minutes=15 * i) for i in range(96)
+    ]
+    for e in expected:
+        hour = chr(97 + e["dt"].hour) if use_letter_hour else f"{e['dt'].hour:02d}"
+        assert e["file"] == e["dt"].strftime(pattern.replace("%H", hour))
+        assert e["date"] == e["dt"].strftime("%Y-%m-%d %H:%M")
+    assert expected[5]["date"] == "2026-03-01 01:15"
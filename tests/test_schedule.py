@@ -0,0 +1,29 @@
+import threading
+import time
+
+from models import SiteConfig
+from schedule import SiteScheduler
+
+
+def scheduler_threads():
+    return [t for t in threading.enumerate() if t.name == "site-scheduler"]
+
+
+def test_restart_leaves_a_single_loop():
+    runs = []
+    scheduler = SiteScheduler(lambda sites: runs.append([s.name for s in sites]))
+    sites = [SiteConfig("NOA1", "receiver", "ftp")]
+    try:
+        scheduler.start(sites)
+        scheduler.stop()
+        scheduler.start(sites)
+        time.sleep(0.2)
+        assert len(scheduler_threads()) == 1
+
+        scheduler.update(sites, run_now=True)
+        time.sleep(0.2)
+        assert runs == [["NOA1"]]
+    finally:
+        scheduler.stop(wait=True)
+    time.sleep(0.1)
+    assert not scheduler_threads()
@@ -0,0 +1,20 @@
+from state import ScanStateStore
+
+
+def test_verified_rows_are_kept_per_site(tmp_path):
+    store = ScanStateStore(str(tmp_path / "state.db"))
+    store.mark_verified("A", [("a1", 10, 1.5), ("a2", 20, 2.5)])
+    store.mark_verified("B", [("b1", 30, 3.5)])
+    store.mark_verified("A", [("a1", 11, 1.75)])
+    assert store.load("A") == {"a1": (11, 1.75), "a2": (20, 2.5)}
+
+    store.forget("A", ["a2"])
+    assert store.load("A") == {"a1": (11, 1.75)}
+    store.forget("A")
+    assert store.load("A") == {}
+    assert store.load("B") == {"b1": (30, 3.5)}
+    store.close()
+
+    reopened = ScanStateStore(str(tmp_path / "state.db"))
+    assert reopened.load("B") == {"b1": (30, 3.5)}
+    reopened.close()
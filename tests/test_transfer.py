@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+import transfer
+from models import SiteConfig
+from transfer import async_writer
+
+
+def test_async_writer_keeps_disk_io_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer, "WRITE_BUFFER", 4)
+    path = tmp_path / "a.part"
+    writers = set()
+
+    class File:
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, data):
+            writers.add(threading.current_thread())
+            return self.f.write(data)
+
+        def close(self):
+            self.f.close()
+
+    opened = open
+    monkeypatch.setattr(transfer, "open", lambda *a: File(opened(*a)), raising=False)
+
+    async def run():
+        async with async_writer(str(path), "wb") as write:
+            for block in (b"ab", b"cd", b"ef"):
+                await write(block)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert path.read_bytes() == b"abcdef"
+    assert writers and loop_thread not in writers
+
+
+def test_async_writer_keeps_received_data_on_failure(tmp_path):
+    path = tmp_path / "a.part"
+
+    async def run():
+        async with async_writer(str(path), "wb") as write:
+            await write(b"abc")
+            raise EOFError("connection lost")
+
+    with pytest.raises(EOFError):
+        asyncio.run(run())
+    assert path.read_bytes() == b"abc"
+
+
+class Clock:
+    """Stand-in for time.monotonic/time.sleep; sleeping advances it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(transfer.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(transfer.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = transfer.TokenBucket(rate=1000, burst=1000)
+    assert bucket.take(1000) == 0  # the burst is free
+    assert bucket.take(500) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take(500) == pytest.approx(0.5)
+    clock.now += 10  # refills no further than the burst
+    assert bucket.take(1000) == 0
+    assert bucket.take(1) == pytest.approx(0.001)
+
+
+def test_unlimited_bucket_never_waits(clock):
+    assert transfer.TokenBucket().take(10**9) == 0
+
+
+@pytest.mark.parametrize("site_kbps, global_kbps, rate", [(4, 1, 1), (2, 8, 2)])
+def test_site_cap_and_global_cap_combine(clock, site_kbps, global_kbps, rate):
+    limiter = transfer.BandwidthLimiter()
+    limiter.set_global(global_kbps)
+    consume = limiter.throttle(SiteConfig("A", "receiver", "ftp", max_kbps=site_kbps))
+    burst = transfer.FTP_BLOCK_SIZE
+    for _ in range(burst // 1024 + 16):
+        consume(1024)
+    # Past the burst the tighter of the two caps sets the pace
+    assert clock.now == pytest.approx(16 / rate, rel=0.01)
+
+
+def test_uncapped_sites_are_not_throttled():
+    limiter = transfer.BandwidthLimiter()
+    assert limiter.throttle(SiteConfig("A", "receiver", "ftp")) is None
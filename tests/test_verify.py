@@ -0,0 +1,59 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from verify import check_format
+
+CRINEX = b"1.0                 COMPACT RINEX FORMAT                    CRINEX VERS   / TYPE\n"
+OBS = CRINEX + b"     3.04           OBSERVATION DATA    M                   RINEX VERSION / TYPE\n"
+
+
+def gzipped(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def zipped(data):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("NOA10010.26o", data)
+    return buf.getvalue()
+
+
+def corrupt_zip_member(data):
+    # Flip a byte in the compressed body; the central directory stays valid
+    raw = bytearray(zipped(data))
+    raw[40] ^= 0xFF
+    return bytes(raw)
+
+
+@pytest.mark.parametrize(
+    "name, content, problem",
+    [
+        ("NOA10010.26d", OBS, None),
+        ("NOA10010.26d.gz", gzipped(OBS), None),
+        ("NOA10010.26o.gz", gzipped(b"any payload"), None),
+        ("NOA10010.26d.gz", gzipped(OBS)[:-12], "EOFError"),
+        ("NOA10010.26d", b"not a crinex header\n", "not a Hatanaka"),
+        ("NOA10010.26d", OBS[:-1], "ends mid-line"),
+        ("NOA10010.26d.gz", gzipped(OBS[:-1]), "ends mid-line"),
+        ("NOA10010.26d.Z", b"\x1f\x9d\x90" + b"x" * 20, None),
+        ("NOA10010.26d.Z", b"\x1f\x8bnot compress", "bad compress"),
+        ("NOA1.zip", zipped(b"x" * 1000), None),
+        ("NOA1.zip", corrupt_zip_member(b"x" * 1000), "corrupt"),
+        ("NOA1.zip", b"PK\x03\x04 truncated", "BadZipFile"),
+        ("NOA10010.T02", b"\x00binary", None),
+    ],
+)
+def test_check_format(tmp_path, name, content, problem):
+    path = tmp_path / name
+    path.write_bytes(content)
+    result = check_format(str(path))
+    if problem is None:
+        assert result is None
+    else:
+        assert problem in result
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+
+# Transfer tuning: bigger blocks and windows keep high-latency links busy
+FTP_BLOCK_SIZE = 256 * 1024  # bytes per recv() on the data connection
+SFTP_WINDOW_SIZE = 8 * 1024 * 1024  # SSH channel window
+SFTP_MAX_PACKET = 32768  # SFTP servers commonly reject larger packets
+SFTP_MAX_REQUESTS = 64  # read requests kept in flight while prefetching
+SFTP_READ_CHUNK = 1024 * 1024  # bytes taken per read from the prefetch queue
+WRITE_BUFFER = 1024 * 1024  # local file buffer, so disk writes are large
+
+
+class TokenBucket:
+    """Thread-safe byte-rate limiter; ``rate`` 0 means unlimited.
+
+    Callers take tokens after transferring and sleep off any debt, so
+    several threads sharing a bucket split the rate between them.
+    """
+
+    def __init__(self, rate=0, burst=None):
+        self._lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self.rate = max(0, rate)
+            self.burst = burst or max(self.rate, FTP_BLOCK_SIZE)
+            self._tokens = self.burst
+            self._stamp = time.monotonic()
+
+    def take(self, n):
+        """Take ``n`` tokens; returns the seconds to wait off, 0 if none."""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._stamp) * self.rate
+            )
+            self._stamp = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def consume(self, n):
+        debt = self.take(n)
+        if debt > 0:
+            time.sleep(debt)
+
+
+class BandwidthLimiter:
+    """Global and per-site download caps in KB/s (0 = unlimited)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = TokenBucket()
+        self._sites = {}  # log name -> TokenBucket
+
+    def set_global(self, kbps):
+        self.total.set_rate(int(kbps or 0) * 1024)
+
+    def _bucket(self, site):
+        """``site``'s bucket, or None when no cap applies to it."""
+        rate = int(getattr(site, "max_kbps", 0) or 0) * 1024
+        with self._lock:
+            bucket = self._sites.get(site.name)
+            if bucket is None or bucket.rate != rate:
+                bucket = self._sites[site.name] = TokenBucket(rate)
+        if rate <= 0 and self.total.rate <= 0:
+            return None
+        return bucket
+
+    def throttle(self, site):
+        """``consume(n)`` for a download from ``site``, or None if uncapped."""
+        bucket = self._bucket(site)
+        if bucket is None:
+            return None
+
+        def consume(n):
+            bucket.consume(n)
+            self.total.consume(n)
+
+        return consume
+
+    def async_throttle(self, site):
+        """Coroutine version of :meth:`throttle`, for the asyncio connectors."""
+        bucket = self._bucket(site)
+        if bucket is None:
+            return None
+
+        async def consume(n):
+            debt = max(bucket.take(n), self.total.take(n))
+            if debt > 0:
+                await asyncio.sleep(debt)
+
+        return consume
+
+
+BANDWIDTH = BandwidthLimiter()
+
+
+def writer(f, throttle=None):
+    """Block callback writing to ``f`` and charging the bandwidth caps."""
+    if throttle is None:
+        return f.write
+
+    def write(data):
+        f.write(data)
+        throttle(len(data))
+
+    return write
+
+
+@asynccontextmanager
+async def async_writer(path, mode, throttle=None):
+    """Coroutine version of :func:`writer`, over a file it opens itself.
+
+    Blocks are gathered to ``WRITE_BUFFER`` bytes and written on a worker
+    thread, like the open and close, so a slow disk never stalls the
+    event loop. What was received is written even if the transfer fails,
+    for the resume.
+    """
+    f = await asyncio.to_thread(open, path, mode)
+    pending = []
+    pending_size = 0
+
+    async def flush():
+        nonlocal pending, pending_size
+        if pending:
+            data, pending, pending_size = b"".join(pending), [], 0
+            await asyncio.to_thread(f.write, data)
+
+    async def write(data):
+        nonlocal pending_size
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= WRITE_BUFFER:
+            await flush()
+        if throttle is not None:
+            await throttle(len(data))
+
+    try:
+        yield write
+    finally:
+        try:
+            await flush()
+        finally:
+            await asyncio.to_thread(f.close)
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional
+
+from connectors import ConnectorFactory
+
+logger = logging.getLogger(__name__)
+
+# Verification runs beside the downloads, never in the transfer workers
+VERIFY_WORKERS = 2
+VERIFY_CHUNK = 1 << 20
+CORRUPT_SUFFIX = ".corrupt"
+
+# Hatanaka-compressed RINEX: .crx (RINEX 3) or .YYd (RINEX 2)
+HATANAKA_NAME = re.compile(r"\.(crx|\d\dd)$", re.IGNORECASE)
+
+
+def file_digest(path, algo):
+    """Hex digest of a local file: any hashlib algorithm or "crc32"."""
+    crc = 0
+    h = None if algo == "crc32" else hashlib.new(algo)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(VERIFY_CHUNK)
+            if not chunk:
+                break
+            if h is None:
+                crc = zlib.crc32(chunk, crc)
+            else:
+                h.update(chunk)
+    return f"{crc:08x}" if h is None else h.hexdigest()
+
+
+def _check_hatanaka(head, tail):
+    if b"CRINEX VERS" not in head.split(b"\n", 1)[0]:
+        return "not a Hatanaka (CRINEX) file"
+    if not tail.endswith(b"\n"):
+        return "Hatanaka file ends mid-line (truncated)"
+    return None
+
+
+def check_format(path) -> Optional[str]:
+    """Cheap sanity check for known archive formats; a problem or None.
+
+    gzip members are decompressed to the end so truncation shows up as a
+    missing trailer, and Hatanaka files must start with the CRINEX header
+    and end on a complete line. Other formats pass unchecked.
+    """
+    name = os.path.basename(path)
+    lower = name.lower()
+    try:
+        if lower.endswith(".gz"):
+            head = tail = b""
+            with gzip.open(path, "rb") as f:
+                while True:
+                    chunk = f.read(VERIFY_CHUNK)
+                    if not chunk:
+                        break
+                    head = head or chunk[:256]
+                    tail = chunk[-1:]
+            if HATANAKA_NAME.search(name[:-3]):
+                return _check_hatanaka(head, tail)
+        elif lower.endswith(".z"):
+            with open(path, "rb") as f:
+                if f.read(2) != b"\x1f\x9d":
+                    return "bad compress (.Z) magic"
+        elif lower.endswith(".zip"):
+            with zipfile.ZipFile(path) as z:
+                bad = z.testzip()
+                if bad:
+                    return f"zip member {bad} is corrupt"
+        elif HATANAKA_NAME.search(name):
+            with open(path, "rb") as f:
+                head = f.read(256)
+                f.seek(-1, os.SEEK_END)
+                tail = f.read(1)
+            return _check_hatanaka(head, tail)
+    except (OSError, EOFError, zlib.error, zipfile.BadZipFile) as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def check_checksum(item) -> Optional[str]:
+    """Compare the local file against the server's checksum, if it has one."""
+    site = item.site_obj
+    remote = ConnectorFactory.get(site.protocol).remote_hash(
+        site, item.file, path=item.remote_dir
+    )
+    if remote is None:
+        return None
+    algo, expected = remote
+    actual = file_digest(item.local_path, algo)
+    if actual != expected:
+        return f"{algo} mismatch (local {actual}, server {expected})"
+    return None
+
+
+class Verifier:
+    """Checks finished downloads in a small pool of its own.
+
+    ``on_result(item, problem)`` is called once per item with None when the
+    file passed, so download workers go straight on to the next transfer
+    while hashing and decompression happen here.
+    """
+
+    def __init__(self, on_result, workers=VERIFY_WORKERS):
+        self.on_result = on_result
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="verify"
+        )
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, item):
+        future = self._pool.submit(self._verify, item)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def wait(self):
+        """Block until every submitted item has been verified."""
+        with self._lock:
+            pending = set(self._pending)
+        wait(pending)
+
+    def _verify(self, item):
+        try:
+            problem = check_format(item.local_path)
+            if problem is None and item.site_obj.verify_checksum:
+                problem = check_checksum(item)
+        except Exception as e:
+            # Could not check (e.g. file moved meanwhile); do not condemn it
+            logger.error(f"Verification of {item.file} failed: {e}")
+            return False
+        try:
+            self.on_result(item, problem)
+        except Exception as e:
+            logger.error(f"Verification callback for {item.file} failed: {e}")
+        return problem is None
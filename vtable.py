@@ -0,0 +1,118 @@
+import tkinter as tk
+from tkinter import ttk
+
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTable:
+    """ttk.Treeview that only materialises the rows currently on screen.
+
+    ``rows`` is a plain list of objects; ``row_values(row)`` and
+    ``row_tags(row)`` turn one of them into cells when it scrolls into view.
+    The tree holds a fixed pool of row slots, one per visible line, and a
+    refresh only rewrites the slots whose values or tags actually changed,
+    so a 50k-row scan costs the same to display as a 50-row one.
+    """
+
+    def __init__(self, parent, columns, row_values, row_tags=None, **tree_options):
+        self.row_values = row_values
+        self.row_tags = row_tags or (lambda row: ())
+        self.rows = []
+        self.top = 0
+        self._slots = []  # tree iids, one per visible line
+        self._shown = []  # (values, tags) last written to each slot
+
+        self.frame = ttk.Frame(parent)
+        h_scroll = ttk.Scrollbar(self.frame, orient="horizontal")
+        self.v_scroll = ttk.Scrollbar(
+            self.frame, orient="vertical", command=self._on_scrollbar
+        )
+        self.tree = ttk.Treeview(
+            self.frame,
+            columns=columns,
+            show="headings",
+            xscrollcommand=h_scroll.set,
+            **tree_options,
+        )
+        h_scroll.config(command=self.tree.xview)
+        h_scroll.pack(side="bottom", fill="x")
+        self.v_scroll.pack(side="right", fill="y")
+        self.tree.pack(fill="both", expand=True)
+
+        self.tree.bind("<Configure>", lambda e: self.render())
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.page_size()))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.page_size()))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self.rows)))
+
+    def pack(self, **kw):
+        self.frame.pack(**kw)
+
+    def page_size(self):
+        style = ttk.Style(self.tree)
+        try:
+            row_height = int(style.lookup("Treeview", "rowheight"))
+        except (tk.TclError, ValueError):
+            row_height = DEFAULT_ROW_HEIGHT
+        row_height = row_height or DEFAULT_ROW_HEIGHT
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Not mapped yet, fall back to the configured height in rows
+            return int(self.tree.cget("height"))
+        # One line is taken by the headings
+        return max(1, height // row_height - 1)
+
+    def set_rows(self, rows):
+        """Replace the data; keeps the scroll position where possible."""
+        self.rows = rows
+        self.render()
+
+    def clear(self):
+        self.top = 0
+        self.set_rows([])
+
+    def scroll(self, lines):
+        self.scroll_to(self.top + lines)
+
+    def scroll_to(self, index):
+        self.top = index
+        self.render()
+
+    def render(self):
+        page = self.page_size()
+        self.top = max(0, min(self.top, len(self.rows) - page))
+        count = max(0, min(page, len(self.rows) - self.top))
+
+        while len(self._slots) < count:
+            self._slots.append(self.tree.insert("", "end"))
+            self._shown.append(None)
+        while len(self._slots) > count:
+            self.tree.delete(self._slots.pop())
+            self._shown.pop()
+
+        for i, iid in enumerate(self._slots):
+            row = self.rows[self.top + i]
+            shown = (tuple(self.row_values(row)), tuple(self.row_tags(row)))
+            if shown != self._shown[i]:
+                self.tree.item(iid, values=shown[0], tags=shown[1])
+                self._shown[i] = shown
+
+        total = len(self.rows)
+        if total:
+            self.v_scroll.set(self.top / total, (self.top + count) / total)
+        else:
+            self.v_scroll.set(0, 1)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = self.page_size() if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"